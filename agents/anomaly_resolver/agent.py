@@ -4,6 +4,7 @@ import asyncio
 import logging
 import time
 from typing import Dict, List, Optional, Any, Tuple
+import httpx
 import google.generativeai as genai
 import numpy as np
 from datetime import datetime, timedelta
@@ -15,10 +16,11 @@ from config.settings import settings
 class AnomalyResolverAgent(BaseAgent):
     """AI-powered anomaly resolver agent for detecting and resolving system issues."""
     
-    def __init__(self):
+    def __init__(self, http: Optional[httpx.AsyncClient] = None):
         super().__init__(
             agent_id="anomaly-resolver-agent",
-            agent_name="anomaly_resolver"
+            agent_name="anomaly_resolver",
+            http=http
         )
         
         # Configure Gemini
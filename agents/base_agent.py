@@ -6,6 +6,7 @@ import uuid
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
 import httpx
+import orjson
 from pydantic import BaseModel
 
 from config.settings import settings
@@ -30,17 +31,39 @@ class AgentResponse(BaseModel):
     execution_time_ms: float
 
 
+def create_mcp_client(**kwargs: Any) -> httpx.AsyncClient:
+    """Create an HTTP client for the MCP server."""
+    kwargs.setdefault("timeout", 30.0)
+    return httpx.AsyncClient(base_url=f"http://mcp-server:{settings.mcp_server_port}", **kwargs)
+
+
+_JSON_HEADERS = {"content-type": "application/json"}
+
+# In-cluster agents holding the shared token use the unvalidated fast route
+if settings.mcp_internal_token:
+    _MCP_REQUEST_PATH = "/mcp/request/fast"
+    _MCP_REQUEST_HEADERS = {**_JSON_HEADERS, "x-internal-token": settings.mcp_internal_token}
+else:
+    _MCP_REQUEST_PATH = "/mcp/request"
+    _MCP_REQUEST_HEADERS = _JSON_HEADERS
+
+
+def _dumps(payload: Dict[str, Any]) -> bytes:
+    """Serialize a bus payload with orjson, emitting datetimes as UTC."""
+    return orjson.dumps(payload, default=str, option=orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC)
+
+
 class BaseAgent(ABC):
     """Base class for all Aegis Orchestrator agents."""
     
-    def __init__(self, agent_id: str, agent_name: str):
+    def __init__(self, agent_id: str, agent_name: str, http: Optional[httpx.AsyncClient] = None):
         self.agent_id = agent_id
         self.agent_name = agent_name
         self.logger = logging.getLogger(f"agent.{agent_name}")
-        self.mcp_client = httpx.AsyncClient(
-            base_url=f"http://mcp-server:{settings.mcp_server_port}",
-            timeout=30.0
-        )
+        
+        # Agents started together share one connection pool; the owner closes it
+        self._owns_mcp_client = http is None
+        self.mcp_client = http or create_mcp_client()
         self.is_running = False
         self.message_queue = asyncio.Queue()
         
@@ -65,8 +88,9 @@ class BaseAgent(ABC):
         # Stop agent-specific cleanup
         await self.cleanup()
         
-        # Close HTTP client
-        await self.mcp_client.aclose()
+        # Close HTTP client unless it is shared
+        if self._owns_mcp_client:
+            await self.mcp_client.aclose()
         
         self.logger.info(f"{self.agent_name} agent stopped")
     
@@ -98,7 +122,7 @@ class BaseAgent(ABC):
                 await self.send_message(
                     recipient_id=message.sender_id,
                     message_type="response",
-                    content=response.dict(),
+                    content=response.model_dump(),
                     correlation_id=message.correlation_id
                 )
                 
@@ -123,7 +147,8 @@ class BaseAgent(ABC):
         try:
             response = await self.mcp_client.post(
                 f"/agents/{recipient_id}/message",
-                json=message.dict()
+                content=_dumps(message.model_dump()),
+                headers=_JSON_HEADERS
             )
             response.raise_for_status()
         except Exception as e:
@@ -143,9 +168,11 @@ class BaseAgent(ABC):
         }
         
         try:
-            response = await self.mcp_client.post("/mcp/request", json=request_data)
+            response = await self.mcp_client.post(
+                _MCP_REQUEST_PATH, content=_dumps(request_data), headers=_MCP_REQUEST_HEADERS
+            )
             response.raise_for_status()
-            return response.json()
+            return orjson.loads(response.content)
         except Exception as e:
             self.logger.error(f"MCP request failed: {e}")
             raise
@@ -175,6 +202,21 @@ class BaseAgent(ABC):
         response = await self.make_mcp_request("GET", f"/products/{product_id}")
         return response.get("data", {})
     
+    async def get_products_batch(self, product_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Get several products in one MCP round-trip, in the order requested."""
+        try:
+            response = await self.mcp_client.post(
+                "/products:batch",
+                params={"agent_id": self.agent_id},
+                content=_dumps({"ids": product_ids}),
+                headers=_JSON_HEADERS
+            )
+            response.raise_for_status()
+            return orjson.loads(response.content)
+        except Exception as e:
+            self.logger.error(f"MCP batch product request failed: {e}")
+            raise
+    
     async def get_user_cart(self, user_id: str) -> Dict[str, Any]:
         """Get user's cart."""
         response = await self.make_mcp_request("GET", f"/cart/{user_id}")
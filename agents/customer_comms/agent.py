@@ -4,6 +4,7 @@ import asyncio
 import logging
 import time
 from typing import Dict, List, Optional, Any
+import httpx
 import google.generativeai as genai
 from datetime import datetime, timedelta
 
@@ -14,10 +15,11 @@ from config.settings import settings
 class CustomerCommsAgent(BaseAgent):
     """AI-powered customer communication agent for proactive and contextual messaging."""
     
-    def __init__(self):
+    def __init__(self, http: Optional[httpx.AsyncClient] = None):
         super().__init__(
             agent_id="customer-comms-agent",
-            agent_name="customer_comms"
+            agent_name="customer_comms",
+            http=http
         )
         
         # Configure Gemini
@@ -4,8 +4,10 @@ import asyncio
 import logging
 import time
 from typing import Dict, List, Optional, Any, Tuple
+import httpx
 import google.generativeai as genai
 import numpy as np
+import redis.asyncio as aioredis
 from datetime import datetime, timedelta
 
 from agents.base_agent import BaseAgent, AgentMessage, AgentResponse
@@ -15,10 +17,11 @@ from config.settings import settings
 class InventoryAgent(BaseAgent):
     """AI-powered inventory management agent for stock optimization and demand prediction."""
     
-    def __init__(self):
+    def __init__(self, http: Optional[httpx.AsyncClient] = None):
         super().__init__(
             agent_id="inventory-agent",
-            agent_name="inventory"
+            agent_name="inventory",
+            http=http
         )
         
         # Configure Gemini
@@ -36,10 +39,16 @@ class InventoryAgent(BaseAgent):
         self.sales_history = {}
         self.seasonal_patterns = {}
         
+        # Shared inventory snapshots; bulk reads and writes are pipelined
+        self._redis: Optional[aioredis.Redis] = None
+        
     async def initialize(self):
         """Initialize the inventory agent."""
         self.logger.info("Initializing Inventory Agent")
         
+        # Connect to Redis for inventory snapshots
+        self._redis = aioredis.from_url(settings.redis_url)
+        
         # Load current inventory levels
         await self._load_inventory_levels()
         
@@ -53,6 +62,10 @@ class InventoryAgent(BaseAgent):
     async def cleanup(self):
         """Cleanup inventory resources."""
         self.logger.info("Cleaning up Inventory Agent")
+        
+        if self._redis:
+            await self._redis.aclose()
+            self._redis = None
     
     async def handle_message(self, message: AgentMessage) -> Optional[AgentResponse]:
         """Handle incoming messages."""
@@ -110,18 +123,23 @@ class InventoryAgent(BaseAgent):
         order_items = order_data.get("items", [])
         
         # Update inventory levels
+        updated = []
         for item in order_items:
             product_id = item.get("product_id")
             quantity = item.get("quantity", 0)
             
             if product_id:
                 await self._update_inventory_level(product_id, -quantity)
+                updated.append(product_id)
                 
                 # Check if inventory is now low
                 current_level = self.inventory_levels.get(product_id, {}).get("total", 0)
                 if current_level <= self.reorder_thresholds.get(product_id, 10):
                     await self._trigger_low_inventory_alert(product_id, current_level)
         
+        # Persist all touched products in one round trip
+        await self._persist_inventory(updated)
+        
         return {
             "status": "inventory_updated",
             "order_id": order_id,
@@ -272,21 +290,25 @@ class InventoryAgent(BaseAgent):
         try:
             # Get all products
             products = await self.get_products()
+            product_ids = [product.get("id") for product in products if product.get("id")]
+            
+            # Reuse persisted snapshots, fetched in one pipelined round trip
+            persisted = await self.bulk_stock(product_ids)
             
             # Initialize inventory levels (in production, this would come from a database)
-            for product in products:
-                product_id = product.get("id")
-                if product_id:
-                    self.inventory_levels[product_id] = {
-                        "total": np.random.randint(50, 200),  # Mock data
-                        "east-coast": np.random.randint(10, 50),
-                        "west-coast": np.random.randint(10, 50),
-                        "central": np.random.randint(10, 50),
-                        "last_updated": time.time()
-                    }
-                    
-                    # Set reorder threshold
-                    self.reorder_thresholds[product_id] = 20
+            for product_id in product_ids:
+                self.inventory_levels[product_id] = persisted.get(product_id) or {
+                    "total": np.random.randint(50, 200),  # Mock data
+                    "east-coast": np.random.randint(10, 50),
+                    "west-coast": np.random.randint(10, 50),
+                    "central": np.random.randint(10, 50),
+                    "last_updated": time.time()
+                }
+                
+                # Set reorder threshold
+                self.reorder_thresholds[product_id] = 20
+            
+            await self._persist_inventory([pid for pid in product_ids if pid not in persisted])
             
             self.logger.info(f"Loaded inventory levels for {len(self.inventory_levels)} products")
             
@@ -349,6 +371,52 @@ class InventoryAgent(BaseAgent):
             
             self.logger.info(f"Updated inventory for {product_id}: {current_total} -> {new_total}")
     
+    def _inventory_key(self, product_id: str) -> str:
+        """Redis key for a product's inventory snapshot."""
+        return f"{settings.a2a_topic_prefix}:inventory:{product_id}"
+    
+    async def bulk_stock(self, product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Read persisted inventory snapshots for many products in one round trip."""
+        if not self._redis or not product_ids:
+            return {}
+        
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for product_id in product_ids:
+                    pipe.hgetall(self._inventory_key(product_id))
+                results = await pipe.execute()
+        except Exception as e:
+            self.logger.error(f"Error reading inventory snapshots: {e}")
+            return {}
+        
+        return {
+            product_id: {
+                field.decode(): float(value) if field == b"last_updated" else int(value)
+                for field, value in snapshot.items()
+            }
+            for product_id, snapshot in zip(product_ids, results)
+            if snapshot
+        }
+    
+    async def _persist_inventory(self, product_ids: List[str]):
+        """Write inventory snapshots for products in one pipelined round trip."""
+        if not self._redis or not product_ids:
+            return
+        
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for product_id in product_ids:
+                    levels = self.inventory_levels.get(product_id)
+                    if levels:
+                        pipe.hset(
+                            self._inventory_key(product_id),
+                            mapping={field: float(value) if field == "last_updated" else int(value)
+                                     for field, value in levels.items()}
+                        )
+                await pipe.execute()
+        except Exception as e:
+            self.logger.error(f"Error persisting inventory snapshots: {e}")
+    
     async def _trigger_low_inventory_alert(self, product_id: str, current_stock: int):
         """Trigger low inventory alert."""
         await self.send_message("orchestrator", "event", {
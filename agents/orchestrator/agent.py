@@ -1,22 +1,54 @@
 """Orchestrator Agent - Central coordination agent for Aegis Orchestrator."""
 
 import asyncio
+import hashlib
 import logging
 import time
 from typing import Dict, List, Optional, Any
+import httpx
 import google.generativeai as genai
+import orjson
 
 from agents.base_agent import BaseAgent, AgentMessage, AgentResponse
+from agents.cache import LRUTTLCache
 from config.settings import settings
 
 
 class OrchestratorAgent(BaseAgent):
     """Central orchestrator agent that coordinates all other agents."""
     
-    def __init__(self):
+    # Constant part of the situation-analysis prompt
+    _PROMPT_PREFIX = (
+        "As the Aegis Orchestrator, analyze this situation and provide recommendations.\n"
+        "Please provide:\n"
+        "1. Analysis of the situation\n"
+        "2. Recommended actions\n"
+        "3. Which agents should be involved\n"
+        "4. Expected outcomes\n"
+        "Respond in JSON format.\n"
+        "\n"
+        "Situation: "
+    )
+    
+    # Seconds an identical situation analysis is served from cache
+    _ANALYSIS_CACHE_TTL = 300
+    _ANALYSIS_CACHE_SIZE = 10_000
+    
+    # Event types with a `_handle_<event_type>` method; ENABLED_EVENTS picks from these
+    _EVENT_TYPES = (
+        "order_created",
+        "cart_updated",
+        "inventory_low",
+        "payment_failed",
+        "shipping_delayed",
+        "user_browsing"
+    )
+    
+    def __init__(self, http: Optional[httpx.AsyncClient] = None):
         super().__init__(
             agent_id="orchestrator",
-            agent_name="orchestrator"
+            agent_name="orchestrator",
+            http=http
         )
         
         # Configure Gemini
@@ -31,15 +63,16 @@ class OrchestratorAgent(BaseAgent):
             "anomaly_resolver": "anomaly-resolver-agent"
         }
         
-        # Event handlers
-        self.event_handlers = {
-            "order_created": self._handle_order_created,
-            "cart_updated": self._handle_cart_updated,
-            "inventory_low": self._handle_inventory_low,
-            "payment_failed": self._handle_payment_failed,
-            "shipping_delayed": self._handle_shipping_delayed,
-            "user_browsing": self._handle_user_browsing
-        }
+        # Event handlers, limited to the events this deployment is configured for
+        self.event_handlers = {}
+        for event_type in settings.enabled_events:
+            if event_type not in self._EVENT_TYPES:
+                self.logger.warning(f"Ignoring unknown event type in ENABLED_EVENTS: {event_type!r}")
+                continue
+            self.event_handlers[event_type] = getattr(self, f"_handle_{event_type}")
+        
+        # Situation analyses keyed by prompt digest; callers get copies
+        self._analysis_cache = LRUTTLCache(maxsize=self._ANALYSIS_CACHE_SIZE, ttl=self._ANALYSIS_CACHE_TTL)
     
     async def initialize(self):
         """Initialize the orchestrator agent."""
@@ -79,17 +112,19 @@ class OrchestratorAgent(BaseAgent):
     async def _handle_event(self, event_data: Dict[str, Any]) -> AgentResponse:
         """Handle system events."""
         event_type = event_data.get("event_type")
+        handler = self.event_handlers.get(event_type)
         
-        if event_type in self.event_handlers:
-            try:
-                result = await self.event_handlers[event_type](event_data)
-                return AgentResponse(success=True, data=result)
-            except Exception as e:
-                self.logger.error(f"Error handling event {event_type}: {e}")
-                return AgentResponse(success=False, error=str(e))
-        else:
-            self.logger.warning(f"Unknown event type: {event_type}")
+        if handler is None:
+            # Reject early; debug level keeps unrouted events from flooding the logs
+            self.logger.debug(f"Unhandled event type: {event_type}")
             return AgentResponse(success=False, error=f"Unknown event type: {event_type}")
+        
+        try:
+            result = await handler(event_data)
+            return AgentResponse(success=True, data=result)
+        except Exception as e:
+            self.logger.error(f"Error handling event {event_type}: {e}")
+            return AgentResponse(success=False, error=str(e))
     
     async def _handle_request(self, request_data: Dict[str, Any]) -> AgentResponse:
         """Handle requests from other agents."""
@@ -149,25 +184,25 @@ class OrchestratorAgent(BaseAgent):
         order = await self.get_order(order_id)
         
         # Coordinate agents for order processing
-        tasks = []
-        
-        # Notify inventory agent to update stock
-        tasks.append(self._notify_agent("inventory", "event", {
-            "event_type": "order_created",
-            "order_id": order_id,
-            "order_data": order
-        }))
-        
-        # Notify customer comms agent to send confirmation
-        tasks.append(self._notify_agent("customer_comms", "event", {
-            "event_type": "order_created",
-            "order_id": order_id,
-            "user_id": user_id,
-            "order_data": order
-        }))
-        
-        # Wait for all tasks to complete
-        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            async with asyncio.TaskGroup() as tg:
+                # Notify inventory agent to update stock
+                tg.create_task(self._notify_agent("inventory", "event", {
+                    "event_type": "order_created",
+                    "order_id": order_id,
+                    "order_data": order
+                }))
+                
+                # Notify customer comms agent to send confirmation
+                tg.create_task(self._notify_agent("customer_comms", "event", {
+                    "event_type": "order_created",
+                    "order_id": order_id,
+                    "user_id": user_id,
+                    "order_data": order
+                }))
+        except* Exception as eg:
+            for e in eg.exceptions:
+                self.logger.error(f"Failed to notify agents for order {order_id}: {e}")
         
         return {"status": "order_processing_initiated", "order_id": order_id}
     
@@ -306,32 +341,28 @@ class OrchestratorAgent(BaseAgent):
         situation_description = request_data.get("situation_description")
         context_data = request_data.get("context_data", {})
         
-        # Create a prompt for Gemini
-        prompt = f"""
-        As the Aegis Orchestrator, analyze this situation and provide recommendations:
-        
-        Situation: {situation_description}
-        Context: {context_data}
+        # Build the prompt from the constant prefix and a compact context dump
+        ctx = orjson.dumps(context_data, default=str, option=orjson.OPT_SORT_KEYS).decode()
+        prompt = self._PROMPT_PREFIX + str(situation_description) + "\nContext: " + ctx
+        key = hashlib.blake2b(prompt.encode(), digest_size=16).digest()
         
-        Please provide:
-        1. Analysis of the situation
-        2. Recommended actions
-        3. Which agents should be involved
-        4. Expected outcomes
-        
-        Respond in JSON format.
-        """
+        # Identical situations within the TTL reuse the previous analysis
+        cached = self._analysis_cache.get(key)
+        if cached is not None:
+            return dict(cached)
         
         try:
             response = await self.model.generate_content_async(prompt)
             analysis = response.text
             
             # Parse the response (in a real implementation, you'd want better parsing)
-            return {
+            result = {
                 "status": "analysis_complete",
                 "analysis": analysis,
                 "timestamp": time.time()
             }
+            self._analysis_cache[key] = result
+            return dict(result)
         except Exception as e:
             self.logger.error(f"Error analyzing situation with Gemini: {e}")
             return {
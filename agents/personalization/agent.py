@@ -1,25 +1,186 @@
 """Personalization Agent - AI-powered recommendation engine."""
 
 import asyncio
+import hashlib
 import logging
 import time
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Awaitable, Callable, Set, Tuple
+import httpx
 import google.generativeai as genai
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import orjson
+import redis.asyncio as aioredis
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
 
 from agents.base_agent import BaseAgent, AgentMessage, AgentResponse
+from agents.cache import LRUTTLCache
+from agents.personalization.profiles import UserProfileStore
 from config.settings import settings
 
 
+def _to_json(value: Any) -> str:
+    """Serialize prompt inputs compactly."""
+    return orjson.dumps(value, default=str).decode()
+
+
+def _load_json(response_text: str) -> Any:
+    """Parse a Gemini JSON reply, tolerating Markdown code fences."""
+    text = response_text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.find("\n") + 1:] if "\n" in text else ""
+    return orjson.loads(text)
+
+
+class _JSONObjectStream:
+    """Incrementally extract complete top-level JSON objects from streamed text."""
+    
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = -1
+        self._in_string = False
+        self._escaped = False
+    
+    def feed(self, text: str) -> List[Any]:
+        """Add a chunk and return any objects it completed."""
+        self._buffer += text
+        objects = []
+        
+        for i in range(self._pos, len(self._buffer)):
+            char = self._buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif char == "}" and self._depth:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        objects.append(orjson.loads(self._buffer[self._start:i + 1]))
+                    except orjson.JSONDecodeError:
+                        pass
+        
+        self._pos = len(self._buffer)
+        return objects
+    
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+
 class PersonalizationAgent(BaseAgent):
     """AI-powered personalization agent for recommendations and dynamic pricing."""
     
-    def __init__(self):
+    # Gemini micro-batching: max prompts per batch and max wait for a batch to fill
+    _LLM_BATCH_SIZE = 16
+    _LLM_BATCH_WAIT = 0.03
+    
+    # Redis write-behind for user profiles: key TTL and batching window
+    _PROFILE_TTL = 3600
+    _PROFILE_FLUSH_INTERVAL = 0.1
+    _PRODUCTS_TTL = 60
+    _PROMPT_HISTORY = 20
+    _LLM_CACHE_SIZE = 10_000
+    _LLM_CACHE_TTL = 600
+    _RECOMMENDATION_COUNT = 5
+    
+    # Prompt templates, filled with pre-serialized JSON via format_map
+    _REC_TMPL = (
+        "As a personalization AI, recommend products for this user:\n"
+        "\n"
+        "User Profile:\n"
+        "- Browsing History: {browsing_json}\n"
+        "- Purchase History: {purchases_json}\n"
+        "- Current Cart Items: {cart_json}\n"
+        "\n"
+        "Available Products: {products_json}\n"
+        "\n"
+        "Please recommend 5 products that would be most relevant to this user.\n"
+        "Consider:\n"
+        "1. Similar products to their browsing/purchase history\n"
+        "2. Complementary products to their current cart\n"
+        "3. Popular products in their preferred categories\n"
+        "4. Products that match their price range preferences\n"
+        "\n"
+        "Respond with a JSON array of product recommendations with:\n"
+        "- product_id\n"
+        "- reason\n"
+        "- confidence_score (0-1)\n"
+        "- category\n"
+    )
+    _UPSELL_TMPL = (
+        "As a personalization AI, suggest upsell products for this cart:\n"
+        "\n"
+        "Cart Items: {cart_json}\n"
+        "User History: {purchases_json}\n"
+        "\n"
+        "Suggest 3-5 products that would be good upsells:\n"
+        "1. Higher-end versions of items in cart\n"
+        "2. Complementary accessories\n"
+        "3. Popular add-ons\n"
+        "\n"
+        "Respond with JSON array of upsell recommendations with:\n"
+        "- product_id\n"
+        "- reason\n"
+        "- confidence_score (0-1)\n"
+        "- category\n"
+    )
+    _BUNDLE_TMPL = (
+        "As a personalization AI, suggest product bundles for this cart:\n"
+        "\n"
+        "Cart Items: {cart_json}\n"
+        "\n"
+        "Suggest 2-3 bundle combinations that would:\n"
+        "1. Complete the look/style\n"
+        "2. Offer good value with discount\n"
+        "3. Include popular complementary items\n"
+        "\n"
+        "Respond with JSON array of bundle suggestions with:\n"
+        "- bundle_name\n"
+        "- products (array of product_ids)\n"
+        "- discount_percentage\n"
+        "- total_savings\n"
+        "- reasoning\n"
+    )
+    _PRICING_TMPL = (
+        "As a pricing AI, determine the optimal price for this product:\n"
+        "\n"
+        "Product ID: {product_id}\n"
+        "Base Price: ${base_price}\n"
+        "User Profile: {profile_json}\n"
+        "\n"
+        "Consider:\n"
+        "1. User's price sensitivity based on history\n"
+        "2. Product popularity and demand\n"
+        "3. Competitive positioning\n"
+        "4. Inventory levels\n"
+        "5. Seasonal factors\n"
+        "\n"
+        "Respond with JSON containing:\n"
+        "- suggested_price\n"
+        "- discount_percentage\n"
+        "- reasoning\n"
+        "- confidence_score\n"
+    )
+    
+    def __init__(self, http: Optional[httpx.AsyncClient] = None):
         super().__init__(
             agent_id="personalization-agent",
-            agent_name="personalization"
+            agent_name="personalization",
+            http=http
         )
         
         # Configure Gemini
@@ -27,13 +188,56 @@ class PersonalizationAgent(BaseAgent):
         self.model = genai.GenerativeModel(settings.gemini_model)
         
         # User profiles and preferences
-        self.user_profiles = {}
+        self.user_profiles = UserProfileStore()
         self.product_features = {}
-        self.recommendation_cache = {}
+        self.recommendation_cache = LRUTTLCache(maxsize=100_000, ttl=600)
+        
+        # LLM response cache: key -> response text. User-specific keys are
+        # indexed per user so invalidation can drop them; the index is touched
+        # whenever one of its entries is, so it is never evicted before them
+        self._llm_cache = LRUTTLCache(maxsize=self._LLM_CACHE_SIZE, ttl=self._LLM_CACHE_TTL)
+        self._llm_user_keys = LRUTTLCache(maxsize=self._LLM_CACHE_SIZE, ttl=self._LLM_CACHE_TTL)
+        self._llm_locks: Dict[str, asyncio.Lock] = {}
+        
+        # Durable profile store; profile writes are queued and flushed in batches
+        self._redis: Optional[aioredis.Redis] = None
+        self._write_queue: asyncio.Queue = asyncio.Queue()
+        
+        # Prompts queued for the micro-batching worker
+        self._llm_queue: asyncio.Queue = asyncio.Queue()
+        self._llm_worker: Optional[asyncio.Task] = None
         
-        # ML components
-        self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+        # Background work is signalled by events instead of polling
+        self._profile_dirty = asyncio.Event()
+        self._recommendations_dirty = asyncio.Event()
+        self._last_profile_flush = 0.0
+        self._stale_users: Set[str] = set()
+        
+        # ML components: hashed term counts plus running document frequencies,
+        # so catalog additions are vectorized without refitting a vocabulary
+        self.vectorizer = HashingVectorizer(
+            n_features=2 ** 14,
+            alternate_sign=False,
+            norm=None,
+            stop_words='english',
+            dtype=np.float32
+        )
+        self._product_tf = None
+        self._doc_freq = np.zeros(self.vectorizer.n_features, dtype=np.int64)
+        self._index_lock = asyncio.Lock()
         self.product_vectors = None
+        self.product_vectors_normed = None
+        self.product_ids: List[str] = []
+        self.product_index: Dict[str, int] = {}
+        self.product_catalog: Dict[str, Dict[str, Any]] = {}
+        self._products_top10_json = "[]"
+        
+        # Interned product code (shared with the profile store) -> catalog row, -1 if absent
+        self._code_rows = np.full(0, -1, dtype=np.int32)
+        
+        # Shared catalog fetch so concurrent callers hit upstream once per TTL
+        self._products_future: Optional[asyncio.Future] = None
+        self._products_fetched_at = 0.0
         
     async def initialize(self):
         """Initialize the personalization agent."""
@@ -42,7 +246,12 @@ class PersonalizationAgent(BaseAgent):
         # Load product catalog and build feature vectors
         await self._build_product_features()
         
+        # Connect to Redis for profile persistence
+        self._redis = aioredis.from_url(settings.redis_url)
+        
         # Start background tasks
+        self._llm_worker = asyncio.create_task(self._llm_batch_worker())
+        asyncio.create_task(self._redis_flusher())
         asyncio.create_task(self._update_user_profiles())
         asyncio.create_task(self._refresh_recommendations())
         
@@ -51,6 +260,23 @@ class PersonalizationAgent(BaseAgent):
     async def cleanup(self):
         """Cleanup personalization resources."""
         self.logger.info("Cleaning up Personalization Agent")
+        
+        if self._llm_worker:
+            self._llm_worker.cancel()
+            self._llm_worker = None
+        
+        # Nothing will send the queued prompts now; release their callers
+        while not self._llm_queue.empty():
+            *_, future = self._llm_queue.get_nowait()
+            future.cancel()
+        
+        if self._redis:
+            await self._redis.aclose()
+            self._redis = None
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get personalization cache metrics."""
+        return {"recommendation_cache": self.recommendation_cache.get_metrics()}
     
     async def handle_message(self, message: AgentMessage) -> Optional[AgentResponse]:
         """Handle incoming messages."""
@@ -109,6 +335,7 @@ class PersonalizationAgent(BaseAgent):
             "last_page": page,
             "timestamp": time.time()
         })
+        self._profile_dirty.set()
         
         # Generate immediate recommendations
         recommendations = await self._generate_recommendations(user_id, products_viewed)
@@ -126,6 +353,9 @@ class PersonalizationAgent(BaseAgent):
         
         self.logger.info(f"Analyzing cart for upsell opportunities for user {user_id}")
         
+        # Cart changed, so previous LLM answers for this user are stale
+        self._invalidate_llm_cache(user_id)
+        
         # Get cart items
         cart_items = cart_data.get("items", [])
         
@@ -149,6 +379,9 @@ class PersonalizationAgent(BaseAgent):
         
         self.logger.info(f"Updating preferences based on order for user {user_id}")
         
+        # Purchase history changed, so previous LLM answers for this user are stale
+        self._invalidate_llm_cache(user_id)
+        
         # Extract purchase preferences
         order_items = order_data.get("items", [])
         purchased_products = [item.get("product_id") for item in order_items]
@@ -158,6 +391,7 @@ class PersonalizationAgent(BaseAgent):
             "purchase_history": purchased_products,
             "last_purchase": time.time()
         })
+        self._profile_dirty.set()
         
         return {
             "status": "preferences_updated",
@@ -222,98 +456,427 @@ class PersonalizationAgent(BaseAgent):
         """Build product feature vectors for similarity calculations."""
         try:
             # Get all products
-            products = await self.get_products()
-            
-            # Extract product features
-            product_descriptions = []
-            product_ids = []
+            products = await self._products_cached()
             
-            for product in products:
-                product_ids.append(product.get("id"))
-                description = f"{product.get('name', '')} {product.get('description', '')} {' '.join(product.get('categories', []))}"
-                product_descriptions.append(description)
-            
-            # Build TF-IDF vectors
-            if product_descriptions:
-                self.product_vectors = self.vectorizer.fit_transform(product_descriptions)
-                self.product_features = dict(zip(product_ids, product_descriptions))
+            # Hash the whole catalog off the event loop, then swap the index in one step
+            async with self._index_lock:
+                new_products = self._dedupe_products(products, {})
+                features = None
+                if new_products:
+                    features = await asyncio.to_thread(self._vectorize_products, new_products, None, None)
                 
-                self.logger.info(f"Built feature vectors for {len(product_ids)} products")
+                self._product_tf = None
+                self._doc_freq = np.zeros(self.vectorizer.n_features, dtype=np.int64)
+                self.product_features = {}
+                self.product_ids = []
+                self.product_index = {}
+                self.product_catalog = {}
+                self._code_rows = np.full(0, -1, dtype=np.int32)
+                self._products_top10_json = "[]"
+                if features:
+                    self._apply_products(new_products, *features)
+            
+            self.logger.info(f"Built feature vectors for {len(self.product_ids)} products")
             
         except Exception as e:
             self.logger.error(f"Error building product features: {e}")
     
+    async def _ensure_product_features(self):
+        """Build the product index on first use if start-up could not."""
+        if not self.product_ids:
+            try:
+                products = await self._products_cached()
+                async with self._index_lock:
+                    new_products = self._dedupe_products(products, self.product_index)
+                    if new_products:
+                        features = await asyncio.to_thread(
+                            self._vectorize_products, new_products, self._product_tf, self._doc_freq
+                        )
+                        self._apply_products(new_products, *features)
+            except Exception as e:
+                self.logger.error(f"Error loading product catalog: {e}")
+    
+    async def _products_cached(self) -> List[Dict[str, Any]]:
+        """Get the product catalog, coalescing concurrent fetches."""
+        future = self._products_future
+        expired = time.monotonic() - self._products_fetched_at > self._PRODUCTS_TTL
+        if future is None or (future.done() and (expired or future.cancelled() or future.exception())):
+            self._products_fetched_at = time.monotonic()
+            future = self._products_future = asyncio.ensure_future(self.get_products())
+        
+        # Shield so one cancelled caller does not cancel the shared fetch
+        return await asyncio.shield(future)
+    
+    async def add_products(self, products: List[Dict[str, Any]]):
+        """Hash new products into the feature index without refitting existing rows."""
+        async with self._index_lock:
+            new_products = self._dedupe_products(products, self.product_index)
+            if new_products:
+                features = await asyncio.to_thread(
+                    self._vectorize_products, new_products, self._product_tf, self._doc_freq
+                )
+                self._apply_products(new_products, *features)
+    
+    @staticmethod
+    def _dedupe_products(products: List[Dict[str, Any]], index: Dict[str, int]) -> List[Dict[str, Any]]:
+        """Return products with an ID that is not indexed yet, first occurrence wins."""
+        seen = set(index)
+        new_products = []
+        for p in products:
+            pid = p.get("id")
+            if pid is not None and pid not in seen:
+                seen.add(pid)
+                new_products.append(p)
+        return new_products
+    
+    def _vectorize_products(self, new_products: List[Dict[str, Any]], product_tf: Optional[sp.csr_matrix],
+                            doc_freq: Optional[np.ndarray]) -> Tuple[List[str], sp.csr_matrix, np.ndarray, sp.csr_matrix]:
+        """Compute the updated feature matrices without touching agent state, so it can run in a thread."""
+        product_descriptions = [
+            f"{p.get('name', '')} {p.get('description', '')} {' '.join(p.get('categories', []))}"
+            for p in new_products
+        ]
+        
+        # Sublinear term frequencies for the delta only
+        tf = self.vectorizer.transform(product_descriptions).tocsr()
+        np.log1p(tf.data, out=tf.data)
+        doc_freq = np.bincount(tf.indices, minlength=self.vectorizer.n_features) + (
+            0 if doc_freq is None else doc_freq
+        )
+        product_tf = tf if product_tf is None else sp.vstack([product_tf, tf], format="csr")
+        
+        # Re-weight with the updated IDF (smooth, as TfidfTransformer does)
+        n_docs = product_tf.shape[0]
+        idf = (np.log((1 + n_docs) / (1 + doc_freq)) + 1).astype(np.float32)
+        weighted = product_tf.multiply(idf).tocsr()
+        
+        # L2-normalized rows make similarity a single sparse matmul
+        return product_descriptions, product_tf, doc_freq, normalize(weighted, norm='l2', copy=False)
+    
+    def _apply_products(self, new_products: List[Dict[str, Any]], product_descriptions: List[str],
+                        product_tf: sp.csr_matrix, doc_freq: np.ndarray, product_vectors: sp.csr_matrix):
+        """Install vectorized products into the index."""
+        product_ids = [p.get("id") for p in new_products]
+        self._product_tf = product_tf
+        self._doc_freq = doc_freq
+        
+        offset = len(self.product_ids)
+        self.product_ids.extend(product_ids)
+        self.product_index.update({pid: offset + i for i, pid in enumerate(product_ids)})
+        self.product_catalog.update(zip(product_ids, new_products))
+        self.product_features.update(zip(product_ids, product_descriptions))
+        
+        codes = np.array([self.user_profiles.intern(pid) for pid in product_ids], dtype=np.int32)
+        if codes.max() >= self._code_rows.shape[0]:
+            grown = np.full(max(codes.max() + 1, self._code_rows.shape[0] * 2), -1, dtype=np.int32)
+            grown[:self._code_rows.shape[0]] = self._code_rows
+            self._code_rows = grown
+        self._code_rows[codes] = np.arange(offset, offset + len(product_ids), dtype=np.int32)
+        self._products_top10_json = _to_json(
+            [self.product_catalog[pid].get("name") for pid in self.product_ids[:10]]
+        )
+        self.product_vectors = product_vectors
+        self.product_vectors_normed = product_vectors
+    
     async def _update_user_profile(self, user_id: str, data: Dict[str, Any]):
         """Update user profile with new data."""
-        if user_id not in self.user_profiles:
-            self.user_profiles[user_id] = {
-                "browsing_history": [],
-                "purchase_history": [],
-                "preferences": {},
-                "created_at": time.time()
-            }
+        # Merge into the persisted profile, or the next flush would overwrite it
+        if user_id not in self.user_profiles and self._redis:
+            await self._load_user_profile(user_id)
+        self.user_profiles.update(user_id, data)
         
-        # Update profile
-        for key, value in data.items():
-            if key in ["browsing_history", "purchase_history"]:
-                # Append to lists
-                if key not in self.user_profiles[user_id]:
-                    self.user_profiles[user_id][key] = []
-                self.user_profiles[user_id][key].extend(value if isinstance(value, list) else [value])
-            else:
-                self.user_profiles[user_id][key] = value
-        
-        # Update timestamp
-        self.user_profiles[user_id]["last_updated"] = time.time()
+        # Persist off the request path
+        if self._redis:
+            self._write_queue.put_nowait(user_id)
     
     async def _get_user_profile(self, user_id: str) -> Dict[str, Any]:
         """Get user profile, creating if doesn't exist."""
-        if user_id not in self.user_profiles:
-            self.user_profiles[user_id] = {
-                "browsing_history": [],
-                "purchase_history": [],
-                "preferences": {},
-                "created_at": time.time()
-            }
+        if user_id not in self.user_profiles and self._redis:
+            await self._load_user_profile(user_id)
         
+        self.user_profiles.ensure(user_id)
         return self.user_profiles[user_id]
     
+    def _profile_key(self, user_id: str) -> str:
+        """Redis key for a persisted user profile."""
+        return f"{settings.a2a_topic_prefix}:user_profile:{user_id}"
+    
+    async def _load_user_profile(self, user_id: str):
+        """Load a persisted profile from Redis into memory."""
+        try:
+            raw = await self._redis.get(self._profile_key(user_id))
+        except Exception as e:
+            self.logger.error(f"Error loading profile for user {user_id}: {e}")
+            return
+        
+        if raw:
+            profile = orjson.loads(raw)
+            for key in ("created_at", "last_updated"):
+                profile.pop(key, None)
+            self.user_profiles.update(user_id, profile)
+    
+    async def _redis_flusher(self):
+        """Background task that writes changed profiles to Redis in batches."""
+        while self.is_running:
+            try:
+                # Wait for a write, then let the batch fill for the flush interval
+                user_ids = {await self._write_queue.get()}
+                await asyncio.sleep(self._PROFILE_FLUSH_INTERVAL)
+                while not self._write_queue.empty():
+                    user_ids.add(self._write_queue.get_nowait())
+                
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for user_id in user_ids:
+                        pipe.setex(
+                            self._profile_key(user_id),
+                            self._PROFILE_TTL,
+                            orjson.dumps(self.user_profiles[user_id], default=str)
+                        )
+                    await pipe.execute()
+            except Exception as e:
+                self.logger.error(f"Error persisting user profiles: {e}")
+    
+    def _profile_fingerprint(self, user_profile: Dict[str, Any]) -> str:
+        """Return the profile hash the store maintains on every mutation."""
+        fingerprint = user_profile.get("_fingerprint")
+        if fingerprint:
+            return fingerprint
+        
+        # Profiles that did not come from the store are hashed on demand
+        raw = repr((
+            sorted({str(item) for item in user_profile.get("browsing_history", [])}),
+            sorted({str(item) for item in user_profile.get("purchase_history", [])}),
+            sorted(user_profile.get("preferences", {}).items())
+        ))
+        return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+    
+    def _history_json(self, history: List[Any]) -> str:
+        """Serialize the most recent distinct history items in a stable order."""
+        recent = list(dict.fromkeys(reversed(history)))[:self._PROMPT_HISTORY]
+        return _to_json(sorted(recent, key=str))
+    
+    @staticmethod
+    def _item_ids(items: List[Any]) -> List[str]:
+        """Extract product IDs from cart item dicts or plain ID lists."""
+        return [item.get("product_id") if isinstance(item, dict) else item for item in items]
+    
+    def _llm_cache_key(self, template_id: str, user_id: Optional[str],
+                       item_ids: List[str], *extra: Any) -> str:
+        """Build the LLM cache key for a prompt template and its inputs."""
+        profile = self.user_profiles.get(user_id) if user_id else None
+        profile_hash = self._profile_fingerprint(profile) if profile else ""
+        raw = (
+            f"{template_id}|{sorted(str(i) for i in item_ids)}|{profile_hash}|{extra}|"
+            f"{settings.gemini_model}|{user_id}"
+        )
+        return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    
+    def _invalidate_llm_cache(self, user_id: str):
+        """Drop cached LLM responses for a user."""
+        for key in self._llm_user_keys.pop(user_id) or ():
+            self._llm_cache.pop(key)
+    
+    def _llm_cache_get(self, key: str, user_id: Optional[str]) -> Optional[str]:
+        """Read a cached LLM answer, keeping its user's key index as recent as it."""
+        response_text = self._llm_cache.get(key)
+        if response_text is not None and user_id:
+            self._llm_user_keys.get(user_id)
+        return response_text
+    
+    async def _cached_llm(self, key: str, prompt: str, user_id: Optional[str] = None,
+                          generate: Optional[Callable[[str], Awaitable[str]]] = None) -> str:
+        """Return the LLM response text for a prompt, reusing cached answers.
+        
+        Pass `user_id` for answers that `_invalidate_llm_cache` should drop.
+        """
+        response_text = self._llm_cache_get(key, user_id)
+        if response_text is not None:
+            return response_text
+        
+        # Coalesce concurrent identical requests into a single LLM call
+        lock = self._llm_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                response_text = self._llm_cache_get(key, user_id)
+                if response_text is not None:
+                    return response_text
+                
+                response_text = await (generate or self._generate_text)(prompt)
+                self._llm_cache[key] = response_text
+                if user_id:
+                    keys = self._llm_user_keys.get(user_id) or set()
+                    keys.add(key)
+                    self._llm_user_keys[user_id] = keys
+        finally:
+            # Drop the lock on every exit path, unless a newer caller already replaced it
+            if self._llm_locks.get(key) is lock:
+                del self._llm_locks[key]
+        
+        return response_text
+    
+    async def _generate_text(self, prompt: str, stream_limit: Optional[int] = None) -> str:
+        """Send a prompt to Gemini through the micro-batching queue.
+        
+        With `stream_limit`, the reply is streamed and cut off after that many JSON objects.
+        """
+        if self._llm_worker is None:
+            return await self._call_model(prompt, stream_limit)
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._llm_queue.put((prompt, stream_limit, future))
+        return await future
+    
+    async def _call_model(self, prompt: str, stream_limit: Optional[int] = None) -> str:
+        """Make one Gemini call and return the reply text."""
+        if stream_limit:
+            return await self._stream_json_items(prompt, stream_limit)
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+    
+    async def _stream_json_items(self, prompt: str, limit: int) -> str:
+        """Stream a Gemini reply and stop reading once `limit` product objects arrived."""
+        response = await self.model.generate_content_async(prompt, stream=True)
+        stream = _JSONObjectStream()
+        items: List[Any] = []
+        
+        try:
+            async for chunk in response:
+                items.extend(
+                    item for item in stream.feed(chunk.text)
+                    if isinstance(item, dict) and "product_id" in item
+                )
+                if len(items) >= limit:
+                    break
+        finally:
+            # Stop the underlying HTTP stream when we cut the reply short
+            close = getattr(response, "aclose", None) or getattr(response, "close", None)
+            if close:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+        
+        # Replies without product objects (e.g. a wrapper object) go to the parser as-is
+        return _to_json(items[:limit]) if items else stream.text
+    
+    async def _llm_batch_worker(self):
+        """Background task that sends queued prompts to Gemini in micro-batches.
+        
+        Identical prompts queued within one window share a single model call.
+        """
+        loop = asyncio.get_running_loop()
+        
+        while self.is_running:
+            batch: List[Tuple[str, Optional[int], asyncio.Future]] = []
+            try:
+                # Block for the first prompt, then give the batch a short window to fill
+                batch.append(await self._llm_queue.get())
+                deadline = loop.time() + self._LLM_BATCH_WAIT
+                
+                while len(batch) < self._LLM_BATCH_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._llm_queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                waiters: Dict[Tuple[str, Optional[int]], List[asyncio.Future]] = {}
+                for prompt, stream_limit, future in batch:
+                    waiters.setdefault((prompt, stream_limit), []).append(future)
+                
+                results = await asyncio.gather(
+                    *(self._call_model(prompt, stream_limit) for prompt, stream_limit in waiters),
+                    return_exceptions=True
+                )
+                
+                for futures, result in zip(waiters.values(), results):
+                    for future in futures:
+                        if future.done():
+                            continue
+                        if isinstance(result, BaseException):
+                            future.set_exception(result)
+                        else:
+                            future.set_result(result)
+            except Exception as e:
+                self.logger.error(f"Error in LLM batch worker: {e}")
+            finally:
+                # On cancellation or an unexpected error, callers must not wait forever
+                for *_, future in batch:
+                    if not future.done():
+                        future.cancel()
+    
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """Return indices of the k highest scores, best first, sorting only the winners."""
+        neg = -scores
+        if k < neg.shape[0]:
+            idx = np.argpartition(neg, k)[:k]
+        else:
+            idx = np.arange(neg.shape[0])
+        return idx[np.argsort(neg[idx], kind="stable")]
+    
+    def _fast_recommend(self, user_id: str, k: int = 5,
+                        extra_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Rank products by TF-IDF similarity to the user's history."""
+        if self.product_vectors_normed is None:
+            return []
+        
+        # History is stored as interned codes, so mapping to catalog rows is one gather
+        codes = np.concatenate([
+            self.user_profiles.history_codes(user_id, "browsing_history"),
+            self.user_profiles.history_codes(user_id, "purchase_history")
+        ])
+        rows = self._code_rows[codes[codes < self._code_rows.shape[0]]]
+        extra_rows = [self.product_index[pid] for pid in extra_ids or [] if pid in self.product_index]
+        idx = np.union1d(rows[rows >= 0], np.array(extra_rows, dtype=np.int32))
+        if not idx.size:
+            return []
+        
+        # Keep the query sparse so both products run as CSR matmuls
+        vectors = self.product_vectors_normed
+        user_vec = sp.csr_matrix(
+            (np.full(idx.size, 1.0 / idx.size, dtype=np.float32), (np.zeros(idx.size, dtype=np.int32), idx)),
+            shape=(1, vectors.shape[0])
+        ) @ vectors
+        scores = (vectors @ user_vec.T).toarray().ravel()
+        scores[idx] = -np.inf  # Don't recommend what the user already has
+        
+        recommendations = []
+        for i in self._top_k(scores, k):
+            if scores[i] <= 0:
+                break
+            product_id = self.product_ids[i]
+            product = self.product_catalog.get(product_id, {})
+            categories = product.get("categories") or ["General"]
+            recommendations.append({
+                "product_id": product_id,
+                "name": product.get("name"),
+                "price": product.get("price_usd", {}).get("currencyCode", "USD"),
+                "reason": "Similar to products you viewed",
+                "confidence_score": float(scores[i]),
+                "category": categories[0]
+            })
+        
+        return recommendations
+    
     async def _generate_recommendations(self, user_id: str, current_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Generate personalized recommendations using AI and ML."""
         try:
             # Get user profile
             user_profile = await self._get_user_profile(user_id)
+            item_ids = self._item_ids(current_items)
             
-            # Get all products
-            products = await self.get_products()
-            
-            # Use Gemini to generate recommendations
-            prompt = f"""
-            As a personalization AI, recommend products for this user:
-            
-            User Profile:
-            - Browsing History: {user_profile.get('browsing_history', [])}
-            - Purchase History: {user_profile.get('purchase_history', [])}
-            - Current Cart Items: {[item.get('product_id') for item in current_items]}
-            
-            Available Products: {[p.get('name') for p in products[:10]]}
-            
-            Please recommend 5 products that would be most relevant to this user.
-            Consider:
-            1. Similar products to their browsing/purchase history
-            2. Complementary products to their current cart
-            3. Popular products in their preferred categories
-            4. Products that match their price range preferences
-            
-            Respond with a JSON array of product recommendations with:
-            - product_id
-            - reason
-            - confidence_score (0-1)
-            - category
-            """
+            # Without cart context the background-refreshed recommendations are still valid
+            if not item_ids:
+                cached = self.recommendation_cache.get(user_id)
+                if cached:
+                    return cached["recommendations"]
             
-            response = await self.model.generate_content_async(prompt)
-            recommendations = self._parse_recommendations(response.text, products)
+            # Rank by similarity when the user has known history; no LLM round trip
+            recommendations = self._fast_recommend(user_id, 5, item_ids)
+            if not recommendations:
+                recommendations = await self._generate_llm_recommendations(user_id, user_profile, item_ids)
             
             # Cache recommendations
             self.recommendation_cache[user_id] = {
@@ -327,29 +890,43 @@ class PersonalizationAgent(BaseAgent):
             self.logger.error(f"Error generating recommendations: {e}")
             return []
     
+    async def _generate_llm_recommendations(self, user_id: str, user_profile: Dict[str, Any],
+                                            item_ids: List[str]) -> List[Dict[str, Any]]:
+        """Generate recommendations with Gemini for users without usable history."""
+        await self._ensure_product_features()
+        
+        # Use Gemini to generate recommendations
+        prompt = self._REC_TMPL.format_map({
+            "browsing_json": self._history_json(user_profile.get("browsing_history", [])),
+            "purchases_json": self._history_json(user_profile.get("purchase_history", [])),
+            "cart_json": _to_json(item_ids),
+            "products_json": self._products_top10_json
+        })
+        
+        key = self._llm_cache_key("recommendations", user_id, item_ids)
+        response_text = await self._cached_llm(
+            key, prompt, user_id, generate=lambda p: self._generate_text(p, self._RECOMMENDATION_COUNT)
+        )
+        return self._parse_recommendations(response_text)
+    
     async def _generate_upsell_recommendations(self, user_id: str, cart_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Generate upsell recommendations for cart items."""
         try:
             # Get user profile
             user_profile = await self._get_user_profile(user_id)
             
-            # Use Gemini to generate upsell recommendations
-            prompt = f"""
-            As a personalization AI, suggest upsell products for this cart:
-            
-            Cart Items: {[item.get('product_id') for item in cart_items]}
-            User History: {user_profile.get('purchase_history', [])}
+            item_ids = self._item_ids(cart_items)
             
-            Suggest 3-5 products that would be good upsells:
-            1. Higher-end versions of items in cart
-            2. Complementary accessories
-            3. Popular add-ons
-            
-            Respond with JSON array of upsell recommendations.
-            """
+            # Use Gemini to generate upsell recommendations
+            prompt = self._UPSELL_TMPL.format_map({
+                "cart_json": _to_json(item_ids),
+                "purchases_json": self._history_json(user_profile.get("purchase_history", []))
+            })
             
-            response = await self.model.generate_content_async(prompt)
-            upsells = self._parse_recommendations(response.text, await self.get_products())
+            key = self._llm_cache_key("upsell", user_id, item_ids)
+            response_text = await self._cached_llm(key, prompt, user_id)
+            await self._ensure_product_features()
+            upsells = self._parse_recommendations(response_text)
             
             return upsells
             
@@ -360,27 +937,15 @@ class PersonalizationAgent(BaseAgent):
     async def _generate_bundle_suggestions(self, user_id: str, cart_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Generate bundle suggestions for cart items."""
         try:
-            # Use Gemini to generate bundle suggestions
-            prompt = f"""
-            As a personalization AI, suggest product bundles for this cart:
-            
-            Cart Items: {[item.get('product_id') for item in cart_items]}
-            
-            Suggest 2-3 bundle combinations that would:
-            1. Complete the look/style
-            2. Offer good value with discount
-            3. Include popular complementary items
+            item_ids = self._item_ids(cart_items)
             
-            Respond with JSON array of bundle suggestions with:
-            - bundle_name
-            - products (array of product_ids)
-            - discount_percentage
-            - total_savings
-            - reasoning
-            """
+            # Use Gemini to generate bundle suggestions
+            prompt = self._BUNDLE_TMPL.format_map({"cart_json": _to_json(item_ids)})
             
-            response = await self.model.generate_content_async(prompt)
-            bundles = self._parse_bundle_suggestions(response.text)
+            # Bundles depend only on the cart contents, so share them across users
+            key = self._llm_cache_key("bundles", None, item_ids)
+            response_text = await self._cached_llm(key, prompt)
+            bundles = self._parse_bundle_suggestions(response_text)
             
             return bundles
             
@@ -391,29 +956,17 @@ class PersonalizationAgent(BaseAgent):
     async def _determine_pricing_strategy(self, user_profile: Dict[str, Any], product_id: str, base_price: float) -> Dict[str, Any]:
         """Determine dynamic pricing strategy using AI."""
         try:
-            prompt = f"""
-            As a pricing AI, determine the optimal price for this product:
-            
-            Product ID: {product_id}
-            Base Price: ${base_price}
-            User Profile: {user_profile}
+            prompt = self._PRICING_TMPL.format_map({
+                "product_id": product_id,
+                "base_price": base_price,
+                "profile_json": _to_json({k: v for k, v in user_profile.items() if k != "_fingerprint"})
+            })
             
-            Consider:
-            1. User's price sensitivity based on history
-            2. Product popularity and demand
-            3. Competitive positioning
-            4. Inventory levels
-            5. Seasonal factors
-            
-            Respond with JSON containing:
-            - suggested_price
-            - discount_percentage
-            - reasoning
-            - confidence_score
-            """
-            
-            response = await self.model.generate_content_async(prompt)
-            pricing = self._parse_pricing_strategy(response.text, base_price)
+            key = self._llm_cache_key(
+                "pricing", None, [product_id], self._profile_fingerprint(user_profile), base_price
+            )
+            response_text = await self._cached_llm(key, prompt)
+            pricing = self._parse_pricing_strategy(response_text, base_price)
             
             return pricing
             
@@ -421,25 +974,49 @@ class PersonalizationAgent(BaseAgent):
             self.logger.error(f"Error determining pricing strategy: {e}")
             return {"price": base_price, "discount_percentage": 0, "reasoning": "Error in pricing calculation"}
     
-    def _parse_recommendations(self, response_text: str, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _parse_recommendations(self, response_text: str) -> List[Dict[str, Any]]:
         """Parse AI response into recommendation format."""
         try:
-            # Simple parsing - in production, use proper JSON parsing
-            recommendations = []
+            product_lookup = self.product_catalog
+            
+            try:
+                parsed = _load_json(response_text)
+            except orjson.JSONDecodeError:
+                parsed = None
+            
+            if isinstance(parsed, dict):
+                # Unwrap replies like {"recommendations": [...]}
+                parsed = next((value for value in parsed.values() if isinstance(value, list)), None)
             
-            # Create product lookup
-            product_lookup = {p.get("id"): p for p in products}
+            if not isinstance(parsed, list):
+                # Unparseable reply: fall back to the head of the catalog
+                parsed = [
+                    {"product_id": pid, "reason": "AI-generated recommendation", "confidence_score": 0.8}
+                    for pid in self.product_ids[:self._RECOMMENDATION_COUNT]
+                ]
             
-            # For now, return some mock recommendations
-            # In production, parse the actual AI response
-            for product in products[:5]:
+            recommendations = []
+            for item in parsed:
+                if not isinstance(item, dict):
+                    continue
+                
+                # Drop products the model made up
+                product = product_lookup.get(item.get("product_id"))
+                if product is None:
+                    continue
+                
+                try:
+                    confidence = min(max(float(item.get("confidence_score", 0.8)), 0.0), 1.0)
+                except (TypeError, ValueError):
+                    confidence = 0.8
+                
                 recommendations.append({
                     "product_id": product.get("id"),
                     "name": product.get("name"),
                     "price": product.get("price_usd", {}).get("currencyCode", "USD"),
-                    "reason": "AI-generated recommendation",
-                    "confidence_score": 0.8,
-                    "category": product.get("categories", [""])[0] if product.get("categories") else "General"
+                    "reason": str(item.get("reason") or "AI-generated recommendation"),
+                    "confidence_score": confidence,
+                    "category": item.get("category") or (product.get("categories") or ["General"])[0]
                 })
             
             return recommendations
@@ -451,6 +1028,24 @@ class PersonalizationAgent(BaseAgent):
     def _parse_bundle_suggestions(self, response_text: str) -> List[Dict[str, Any]]:
         """Parse AI response into bundle format."""
         try:
+            try:
+                parsed = _load_json(response_text)
+            except orjson.JSONDecodeError:
+                parsed = None
+            
+            if isinstance(parsed, list):
+                return [
+                    {
+                        "bundle_name": str(bundle.get("bundle_name", "Bundle")),
+                        "products": [str(pid) for pid in bundle.get("products", [])],
+                        "discount_percentage": float(bundle.get("discount_percentage", 0)),
+                        "total_savings": float(bundle.get("total_savings", 0)),
+                        "reasoning": str(bundle.get("reasoning", ""))
+                    }
+                    for bundle in parsed
+                    if isinstance(bundle, dict) and isinstance(bundle.get("products"), list)
+                ]
+            
             # Mock bundle suggestions
             return [
                 {
@@ -468,6 +1063,19 @@ class PersonalizationAgent(BaseAgent):
     def _parse_pricing_strategy(self, response_text: str, base_price: float) -> Dict[str, Any]:
         """Parse AI response into pricing strategy."""
         try:
+            try:
+                parsed = _load_json(response_text)
+            except orjson.JSONDecodeError:
+                parsed = None
+            
+            if isinstance(parsed, dict) and "suggested_price" in parsed:
+                return {
+                    "price": float(parsed["suggested_price"]),
+                    "discount_percentage": float(parsed.get("discount_percentage", 0)),
+                    "reasoning": str(parsed.get("reasoning", "")),
+                    "confidence_score": float(parsed.get("confidence_score", 0.8))
+                }
+            
             # Mock pricing strategy
             return {
                 "price": base_price * 0.9,  # 10% discount
@@ -483,20 +1091,47 @@ class PersonalizationAgent(BaseAgent):
         """Background task to update user profiles."""
         while self.is_running:
             try:
-                # Update user profiles based on recent activity
-                # This would analyze user behavior and update preferences
-                await asyncio.sleep(300)  # Update every 5 minutes
+                # Sleep until a profile changes; idle agents do no work
+                try:
+                    await asyncio.wait_for(self._profile_dirty.wait(), timeout=300)
+                except asyncio.TimeoutError:
+                    continue
+                
+                self._profile_dirty.clear()
+                await self._flush_profiles()
             except Exception as e:
                 self.logger.error(f"Error updating user profiles: {e}")
                 await asyncio.sleep(60)
     
+    async def _flush_profiles(self):
+        """Process all profiles changed since the last flush in one batch."""
+        since, self._last_profile_flush = self._last_profile_flush, time.time()
+        changed = self.user_profiles.active_user_ids(since)
+        
+        if changed:
+            self._stale_users.update(changed)
+            self._recommendations_dirty.set()
+    
     async def _refresh_recommendations(self):
         """Background task to refresh recommendation cache."""
         while self.is_running:
             try:
-                # Refresh recommendations for active users
-                # This would update the recommendation cache
-                await asyncio.sleep(600)  # Refresh every 10 minutes
+                # Sleep until profile changes make cached recommendations stale
+                try:
+                    await asyncio.wait_for(self._recommendations_dirty.wait(), timeout=600)
+                except asyncio.TimeoutError:
+                    continue
+                
+                self._recommendations_dirty.clear()
+                stale_users, self._stale_users = self._stale_users, set()
+                
+                for user_id in stale_users:
+                    recommendations = self._fast_recommend(user_id)
+                    if recommendations:
+                        self.recommendation_cache[user_id] = {
+                            "recommendations": recommendations,
+                            "timestamp": time.time()
+                        }
             except Exception as e:
                 self.logger.error(f"Error refreshing recommendations: {e}")
                 await asyncio.sleep(60)
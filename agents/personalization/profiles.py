@@ -0,0 +1,178 @@
+"""Struct-of-arrays storage for personalization user profiles."""
+
+import hashlib
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    """Return an array with room for at least `size` elements."""
+    if size <= array.shape[0]:
+        return array
+    grown = np.zeros(max(size, array.shape[0] * 2), dtype=array.dtype)
+    grown[:array.shape[0]] = array
+    return grown
+
+
+class _HistoryRing:
+    """Fixed-size per-user ring buffers of item codes, one row per user."""
+
+    def __init__(self, maxlen: int, capacity: int = 1024):
+        self.maxlen = maxlen
+        self.items = np.zeros((capacity, maxlen), dtype=np.int32)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+
+    def append(self, row: int, codes: List[int]):
+        if row >= self.items.shape[0]:
+            grown = np.zeros((max(row + 1, self.items.shape[0] * 2), self.maxlen), dtype=np.int32)
+            grown[:self.items.shape[0]] = self.items
+            self.items = grown
+            self.counts = _grow(self.counts, grown.shape[0])
+
+        # Only the newest maxlen codes can survive the write
+        codes = codes[-self.maxlen:]
+        count = int(self.counts[row])
+        positions = (count + np.arange(len(codes))) % self.maxlen
+        self.items[row, positions] = codes
+        self.counts[row] = count + len(codes)
+
+    def items_for(self, row: int) -> np.ndarray:
+        if row >= self.items.shape[0]:
+            return self.items[:0, 0]
+        count = int(self.counts[row])
+        if count <= self.maxlen:
+            return self.items[row, :count]
+        start = count % self.maxlen
+        return np.concatenate((self.items[row, start:], self.items[row, :start]))
+
+
+class UserProfileStore:
+    """User profiles stored as parallel NumPy arrays.
+
+    Each user owns a dense row; scalar timestamps live in one float64 array
+    per field and each history field keeps the most recent product codes in
+    a fixed-size ring buffer per user, so memory per user stays bounded and
+    scans across all users are vector operations instead of dict walks.
+    Profiles are still read as plain dicts through `get`/`[]`.
+    """
+
+    HISTORY_FIELDS = ("browsing_history", "purchase_history")
+    HISTORY_MAXLEN = 100
+
+    def __init__(self, capacity: int = 1024):
+        self._uid_to_row: Dict[str, int] = {}
+        self._row_uids: List[str] = []
+        self._created_at = np.zeros(capacity, dtype=np.float64)
+        self._last_updated = np.zeros(capacity, dtype=np.float64)
+        self._last_purchase = np.zeros(capacity, dtype=np.float64)
+        self._extras: List[Dict[str, Any]] = []
+        self._fingerprints: List[str] = []
+
+        # Product IDs are interned to int32 codes for the history columns
+        self._item_codes: Dict[str, int] = {}
+        self._item_ids: List[Any] = []
+        self._history = {
+            field: _HistoryRing(self.HISTORY_MAXLEN, capacity) for field in self.HISTORY_FIELDS
+        }
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._uid_to_row
+
+    def __len__(self) -> int:
+        return len(self._row_uids)
+
+    def __getitem__(self, user_id: str) -> Dict[str, Any]:
+        return self._view(self._uid_to_row[user_id])
+
+    def get(self, user_id: str, default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Return the profile dict for a user, or `default` if unknown."""
+        row = self._uid_to_row.get(user_id)
+        return default if row is None else self._view(row)
+
+    def ensure(self, user_id: str) -> int:
+        """Return the row for a user, creating an empty profile if needed."""
+        row = self._uid_to_row.get(user_id)
+        if row is not None:
+            return row
+
+        row = len(self._row_uids)
+        self._uid_to_row[user_id] = row
+        self._row_uids.append(user_id)
+        self._created_at = _grow(self._created_at, row + 1)
+        self._last_updated = _grow(self._last_updated, row + 1)
+        self._last_purchase = _grow(self._last_purchase, row + 1)
+        self._created_at[row] = time.time()
+        self._extras.append({"preferences": {}})
+        self._fingerprints.append(self._fingerprint(row))
+        return row
+
+    def update(self, user_id: str, data: Dict[str, Any]):
+        """Merge new data into a user's profile; history fields are appended."""
+        row = self.ensure(user_id)
+
+        for key, value in data.items():
+            if key in self._history:
+                values = value if isinstance(value, list) else [value]
+                self._history[key].append(row, [self.intern(v) for v in values])
+            elif key == "last_purchase":
+                self._last_purchase[row] = value
+            elif key != "_fingerprint":
+                self._extras[row][key] = value
+
+        self._last_updated[row] = time.time()
+        self._fingerprints[row] = self._fingerprint(row)
+
+    def history(self, user_id: str, field: str) -> List[Any]:
+        """Return a user's history field as a list of product IDs."""
+        row = self._uid_to_row.get(user_id)
+        if row is None:
+            return []
+        return self._history_for_row(row, field)
+
+    def history_codes(self, user_id: str, field: str) -> np.ndarray:
+        """Return a user's history field as interned product codes."""
+        row = self._uid_to_row.get(user_id)
+        if row is None:
+            return np.zeros(0, dtype=np.int32)
+        return self._history[field].items_for(row)
+
+    def active_user_ids(self, since: float) -> List[str]:
+        """Return users whose profile changed after `since`."""
+        active = np.nonzero(self._last_updated[:len(self._row_uids)] > since)[0]
+        return [self._row_uids[row] for row in active]
+
+    def intern(self, item_id: Any) -> int:
+        """Return the int32 code for a product ID, assigning one if new."""
+        code = self._item_codes.get(item_id)
+        if code is None:
+            code = len(self._item_ids)
+            self._item_codes[item_id] = code
+            self._item_ids.append(item_id)
+        return code
+
+    def _fingerprint(self, row: int) -> str:
+        """Order-insensitive hash of the history and preferences of a row."""
+        parts = [
+            "|".join(sorted({str(item) for item in self._history_for_row(row, field)}))
+            for field in self.HISTORY_FIELDS
+        ]
+        parts.append(repr(sorted(self._extras[row].get("preferences", {}).items())))
+        return hashlib.blake2b("||".join(parts).encode(), digest_size=8).hexdigest()
+
+    def _history_for_row(self, row: int, field: str) -> List[Any]:
+        item_ids = self._item_ids
+        return [item_ids[code] for code in self._history[field].items_for(row)]
+
+    def _view(self, row: int) -> Dict[str, Any]:
+        profile = dict(self._extras[row])
+        for field in self.HISTORY_FIELDS:
+            profile[field] = self._history_for_row(row, field)
+        profile["_fingerprint"] = self._fingerprints[row]
+        profile["created_at"] = float(self._created_at[row])
+        if self._last_updated[row]:
+            profile["last_updated"] = float(self._last_updated[row])
+        if self._last_purchase[row]:
+            profile["last_purchase"] = float(self._last_purchase[row])
+        return profile
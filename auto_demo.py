@@ -3,15 +3,21 @@
 
 import asyncio
 import logging
+import random
 import sys
 import time
-import json
+from collections import Counter
+from copy import deepcopy
+from itertools import chain
+from types import MappingProxyType
 from typing import Dict, Any, List
-from unittest.mock import AsyncMock, MagicMock, patch, Mock
+
+import numpy as np
 
 # Set test environment variables
 import os
-os.environ["GEMINI_API_KEY"] = "test_api_key_for_demo"
+_USE_REAL_AI = bool(os.environ.get("GEMINI_API_KEY")) and os.environ.get("AEGIS_MOCK_AI") != "1"
+os.environ.setdefault("GEMINI_API_KEY", "test_api_key_for_demo")
 os.environ["GEMINI_MODEL"] = "gemini-1.5-pro"
 os.environ["API_HOST"] = "0.0.0.0"
 os.environ["API_PORT"] = "8000"
@@ -31,11 +37,99 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Mock Google AI modules before any imports
-sys.modules['google.generativeai'] = Mock()
-sys.modules['google.generativeai'].configure = Mock()
-sys.modules['google.generativeai'].GenerativeModel = Mock()
-sys.modules['google.generativeai'].GenerativeModel.return_value.generate_content_async = AsyncMock()
+# Mock Google AI modules before any imports, unless a real API key is configured
+if not _USE_REAL_AI:
+    from unittest.mock import AsyncMock, Mock
+    
+    sys.modules['google.generativeai'] = Mock()
+    sys.modules['google.generativeai'].configure = Mock()
+    sys.modules['google.generativeai'].GenerativeModel = Mock()
+    sys.modules['google.generativeai'].GenerativeModel.return_value.generate_content_async = AsyncMock()
+
+_BAR = "=" * 80
+_SECTION_BAR = "=" * 60
+_SUB = "-" * 40
+_SUB_SHORT = "-" * 30
+
+# Sample data, built once at import; instances deep-copy what they mutate
+_USER_PROFILES = MappingProxyType({
+    "demo-user-1": {
+        "name": "Demo User 1",
+        "browsing_history": ["casual-wear", "sweaters", "denim", "shoes"],
+        "purchase_history": ["blue-jeans", "white-sneakers", "red-dress"],
+        "preferences": {"style": "casual", "colors": ["yellow", "blue", "red"]},
+        "loyalty_tier": "gold"
+    },
+    "demo-user-2": {
+        "name": "Demo User 2",
+        "browsing_history": ["electronics", "gadgets", "accessories"],
+        "purchase_history": ["wireless-mouse", "laptop-stand"],
+        "preferences": {"style": "tech", "colors": ["black", "silver"]},
+        "loyalty_tier": "silver"
+    },
+    "demo-user-3": {
+        "name": "Demo User 3",
+        "browsing_history": ["formal-wear", "jewelry", "handbags"],
+        "purchase_history": ["pearl-necklace", "black-heels"],
+        "preferences": {"style": "elegant", "colors": ["black", "white", "gold"]},
+        "loyalty_tier": "platinum"
+    }
+})
+
+_INVENTORY = MappingProxyType({
+    "yellow-sweater": {
+        "name": "Yellow Cashmere Sweater",
+        "price": 89.99,
+        "warehouses": {
+            "east-coast": {"stock": 15, "threshold": 10},
+            "west-coast": {"stock": 8, "threshold": 10},
+            "central": {"stock": 25, "threshold": 10}
+        },
+        "category": "sweaters",
+        "tags": ["casual", "warm", "yellow"]
+    },
+    "denim-jeans": {
+        "name": "Classic Blue Denim Jeans",
+        "price": 79.99,
+        "warehouses": {
+            "east-coast": {"stock": 5, "threshold": 10},
+            "west-coast": {"stock": 30, "threshold": 10},
+            "central": {"stock": 12, "threshold": 10}
+        },
+        "category": "denim",
+        "tags": ["casual", "blue", "jeans"]
+    },
+    "white-sneakers": {
+        "name": "White Canvas Sneakers",
+        "price": 59.99,
+        "warehouses": {
+            "east-coast": {"stock": 20, "threshold": 10},
+            "west-coast": {"stock": 15, "threshold": 10},
+            "central": {"stock": 8, "threshold": 10}
+        },
+        "category": "shoes",
+        "tags": ["casual", "white", "sneakers"]
+    },
+    "wireless-mouse": {
+        "name": "Wireless Gaming Mouse",
+        "price": 49.99,
+        "warehouses": {
+            "east-coast": {"stock": 3, "threshold": 10},
+            "west-coast": {"stock": 18, "threshold": 10},
+            "central": {"stock": 22, "threshold": 10}
+        },
+        "category": "electronics",
+        "tags": ["tech", "wireless", "gaming"]
+    }
+})
+
+
+def forecast_alerts(stock_per_sku: np.ndarray, rng: np.random.Generator, days: int = 5):
+    """Simulate daily demand per SKU and flag stock below twice the mean forecast."""
+    predictions = rng.integers(5, 21, size=(stock_per_sku.shape[0], days))
+    insufficient = stock_per_sku < 2 * predictions.mean(axis=1)
+    return predictions, insufficient
+
 
 class AutoAegisOrchestrator:
     """Automatic Aegis Orchestrator Demo - Runs without user input."""
@@ -45,18 +139,47 @@ class AutoAegisOrchestrator:
         self.inventory_data = {}
         self.orders = {}
         self.cart_data = {}
-        self.system_metrics = {
-            "ai_decisions": 0,
-            "events_processed": 0,
-            "problems_resolved": 0,
-            "customer_interactions": 0
-        }
+        self.system_metrics = Counter(
+            ai_decisions=0,
+            events_processed=0,
+            problems_resolved=0,
+            customer_interactions=0
+        )
         self.agents = {}
         
+        # AEGIS_DEMO_FAST=1 skips the cosmetic "AI thinking" pauses (CI smoke runs)
+        self.fast_mode = os.environ.get("AEGIS_DEMO_FAST") == "1"
+        
+        # One random source per demo run instead of module lookups per call
+        self._rng = random.Random()
+        self._np_rng = np.random.default_rng()
+        
+        # Demo output is collected per section and written in one call
+        self._buf: List[str] = []
+        
+    def _p(self, line: str):
+        """Queue a line of demo output."""
+        self._buf.append(line)
+    
+    async def _beat(self, seconds: float):
+        """Pause to simulate AI processing, flushing output first; skipped in fast mode."""
+        self._flush()
+        if not self.fast_mode:
+            await asyncio.sleep(seconds)
+    
+    def _flush(self):
+        """Write queued demo output to stdout in a single call."""
+        if self._buf:
+            sys.stdout.write("\n".join(self._buf) + "\n")
+            sys.stdout.flush()
+            self._buf.clear()
+    
     async def initialize_system(self):
         """Initialize the Aegis Orchestrator system."""
         logger.info("🚀 Initializing Aegis Orchestrator Auto Demo...")
         
+        from unittest.mock import AsyncMock, patch
+        
         # Initialize agents
         with patch('httpx.AsyncClient') as mock_client:
             mock_client.return_value = AsyncMock()
@@ -83,78 +206,30 @@ class AutoAegisOrchestrator:
     
     def _initialize_sample_data(self):
         """Initialize sample data for the demo."""
-        # Sample user profiles
-        self.user_profiles = {
-            "demo-user-1": {
-                "name": "Demo User 1",
-                "browsing_history": ["casual-wear", "sweaters", "denim", "shoes"],
-                "purchase_history": ["blue-jeans", "white-sneakers", "red-dress"],
-                "preferences": {"style": "casual", "colors": ["yellow", "blue", "red"]},
-                "loyalty_tier": "gold"
-            },
-            "demo-user-2": {
-                "name": "Demo User 2",
-                "browsing_history": ["electronics", "gadgets", "accessories"],
-                "purchase_history": ["wireless-mouse", "laptop-stand"],
-                "preferences": {"style": "tech", "colors": ["black", "silver"]},
-                "loyalty_tier": "silver"
-            },
-            "demo-user-3": {
-                "name": "Demo User 3",
-                "browsing_history": ["formal-wear", "jewelry", "handbags"],
-                "purchase_history": ["pearl-necklace", "black-heels"],
-                "preferences": {"style": "elegant", "colors": ["black", "white", "gold"]},
-                "loyalty_tier": "platinum"
-            }
-        }
-        
-        # Sample inventory data
-        self.inventory_data = {
-            "yellow-sweater": {
-                "name": "Yellow Cashmere Sweater",
-                "price": 89.99,
-                "warehouses": {
-                    "east-coast": {"stock": 15, "threshold": 10},
-                    "west-coast": {"stock": 8, "threshold": 10},
-                    "central": {"stock": 25, "threshold": 10}
-                },
-                "category": "sweaters",
-                "tags": ["casual", "warm", "yellow"]
-            },
-            "denim-jeans": {
-                "name": "Classic Blue Denim Jeans",
-                "price": 79.99,
-                "warehouses": {
-                    "east-coast": {"stock": 5, "threshold": 10},
-                    "west-coast": {"stock": 30, "threshold": 10},
-                    "central": {"stock": 12, "threshold": 10}
-                },
-                "category": "denim",
-                "tags": ["casual", "blue", "jeans"]
-            },
-            "white-sneakers": {
-                "name": "White Canvas Sneakers",
-                "price": 59.99,
-                "warehouses": {
-                    "east-coast": {"stock": 20, "threshold": 10},
-                    "west-coast": {"stock": 15, "threshold": 10},
-                    "central": {"stock": 8, "threshold": 10}
-                },
-                "category": "shoes",
-                "tags": ["casual", "white", "sneakers"]
-            },
-            "wireless-mouse": {
-                "name": "Wireless Gaming Mouse",
-                "price": 49.99,
-                "warehouses": {
-                    "east-coast": {"stock": 3, "threshold": 10},
-                    "west-coast": {"stock": 18, "threshold": 10},
-                    "central": {"stock": 22, "threshold": 10}
-                },
-                "category": "electronics",
-                "tags": ["tech", "wireless", "gaming"]
-            }
-        }
+        # Work on private copies of the frozen sample data
+        self.user_profiles = deepcopy(dict(_USER_PROFILES))
+        self.inventory_data = deepcopy(dict(_INVENTORY))
+        
+        # Index product tags and categories once for recommendation lookups
+        self._tags_by_product = {pid: frozenset(p["tags"]) for pid, p in self.inventory_data.items()}
+        self._category_by_product = {pid: p["category"] for pid, p in self.inventory_data.items()}
+        self._products_by_category = {}
+        for pid, category in self._category_by_product.items():
+            self._products_by_category.setdefault(category, []).append(pid)
+        
+        # Warehouse stock as dense [sku, warehouse] arrays for vectorized scans
+        self._sku_ids = list(self.inventory_data)
+        self._sku_index = {pid: i for i, pid in enumerate(self._sku_ids)}
+        self._warehouses = list(dict.fromkeys(
+            chain.from_iterable(p["warehouses"] for p in self.inventory_data.values())
+        ))
+        self._wh_index = {wh: j for j, wh in enumerate(self._warehouses)}
+        self._stock = np.zeros((len(self._sku_ids), len(self._warehouses)), dtype=np.int64)
+        self._threshold = np.zeros_like(self._stock)
+        for pid, product in self.inventory_data.items():
+            for wh, data in product["warehouses"].items():
+                self._stock[self._sku_index[pid], self._wh_index[wh]] = data["stock"]
+                self._threshold[self._sku_index[pid], self._wh_index[wh]] = data["threshold"]
         
         # Initialize empty carts
         for user_id in self.user_profiles:
@@ -162,13 +237,14 @@ class AutoAegisOrchestrator:
     
     async def run_complete_demo(self):
         """Run the complete automatic demonstration."""
-        print("\n" + "="*80)
-        print("🎯 AEGIS ORCHESTRATOR - AUTOMATIC DEMONSTRATION")
-        print("="*80)
-        print("🚀 AI-Powered E-commerce Intelligence Platform")
-        print("="*80)
+        self._p("\n" + _BAR)
+        self._p("🎯 AEGIS ORCHESTRATOR - AUTOMATIC DEMONSTRATION")
+        self._p(_BAR)
+        self._p("🚀 AI-Powered E-commerce Intelligence Platform")
+        self._p(_BAR)
         
         # Initialize system
+        self._flush()
         await self.initialize_system()
         
         # Demo 1: Customer Personalization Journey
@@ -191,21 +267,21 @@ class AutoAegisOrchestrator:
     
     async def demo_customer_personalization(self):
         """Demo customer personalization features."""
-        print("\n" + "="*60)
-        print("🎬 DEMO 1: CUSTOMER PERSONALIZATION JOURNEY")
-        print("="*60)
+        self._p("\n" + _SECTION_BAR)
+        self._p("🎬 DEMO 1: CUSTOMER PERSONALIZATION JOURNEY")
+        self._p(_SECTION_BAR)
         
         # Select demo customer
         self.current_user = "demo-user-1"
         profile = self.user_profiles[self.current_user]
         
-        print(f"👤 Customer: {profile['name']} ({profile['loyalty_tier']} tier)")
-        print(f"   Style: {profile['preferences']['style']}")
-        print(f"   Colors: {', '.join(profile['preferences']['colors'])}")
-        print(f"   Browsing History: {', '.join(profile['browsing_history'])}")
+        self._p(f"👤 Customer: {profile['name']} ({profile['loyalty_tier']} tier)")
+        self._p(f"   Style: {profile['preferences']['style']}")
+        self._p(f"   Colors: {', '.join(profile['preferences']['colors'])}")
+        self._p(f"   Browsing History: {', '.join(profile['browsing_history'])}")
         
         # Demo user adds yellow sweater to cart
-        print(f"\n🛒 {profile['name']} adds 'Yellow Cashmere Sweater' to cart...")
+        self._p(f"\n🛒 {profile['name']} adds 'Yellow Cashmere Sweater' to cart...")
         cart_item = {
             "product_id": "yellow-sweater",
             "name": "Yellow Cashmere Sweater",
@@ -215,158 +291,160 @@ class AutoAegisOrchestrator:
         self.cart_data[self.current_user]["items"].append(cart_item)
         self.cart_data[self.current_user]["total"] = 89.99
         
-        print(f"✅ Added to cart: {cart_item['name']} - ${cart_item['price']}")
-        print(f"💰 Cart total: ${self.cart_data[self.current_user]['total']:.2f}")
+        self._p(f"✅ Added to cart: {cart_item['name']} - ${cart_item['price']}")
+        self._p(f"💰 Cart total: ${self.cart_data[self.current_user]['total']:.2f}")
         
         # AI analyzes cart and generates recommendations
-        print(f"\n🧠 AI Personalization Agent analyzing {profile['name']}'s cart...")
-        await asyncio.sleep(2)  # Simulate AI processing
+        self._p(f"\n🧠 AI Personalization Agent analyzing {profile['name']}'s cart...")
+        await self._beat(2)  # Simulate AI processing
         
         recommendations = await self._generate_ai_recommendations(
             self.cart_data[self.current_user]["items"], 
             profile
         )
         
-        print("💡 AI Recommendations Generated:")
+        self._p("💡 AI Recommendations Generated:")
         for i, rec in enumerate(recommendations, 1):
-            print(f"   {i}. {rec['name']}")
-            print(f"      Reason: {rec['reason']}")
-            print(f"      Discount: ${rec['discount']} off")
-            print(f"      Confidence: {rec['confidence']*100:.0f}%")
-            print()
+            self._p(f"   {i}. {rec['name']}")
+            self._p(f"      Reason: {rec['reason']}")
+            self._p(f"      Discount: ${rec['discount']} off")
+            self._p(f"      Confidence: {rec['confidence']*100:.0f}%")
+            self._p("")
         
         # Dynamic pricing
-        print("💰 Dynamic Pricing Applied:")
-        print("   • Bundle discount: 10%")
-        print(f"   • Loyalty discount: 5% ({profile['loyalty_tier']} tier)")
-        print("   • Total savings: $15.00")
+        self._p("💰 Dynamic Pricing Applied:")
+        self._p("   • Bundle discount: 10%")
+        self._p(f"   • Loyalty discount: 5% ({profile['loyalty_tier']} tier)")
+        self._p("   • Total savings: $15.00")
         
-        self.system_metrics["ai_decisions"] += 1
-        self.system_metrics["events_processed"] += 1
+        self.system_metrics.update(ai_decisions=1, events_processed=1)
         
-        print("✅ Result: Increased AOV by 18%, improved customer experience")
+        self._p("✅ Result: Increased AOV by 18%, improved customer experience")
+        self._flush()
     
     async def _generate_ai_recommendations(self, cart_items, user_profile):
         """Generate AI recommendations based on cart and profile."""
-        recommendations = []
-        
         # Simple AI logic for demo
-        cart_categories = set()
-        for item in cart_items:
-            product = self.inventory_data[item["product_id"]]
-            cart_categories.add(product["category"])
-        
-        # Find complementary items
-        for product_id, product in self.inventory_data.items():
-            if product["category"] not in cart_categories:
-                # Check if it matches user preferences
-                if any(tag in user_profile["preferences"]["colors"] for tag in product["tags"]):
-                    recommendations.append({
-                        "product_id": product_id,
-                        "name": product["name"],
-                        "reason": f"Matches your {user_profile['preferences']['style']} style",
-                        "discount": 10,
-                        "confidence": 0.85
-                    })
+        cart_categories = {self._category_by_product[item["product_id"]] for item in cart_items}
+        colors = frozenset(user_profile["preferences"]["colors"])
+        style = user_profile["preferences"]["style"]
+        
+        # Find complementary items that match user preferences
+        recommendations = [
+            {
+                "product_id": product_id,
+                "name": self.inventory_data[product_id]["name"],
+                "reason": f"Matches your {style} style",
+                "discount": 10,
+                "confidence": 0.85
+            }
+            for category, product_ids in self._products_by_category.items()
+            if category not in cart_categories
+            for product_id in product_ids
+            if not self._tags_by_product[product_id].isdisjoint(colors)
+        ]
         
         return recommendations[:3]  # Return top 3 recommendations
     
     async def demo_inventory_management(self):
         """Demo inventory management features."""
-        print("\n" + "="*60)
-        print("🎬 DEMO 2: INVENTORY MANAGEMENT")
-        print("="*60)
-        
-        print("📊 Current Inventory Status:")
-        print("-" * 40)
-        for product_id, product in self.inventory_data.items():
-            print(f"\n📦 {product['name']}")
-            print(f"   Price: ${product['price']}")
-            print(f"   Category: {product['category']}")
-            print("   Warehouse Stock:")
-            for warehouse, data in product['warehouses'].items():
-                status = "⚠️  LOW" if data['stock'] <= data['threshold'] else "✅ OK"
-                print(f"      {warehouse}: {data['stock']} units {status}")
+        self._p("\n" + _SECTION_BAR)
+        self._p("🎬 DEMO 2: INVENTORY MANAGEMENT")
+        self._p(_SECTION_BAR)
+        
+        self._p("📊 Current Inventory Status:")
+        self._p(_SUB)
+        low = self._stock <= self._threshold
+        self._p("\n".join(
+            f"\n📦 {product['name']}\n"
+            f"   Price: ${product['price']}\n"
+            f"   Category: {product['category']}\n"
+            "   Warehouse Stock:\n"
+            + "\n".join(
+                f"      {warehouse}: {self._stock[i, j]} units {'⚠️  LOW' if low[i, j] else '✅ OK'}"
+                for j, warehouse in enumerate(self._warehouses)
+            )
+            for i, product in enumerate(self.inventory_data[pid] for pid in self._sku_ids)
+        ))
         
         # Trigger low stock scenario
-        print(f"\n🚨 Triggering Low Stock Scenario...")
-        print("📉 Reducing stock levels to trigger AI response...")
-        
-        # Find a product with good stock and reduce it
-        for product_id, product in self.inventory_data.items():
-            for warehouse, data in product['warehouses'].items():
-                if data['stock'] > data['threshold']:
-                    data['stock'] = data['threshold'] - 2
-                    print(f"   • {product['name']} in {warehouse}: {data['stock']} units (LOW)")
-                    break
-            else:
-                continue
-            break
-        
-        print("\n🔮 AI Demand Forecasting:")
-        print("-" * 30)
-        for product_id, product in self.inventory_data.items():
-            # Simulate AI predictions
-            import random
-            predictions = [random.randint(5, 20) for _ in range(5)]
-            
-            print(f"\n📦 {product['name']}")
-            print("   Next 5 days demand forecast:")
-            for i, pred in enumerate(predictions, 1):
-                print(f"      Day {i}: {pred} units")
-            
-            current_stock = sum(data['stock'] for data in product['warehouses'].values())
-            avg_demand = sum(predictions) / len(predictions)
+        self._p(f"\n🚨 Triggering Low Stock Scenario...")
+        self._p("📉 Reducing stock levels to trigger AI response...")
+        
+        # Find the first product/warehouse with good stock and reduce it;
+        # argmax on a boolean array stops at the first True
+        healthy = (self._stock > self._threshold).ravel()
+        first = healthy.argmax()
+        if healthy[first]:
+            i, j = np.unravel_index(first, self._stock.shape)
+            self._stock[i, j] = self._threshold[i, j] - 2
+            product_id, warehouse = self._sku_ids[i], self._warehouses[j]
+            self.inventory_data[product_id]["warehouses"][warehouse]["stock"] = int(self._stock[i, j])
+            self._p(f"   • {self.inventory_data[product_id]['name']} in {warehouse}: {self._stock[i, j]} units (LOW)")
+        
+        self._p("\n🔮 AI Demand Forecasting:")
+        self._p(_SUB_SHORT)
+        
+        # Simulate AI predictions for every SKU at once
+        predictions, insufficient = forecast_alerts(self._stock.sum(axis=1), self._np_rng)
+        
+        for i, product_id in enumerate(self._sku_ids):
+            self._p(f"\n📦 {self.inventory_data[product_id]['name']}")
+            self._p("   Next 5 days demand forecast:")
+            for day, pred in enumerate(predictions[i], 1):
+                self._p(f"      Day {day}: {pred} units")
             
-            if current_stock < avg_demand * 2:
-                print("   ⚠️  AI Alert: Stock may be insufficient")
+            if insufficient[i]:
+                self._p("   ⚠️  AI Alert: Stock may be insufficient")
             else:
-                print("   ✅ AI Assessment: Stock levels adequate")
+                self._p("   ✅ AI Assessment: Stock levels adequate")
         
         # AI optimization
-        print(f"\n🔄 AI Inventory Optimization:")
-        print("-" * 40)
-        
-        optimizations = []
-        for product_id, product in self.inventory_data.items():
-            for warehouse, data in product['warehouses'].items():
-                if data['stock'] <= data['threshold']:
-                    # Find alternative warehouse
-                    alternatives = [w for w, d in product['warehouses'].items() 
-                                  if d['stock'] > data['threshold'] and w != warehouse]
-                    if alternatives:
-                        optimizations.append({
-                            "product": product['name'],
-                            "from": warehouse,
-                            "to": alternatives[0],
-                            "reason": f"Low stock in {warehouse}"
-                        })
+        self._p(f"\n🔄 AI Inventory Optimization:")
+        self._p(_SUB)
+        
+        # For each low cell, the first other warehouse holding more than that cell's threshold
+        low = self._stock <= self._threshold
+        candidates = self._stock[:, None, :] > self._threshold[:, :, None]
+        candidates &= ~np.eye(len(self._warehouses), dtype=bool)
+        has_alternative = low & candidates.any(axis=2)
+        first_alternative = candidates.argmax(axis=2)
+        
+        optimizations = [
+            {
+                "product": self.inventory_data[self._sku_ids[i]]['name'],
+                "from": self._warehouses[j],
+                "to": self._warehouses[first_alternative[i, j]],
+                "reason": f"Low stock in {self._warehouses[j]}"
+            }
+            for i, j in np.argwhere(has_alternative)
+        ]
         
         if optimizations:
-            print("🚨 AI Optimization Recommendations:")
+            self._p("🚨 AI Optimization Recommendations:")
             for opt in optimizations:
-                print(f"   🔄 {opt['product']}: Reroute from {opt['from']} to {opt['to']}")
-                print(f"      Reason: {opt['reason']}")
+                self._p(f"   🔄 {opt['product']}: Reroute from {opt['from']} to {opt['to']}")
+                self._p(f"      Reason: {opt['reason']}")
             
-            print("\n📧 Proactive customer notifications sent")
-            print("💰 Compensation offered: $5 credit")
+            self._p("\n📧 Proactive customer notifications sent")
+            self._p("💰 Compensation offered: $5 credit")
         else:
-            print("✅ No optimization needed - all stock levels adequate")
+            self._p("✅ No optimization needed - all stock levels adequate")
         
-        self.system_metrics["ai_decisions"] += 1
-        self.system_metrics["events_processed"] += 1
+        self.system_metrics.update(ai_decisions=1, events_processed=1)
         
-        print("✅ Result: Prevented stockout, maintained 99.9% availability")
+        self._p("✅ Result: Prevented stockout, maintained 99.9% availability")
+        self._flush()
     
     async def demo_problem_resolution(self):
         """Demo problem resolution features."""
-        print("\n" + "="*60)
-        print("🎬 DEMO 3: PROBLEM RESOLUTION")
-        print("="*60)
+        self._p("\n" + _SECTION_BAR)
+        self._p("🎬 DEMO 3: PROBLEM RESOLUTION")
+        self._p(_SECTION_BAR)
         
         # Simulate payment failure
-        print("💳 Simulating Payment Failure...")
-        print("-" * 40)
+        self._p("💳 Simulating Payment Failure...")
+        self._p(_SUB)
         
         error_types = [
             "Insufficient funds",
@@ -376,36 +454,35 @@ class AutoAegisOrchestrator:
             "Expired card"
         ]
         
-        import random
-        error = random.choice(error_types)
+        error = self._rng.choice(error_types)
         
-        print(f"❌ Payment Error: {error}")
-        print("🛠️  AI Anomaly Resolver Agent activated...")
-        await asyncio.sleep(1)
+        self._p(f"❌ Payment Error: {error}")
+        self._p("🛠️  AI Anomaly Resolver Agent activated...")
+        await self._beat(1)
         
-        print("\n🔍 AI Analysis:")
-        print("   • Error type: Payment processing failure")
-        print("   • Severity: Medium")
-        print("   • Impact: Customer checkout blocked")
+        self._p("\n🔍 AI Analysis:")
+        self._p("   • Error type: Payment processing failure")
+        self._p("   • Severity: Medium")
+        self._p("   • Impact: Customer checkout blocked")
         
-        print("\n💡 AI Resolution Strategy:")
-        print("   1. Place order in pending state")
-        print("   2. Retry payment with different method")
-        print("   3. Enable alternative payment options")
-        print("   4. Send reassuring message to customer")
-        print("   5. Monitor for similar issues")
+        self._p("\n💡 AI Resolution Strategy:")
+        self._p("   1. Place order in pending state")
+        self._p("   2. Retry payment with different method")
+        self._p("   3. Enable alternative payment options")
+        self._p("   4. Send reassuring message to customer")
+        self._p("   5. Monitor for similar issues")
         
-        print("\n📧 Customer Communication:")
-        print("   Subject: Payment Issue - We're Here to Help!")
-        print("   Message: We encountered a payment issue, but don't worry - we're working to resolve it.")
+        self._p("\n📧 Customer Communication:")
+        self._p("   Subject: Payment Issue - We're Here to Help!")
+        self._p("   Message: We encountered a payment issue, but don't worry - we're working to resolve it.")
         
-        print("\n🔄 Retrying payment...")
-        await asyncio.sleep(1)
-        print("✅ Payment successful on retry!")
+        self._p("\n🔄 Retrying payment...")
+        await self._beat(1)
+        self._p("✅ Payment successful on retry!")
         
         # Simulate system error
-        print(f"\n⚠️  Simulating System Error...")
-        print("-" * 40)
+        self._p(f"\n⚠️  Simulating System Error...")
+        self._p(_SUB)
         
         system_errors = [
             "Database connection timeout",
@@ -415,70 +492,68 @@ class AutoAegisOrchestrator:
             "Configuration error"
         ]
         
-        system_error = random.choice(system_errors)
+        system_error = self._rng.choice(system_errors)
         
-        print(f"❌ System Error: {system_error}")
-        print("🛠️  AI Anomaly Resolver Agent activated...")
-        await asyncio.sleep(1)
+        self._p(f"❌ System Error: {system_error}")
+        self._p("🛠️  AI Anomaly Resolver Agent activated...")
+        await self._beat(1)
         
-        print("\n🔍 AI Analysis:")
-        print("   • Error type: System infrastructure")
-        print("   • Severity: High")
-        print("   • Impact: Service degradation")
+        self._p("\n🔍 AI Analysis:")
+        self._p("   • Error type: System infrastructure")
+        self._p("   • Severity: High")
+        self._p("   • Impact: Service degradation")
         
-        print("\n💡 AI Resolution Strategy:")
-        print("   1. Isolate affected components")
-        print("   2. Enable failover mechanisms")
-        print("   3. Scale up resources")
-        print("   4. Notify operations team")
-        print("   5. Implement circuit breaker")
+        self._p("\n💡 AI Resolution Strategy:")
+        self._p("   1. Isolate affected components")
+        self._p("   2. Enable failover mechanisms")
+        self._p("   3. Scale up resources")
+        self._p("   4. Notify operations team")
+        self._p("   5. Implement circuit breaker")
         
-        print("\n📊 System Recovery:")
-        print("   • Failover activated")
-        print("   • Resources scaled up")
-        print("   • Service restored")
-        print("   • Monitoring enhanced")
+        self._p("\n📊 System Recovery:")
+        self._p("   • Failover activated")
+        self._p("   • Resources scaled up")
+        self._p("   • Service restored")
+        self._p("   • Monitoring enhanced")
         
-        self.system_metrics["problems_resolved"] += 2
-        self.system_metrics["ai_decisions"] += 2
-        self.system_metrics["events_processed"] += 2
+        self.system_metrics.update(problems_resolved=2, ai_decisions=2, events_processed=2)
         
-        print("✅ Result: All problems resolved, system stabilized")
+        self._p("✅ Result: All problems resolved, system stabilized")
+        self._flush()
     
     async def demo_system_analytics(self):
         """Demo system analytics features."""
-        print("\n" + "="*60)
-        print("🎬 DEMO 4: SYSTEM ANALYTICS")
-        print("="*60)
-        
-        print("📊 Real-time Performance Metrics:")
-        print("-" * 40)
-        
-        # Simulate real-time metrics
-        import random
-        
-        metrics = {
-            "CPU Usage": f"{random.randint(20, 80)}%",
-            "Memory Usage": f"{random.randint(30, 70)}%",
-            "Response Time": f"{random.randint(50, 200)}ms",
-            "Error Rate": f"{random.uniform(0.1, 2.0):.1f}%",
-            "Active Users": random.randint(100, 1000),
-            "AI Decisions/Min": random.randint(5, 25)
-        }
+        self._p("\n" + _SECTION_BAR)
+        self._p("🎬 DEMO 4: SYSTEM ANALYTICS")
+        self._p(_SECTION_BAR)
+        
+        self._p("📊 Real-time Performance Metrics:")
+        self._p(_SUB)
+        
+        # Simulate real-time metrics as (name, value, unit, warn threshold)
+        metrics = [
+            ("CPU Usage", self._rng.randint(20, 80), "%", 80),
+            ("Memory Usage", self._rng.randint(30, 70), "%", 80),
+            ("Response Time", self._rng.randint(50, 200), "ms", None),
+            ("Error Rate", round(self._rng.uniform(0.1, 2.0), 1), "%", None),
+            ("Active Users", self._rng.randint(100, 1000), "", None),
+            ("AI Decisions/Min", self._rng.randint(5, 25), "", None)
+        ]
         
-        for metric, value in metrics.items():
-            status = "✅" if "Usage" not in metric or int(value.replace("%", "")) < 80 else "⚠️"
-            print(f"{status} {metric}: {value}")
+        self._p("\n".join(
+            f"{'✅' if warn is None or value < warn else '⚠️'} {name}: {value}{unit}"
+            for name, value, unit, warn in metrics
+        ))
         
-        print(f"\n📈 AI Performance Metrics:")
-        print("-" * 30)
-        print(f"   Decisions Made: {self.system_metrics['ai_decisions']}")
-        print(f"   Events Processed: {self.system_metrics['events_processed']}")
-        print(f"   Problems Resolved: {self.system_metrics['problems_resolved']}")
-        print(f"   Customer Interactions: {self.system_metrics['customer_interactions']}")
+        self._p(f"\n📈 AI Performance Metrics:")
+        self._p(_SUB_SHORT)
+        self._p(f"   Decisions Made: {self.system_metrics['ai_decisions']}")
+        self._p(f"   Events Processed: {self.system_metrics['events_processed']}")
+        self._p(f"   Problems Resolved: {self.system_metrics['problems_resolved']}")
+        self._p(f"   Customer Interactions: {self.system_metrics['customer_interactions']}")
         
-        print(f"\n🤖 AI Decision Logs:")
-        print("-" * 30)
+        self._p(f"\n🤖 AI Decision Logs:")
+        self._p(_SUB_SHORT)
         logs = [
             "2024-01-15 10:30:15 - Personalization: Generated 3 recommendations for user alice-123",
             "2024-01-15 10:31:22 - Inventory: Detected low stock, initiated rerouting plan",
@@ -489,44 +564,45 @@ class AutoAegisOrchestrator:
         ]
         
         for log in logs:
-            print(f"   {log}")
+            self._p(f"   {log}")
         
-        print("✅ Result: Comprehensive system monitoring and analytics")
+        self._p("✅ Result: Comprehensive system monitoring and analytics")
+        self._flush()
     
     async def demo_business_impact(self):
         """Demo business impact features."""
-        print("\n" + "="*60)
-        print("🎬 DEMO 5: BUSINESS IMPACT")
-        print("="*60)
-        
-        print("📊 Before Aegis Orchestrator:")
-        print("-" * 40)
-        print("   • Conversion Rate: 2.1%")
-        print("   • Average Order Value: $45")
-        print("   • Cart Abandonment: 68%")
-        print("   • Customer Satisfaction: 79%")
-        print("   • Monthly Revenue: $180,000")
-        print("   • Operational Efficiency: 65%")
-        
-        print("\n🚀 After Aegis Orchestrator:")
-        print("-" * 40)
-        print("   • Conversion Rate: 2.6% (+23%)")
-        print("   • Average Order Value: $53 (+18%)")
-        print("   • Cart Abandonment: 47% (-31%)")
-        print("   • Customer Satisfaction: 91% (+15%)")
-        print("   • Monthly Revenue: $305,000 (+$125,000)")
-        print("   • Operational Efficiency: 92% (+42%)")
-        
-        print("\n💰 ROI Analysis:")
-        print("-" * 20)
-        print("   • Implementation Cost: $25,000")
-        print("   • Monthly Savings: $47,000")
-        print("   • Additional Revenue: $125,000/month")
-        print("   • ROI: 688% in first year")
-        print("   • Payback Period: 1.2 months")
-        
-        print("\n📈 Key Performance Indicators:")
-        print("-" * 35)
+        self._p("\n" + _SECTION_BAR)
+        self._p("🎬 DEMO 5: BUSINESS IMPACT")
+        self._p(_SECTION_BAR)
+        
+        self._p("📊 Before Aegis Orchestrator:")
+        self._p(_SUB)
+        self._p("   • Conversion Rate: 2.1%")
+        self._p("   • Average Order Value: $45")
+        self._p("   • Cart Abandonment: 68%")
+        self._p("   • Customer Satisfaction: 79%")
+        self._p("   • Monthly Revenue: $180,000")
+        self._p("   • Operational Efficiency: 65%")
+        
+        self._p("\n🚀 After Aegis Orchestrator:")
+        self._p(_SUB)
+        self._p("   • Conversion Rate: 2.6% (+23%)")
+        self._p("   • Average Order Value: $53 (+18%)")
+        self._p("   • Cart Abandonment: 47% (-31%)")
+        self._p("   • Customer Satisfaction: 91% (+15%)")
+        self._p("   • Monthly Revenue: $305,000 (+$125,000)")
+        self._p("   • Operational Efficiency: 92% (+42%)")
+        
+        self._p("\n💰 ROI Analysis:")
+        self._p("-" * 20)
+        self._p("   • Implementation Cost: $25,000")
+        self._p("   • Monthly Savings: $47,000")
+        self._p("   • Additional Revenue: $125,000/month")
+        self._p("   • ROI: 688% in first year")
+        self._p("   • Payback Period: 1.2 months")
+        
+        self._p("\n📈 Key Performance Indicators:")
+        self._p("-" * 35)
         kpis = {
             "Customer Lifetime Value": "+34%",
             "Repeat Purchase Rate": "+28%",
@@ -536,57 +612,59 @@ class AutoAegisOrchestrator:
             "Return Rate": "-22%"
         }
         
-        for kpi, improvement in kpis.items():
-            print(f"   • {kpi}: {improvement}")
+        self._p("\n".join(f"   • {kpi}: {improvement}" for kpi, improvement in kpis.items()))
         
-        print("✅ Result: Transformative business impact achieved")
+        self._p("✅ Result: Transformative business impact achieved")
+        self._flush()
     
     async def show_final_summary(self):
         """Show final summary of the demonstration."""
-        print("\n" + "="*80)
-        print("🎉 AEGIS ORCHESTRATOR - DEMONSTRATION COMPLETE")
-        print("="*80)
-        
-        print("✅ SYSTEM STATUS: FULLY OPERATIONAL")
-        print("-" * 50)
-        print("   ✅ Configuration: Ready")
-        print("   ✅ MCP Protocol: Operational")
-        print("   ✅ Agent Framework: Deployed")
-        print("   ✅ AI Intelligence: Active")
-        print("   ✅ Business Logic: Validated")
-        print("   ✅ Technology Stack: Verified")
-        print("   ✅ MCP Server: Operational")
-        
-        print(f"\n📊 DEMONSTRATION METRICS:")
-        print("-" * 30)
-        print(f"   • AI Decisions Made: {self.system_metrics['ai_decisions']}")
-        print(f"   • Events Processed: {self.system_metrics['events_processed']}")
-        print(f"   • Problems Resolved: {self.system_metrics['problems_resolved']}")
-        print(f"   • Customer Interactions: {self.system_metrics['customer_interactions']}")
-        
-        print(f"\n🎯 KEY ACHIEVEMENTS:")
-        print("-" * 25)
-        print("   • Zero code modification to Online Boutique")
-        print("   • AI-powered personalization and recommendations")
-        print("   • Predictive inventory management")
-        print("   • Proactive problem resolution")
-        print("   • Real-time system monitoring")
-        print("   • Measurable business impact")
-        
-        print(f"\n🚀 READY FOR PRODUCTION:")
-        print("-" * 30)
-        print("   1. Deploy to GKE cluster")
-        print("   2. Connect to Online Boutique")
-        print("   3. Configure real Gemini API key")
-        print("   4. Monitor and optimize performance")
-        
-        print(f"\n🌟 AEGIS ORCHESTRATOR")
-        print("   Transforming E-commerce with AI Intelligence")
-        print("   Ready to revolutionize your business!")
-        print("="*80)
+        self._p("\n" + _BAR)
+        self._p("🎉 AEGIS ORCHESTRATOR - DEMONSTRATION COMPLETE")
+        self._p(_BAR)
+        
+        self._p("✅ SYSTEM STATUS: FULLY OPERATIONAL")
+        self._p("-" * 50)
+        self._p("   ✅ Configuration: Ready")
+        self._p("   ✅ MCP Protocol: Operational")
+        self._p("   ✅ Agent Framework: Deployed")
+        self._p("   ✅ AI Intelligence: Active")
+        self._p("   ✅ Business Logic: Validated")
+        self._p("   ✅ Technology Stack: Verified")
+        self._p("   ✅ MCP Server: Operational")
+        
+        self._p(f"\n📊 DEMONSTRATION METRICS:")
+        self._p(_SUB_SHORT)
+        self._p(f"   • AI Decisions Made: {self.system_metrics['ai_decisions']}")
+        self._p(f"   • Events Processed: {self.system_metrics['events_processed']}")
+        self._p(f"   • Problems Resolved: {self.system_metrics['problems_resolved']}")
+        self._p(f"   • Customer Interactions: {self.system_metrics['customer_interactions']}")
+        
+        self._p(f"\n🎯 KEY ACHIEVEMENTS:")
+        self._p("-" * 25)
+        self._p("   • Zero code modification to Online Boutique")
+        self._p("   • AI-powered personalization and recommendations")
+        self._p("   • Predictive inventory management")
+        self._p("   • Proactive problem resolution")
+        self._p("   • Real-time system monitoring")
+        self._p("   • Measurable business impact")
+        
+        self._p(f"\n🚀 READY FOR PRODUCTION:")
+        self._p(_SUB_SHORT)
+        self._p("   1. Deploy to GKE cluster")
+        self._p("   2. Connect to Online Boutique")
+        self._p("   3. Configure real Gemini API key")
+        self._p("   4. Monitor and optimize performance")
+        
+        self._p(f"\n🌟 AEGIS ORCHESTRATOR")
+        self._p("   Transforming E-commerce with AI Intelligence")
+        self._p("   Ready to revolutionize your business!")
+        self._p(_BAR)
+        self._flush()
 
 async def main():
     """Main function to run the automatic demo."""
+    sys.stdout.reconfigure(line_buffering=False, write_through=False)
     demo = AutoAegisOrchestrator()
     await demo.run_complete_demo()
 
@@ -1,66 +1,149 @@
 """Configuration settings for Aegis Orchestrator."""
 
+import json
 import os
-from typing import Optional
-from pydantic_settings import BaseSettings
-from pydantic import Field
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Mapping, Tuple
 
 
-class Settings(BaseSettings):
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def _read_env_file(path: str = ".env") -> Dict[str, str]:
+    """Read KEY=VALUE pairs from a dotenv file if it exists."""
+    values = {}
+    try:
+        with open(path, encoding="utf-8") as env_file:
+            for line in env_file:
+                line = line.strip()
+                if not line or line.startswith("#") or "=" not in line:
+                    continue
+                key, value = line.split("=", 1)
+                values[key.strip()] = value.strip().strip("'\"")
+    except FileNotFoundError:
+        pass
+    return values
+
+
+def _env_snapshot() -> Dict[str, str]:
+    """Take one case-insensitive snapshot of `.env` overlaid by the process environment."""
+    env = {key.upper(): value for key, value in _read_env_file().items()}
+    env.update((key.upper(), value) for key, value in os.environ.items())
+    return env
+
+
+def _as_bool(value: str) -> bool:
+    return value.strip().lower() in _TRUE_VALUES
+
+
+def _as_tuple(value: str) -> Tuple[str, ...]:
+    value = value.strip()
+    if value.startswith("["):
+        return tuple(json.loads(value))
+    return tuple(item.strip() for item in value.split(",") if item.strip())
+
+
+@dataclass(slots=True, frozen=True)
+class Settings:
     """Application settings."""
-    
+
     # API Configuration
-    api_host: str = Field(default="0.0.0.0", env="API_HOST")
-    api_port: int = Field(default=8000, env="API_PORT")
-    debug: bool = Field(default=False, env="DEBUG")
-    
+    api_host: str = "0.0.0.0"
+    api_port: int = 8000
+    debug: bool = False
+
     # Google AI Configuration
-    gemini_api_key: str = Field(..., env="GEMINI_API_KEY")
-    gemini_model: str = Field(default="gemini-1.5-pro", env="GEMINI_MODEL")
-    
+    gemini_api_key: str = ""
+    gemini_model: str = "gemini-1.5-pro"
+
     # Online Boutique Configuration
-    boutique_base_url: str = Field(
-        default="http://frontend:80", 
-        env="BOUTIQUE_BASE_URL"
-    )
-    boutique_api_url: str = Field(
-        default="http://frontend:80/api", 
-        env="BOUTIQUE_API_URL"
-    )
-    
+    boutique_base_url: str = "http://frontend:80"
+    boutique_api_url: str = "http://frontend:80/api"
+
     # MCP Server Configuration
-    mcp_server_host: str = Field(default="0.0.0.0", env="MCP_SERVER_HOST")
-    mcp_server_port: int = Field(default=8001, env="MCP_SERVER_PORT")
-    
+    mcp_server_host: str = "0.0.0.0"
+    mcp_server_port: int = 8001
+    mcp_server_workers: int = 1
+    mcp_internal_token: str = ""
+
     # Agent Configuration
-    orchestrator_agent_name: str = Field(default="orchestrator", env="ORCHESTRATOR_AGENT_NAME")
-    personalization_agent_name: str = Field(default="personalization", env="PERSONALIZATION_AGENT_NAME")
-    inventory_agent_name: str = Field(default="inventory", env="INVENTORY_AGENT_NAME")
-    customer_comms_agent_name: str = Field(default="customer_comms", env="CUSTOMER_COMMS_AGENT_NAME")
-    anomaly_resolver_agent_name: str = Field(default="anomaly_resolver", env="ANOMALY_RESOLVER_AGENT_NAME")
-    
+    orchestrator_agent_name: str = "orchestrator"
+    personalization_agent_name: str = "personalization"
+    inventory_agent_name: str = "inventory"
+    customer_comms_agent_name: str = "customer_comms"
+    anomaly_resolver_agent_name: str = "anomaly_resolver"
+    enabled_events: Tuple[str, ...] = (
+        "order_created",
+        "cart_updated",
+        "inventory_low",
+        "payment_failed",
+        "shipping_delayed",
+        "user_browsing"
+    )
+
     # A2A Communication
-    a2a_broker_url: str = Field(default="redis://redis:6379", env="A2A_BROKER_URL")
-    a2a_topic_prefix: str = Field(default="aegis", env="A2A_TOPIC_PREFIX")
-    
+    a2a_broker_url: str = "redis://redis:6379"
+    a2a_topic_prefix: str = "aegis"
+
     # Database Configuration
-    database_url: str = Field(default="sqlite:///./aegis.db", env="DATABASE_URL")
-    
+    database_url: str = "sqlite:///./aegis.db"
+
     # Redis Configuration
-    redis_url: str = Field(default="redis://redis:6379", env="REDIS_URL")
-    
+    redis_url: str = "redis://redis:6379"
+
     # Monitoring
-    enable_metrics: bool = Field(default=True, env="ENABLE_METRICS")
-    metrics_port: int = Field(default=9090, env="METRICS_PORT")
-    
+    enable_metrics: bool = True
+    metrics_port: int = 9090
+
     # Logging
-    log_level: str = Field(default="INFO", env="LOG_LEVEL")
-    log_format: str = Field(default="json", env="LOG_FORMAT")
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    log_level: str = "INFO"
+    log_format: str = "json"
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str]) -> "Settings":
+        """Build settings from an upper-cased environment mapping."""
+        defaults = cls()
+
+        def get(name: str, default):
+            return env.get(name.upper(), default)
+
+        return cls(
+            api_host=get("api_host", defaults.api_host),
+            api_port=int(get("api_port", defaults.api_port)),
+            debug=_as_bool(str(get("debug", defaults.debug))),
+            gemini_api_key=env["GEMINI_API_KEY"],
+            gemini_model=get("gemini_model", defaults.gemini_model),
+            boutique_base_url=get("boutique_base_url", defaults.boutique_base_url),
+            boutique_api_url=get("boutique_api_url", defaults.boutique_api_url),
+            mcp_server_host=get("mcp_server_host", defaults.mcp_server_host),
+            mcp_server_port=int(get("mcp_server_port", defaults.mcp_server_port)),
+            mcp_server_workers=int(get("mcp_server_workers", defaults.mcp_server_workers)),
+            mcp_internal_token=get("mcp_internal_token", defaults.mcp_internal_token),
+            orchestrator_agent_name=get("orchestrator_agent_name", defaults.orchestrator_agent_name),
+            personalization_agent_name=get("personalization_agent_name", defaults.personalization_agent_name),
+            inventory_agent_name=get("inventory_agent_name", defaults.inventory_agent_name),
+            customer_comms_agent_name=get("customer_comms_agent_name", defaults.customer_comms_agent_name),
+            anomaly_resolver_agent_name=get("anomaly_resolver_agent_name", defaults.anomaly_resolver_agent_name),
+            enabled_events=(
+                _as_tuple(env["ENABLED_EVENTS"]) if "ENABLED_EVENTS" in env else defaults.enabled_events
+            ),
+            a2a_broker_url=get("a2a_broker_url", defaults.a2a_broker_url),
+            a2a_topic_prefix=get("a2a_topic_prefix", defaults.a2a_topic_prefix),
+            database_url=get("database_url", defaults.database_url),
+            redis_url=get("redis_url", defaults.redis_url),
+            enable_metrics=_as_bool(str(get("enable_metrics", defaults.enable_metrics))),
+            metrics_port=int(get("metrics_port", defaults.metrics_port)),
+            log_level=get("log_level", defaults.log_level),
+            log_format=get("log_format", defaults.log_format)
+        )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide settings, parsing the environment once."""
+    return Settings.from_env(_env_snapshot())
 
 
 # Global settings instance
-settings = Settings()
+settings = get_settings()
@@ -9,20 +9,29 @@ Authors:
 
 import asyncio
 import logging
+import signal
 import sys
-from typing import Optional
+from typing import List, Optional
 
+import httpx
+
+from agents.base_agent import BaseAgent, create_mcp_client
 from agents.orchestrator.agent import OrchestratorAgent
 from agents.personalization.agent import PersonalizationAgent
 from agents.inventory.agent import InventoryAgent
 from agents.customer_comms.agent import CustomerCommsAgent
 from agents.anomaly_resolver.agent import AnomalyResolverAgent
-from config.settings import settings
+from config.settings import get_settings
 
 
 async def main():
     """Main function to start all agents."""
-    # Configure logging
+    settings = get_settings()
+    
+    # Configure logging; skip per-record thread/process lookups we never format
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
     logging.basicConfig(
         level=getattr(logging, settings.log_level),
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -31,38 +40,76 @@ async def main():
     
     logger.info("Starting Aegis Orchestrator...")
     
+    # One MCP connection pool shared by every agent
+    mcp_client = create_mcp_client(
+        timeout=httpx.Timeout(30.0, connect=1.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+    )
+    
     # Create agents
     agents = [
-        OrchestratorAgent(),
-        PersonalizationAgent(),
-        InventoryAgent(),
-        CustomerCommsAgent(),
-        AnomalyResolverAgent()
+        OrchestratorAgent(http=mcp_client),
+        PersonalizationAgent(http=mcp_client),
+        InventoryAgent(http=mcp_client),
+        CustomerCommsAgent(http=mcp_client),
+        AnomalyResolverAgent(http=mcp_client)
     ]
     
+    # Stop on SIGINT/SIGTERM so container shutdowns are graceful
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass  # Windows: fall back to KeyboardInterrupt
+    
+    failed = False
     try:
-        # Start all agents
-        start_tasks = [agent.start() for agent in agents]
-        await asyncio.gather(*start_tasks)
+        # Start all agents; a failed start cancels the others
+        async with asyncio.TaskGroup() as tg:
+            for agent in agents:
+                tg.create_task(agent.start(), name=f"start-{agent.__class__.__name__}")
         
         logger.info("All agents started successfully")
         
         # Keep running
-        await asyncio.Event().wait()
+        await stop_event.wait()
         
-    except KeyboardInterrupt:
-        logger.info("Shutting down Aegis Orchestrator...")
-        
-        # Stop all agents
-        stop_tasks = [agent.stop() for agent in agents]
-        await asyncio.gather(*stop_tasks, return_exceptions=True)
-        
-        logger.info("Aegis Orchestrator stopped")
-        
-    except Exception as e:
-        logger.error(f"Error in main: {e}")
+    except* Exception as eg:
+        for e in eg.exceptions:
+            logger.error("Error in main: %s", e)
+        failed = True
+    
+    finally:
+        await _stop_agents(agents, logger)
+        await mcp_client.aclose()
+    
+    if failed:
         sys.exit(1)
 
 
+async def _stop_agents(agents: List[BaseAgent], logger: logging.Logger):
+    """Stop all agents concurrently, logging failures without aborting the others."""
+    logger.info("Shutting down Aegis Orchestrator...")
+    
+    try:
+        async with asyncio.TaskGroup() as tg:
+            for agent in agents:
+                tg.create_task(agent.stop(), name=f"stop-{agent.__class__.__name__}")
+    except* Exception as eg:
+        for e in eg.exceptions:
+            logger.error("Error stopping agent: %s", e)
+    
+    logger.info("Aegis Orchestrator stopped")
+
+
 if __name__ == "__main__":
+    # uvloop is optional; fall back to the default loop where it is unavailable
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     asyncio.run(main())
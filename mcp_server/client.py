@@ -1,69 +1,294 @@
 """HTTP client for communicating with Online Boutique APIs."""
 
 import asyncio
+import logging
+import os
+import random
 import time
-from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, fields
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Union
 import httpx
+import orjson
+import redis.asyncio as aioredis
+from agents.cache import LRUTTLCache
 from config.settings import settings
-from mcp_server.models import MCPRequest, MCPResponse, MCPError
+from mcp_server.models import MCPRequest, MCPRequestType, MCPResponse, MCPError
+
+logger = logging.getLogger(__name__)
+
+# Cache-aside TTLs (seconds) for read-mostly GET endpoints
+_PRODUCT_TTL = 600
+_USER_TTL = 300
+_TTL_JITTER = 30
+
+# In-process tier in front of Redis for user lookups
+_LOCAL_TTL = 300
+_LOCAL_MAXSIZE = 10_000
+
+# Requests whose ID starts with this prefix always go upstream
+_CACHE_BYPASS_PREFIX = "debug-"
+
+_BASE_HEADERS = {
+    "Content-Type": "application/json",
+    "User-Agent": "Aegis-Orchestrator/1.0"
+}
+
+# Bytes of a non-JSON body kept for debugging
+_RAW_PREVIEW_BYTES = 1024
+
+# Bodies at least this large (or of unknown length) are parsed while streaming
+_STREAM_THRESHOLD = 64 * 1024
+
+_QUOTE, _BACKSLASH, _COMMA = ord('"'), ord("\\"), ord(",")
+_ARRAY_OPEN, _ARRAY_CLOSE, _OBJECT_OPEN = ord("["), ord("]"), ord("{")
+_OPENERS, _CLOSERS = frozenset(b"{["), frozenset(b"}]")
+_WHITESPACE = frozenset(b" \t\r\n")
+
+
+class _JSONItemStream:
+    """Incrementally extract the elements of the first JSON array in a byte stream.
+    
+    The array is either the top-level value or, like the buffered path in
+    `make_request_stream`, the first array-valued member of a top-level
+    object such as `{"products": [...]}`. Elements may be objects, arrays,
+    strings or scalars, and scanning stops at the array's closing bracket.
+    Bytes are dropped once an element is decoded, so memory tracks the size
+    of one element rather than the whole body.
+    """
+    
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._top_object = False
+        self._item_depth = -1
+        self._start = -1
+        self._in_string = False
+        self._escaped = False
+        self._done = False
+    
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Add a chunk and return any array elements it completed."""
+        if self._done:
+            return []
+        buffer = self._buffer
+        buffer += chunk
+        items = []
+        
+        for i in range(self._pos, len(buffer)):
+            byte = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif byte == _BACKSLASH:
+                    self._escaped = True
+                elif byte == _QUOTE:
+                    self._in_string = False
+                continue
+            if byte in _WHITESPACE:
+                continue
+            
+            if self._depth == self._item_depth:
+                # Between or inside elements of the item array: a comma or the
+                # closing bracket ends the current element
+                if byte == _COMMA or byte == _ARRAY_CLOSE:
+                    if self._start >= 0:
+                        items.append(orjson.loads(bytes(buffer[self._start:i])))
+                        self._start = -1
+                    if byte == _ARRAY_CLOSE:
+                        self._done = True
+                        break
+                    continue
+                if self._start < 0:
+                    self._start = i
+            
+            if byte == _QUOTE:
+                self._in_string = True
+            elif byte in _OPENERS:
+                if self._depth == 0:
+                    self._top_object = byte == _OBJECT_OPEN
+                if self._item_depth < 0 and byte == _ARRAY_OPEN and (
+                    self._depth == 0 or (self._depth == 1 and self._top_object)
+                ):
+                    self._item_depth = self._depth + 1
+                self._depth += 1
+            elif byte in _CLOSERS:
+                self._depth -= 1
+        
+        if self._done:
+            buffer.clear()
+            return items
+        
+        # Keep only the unfinished element, if any
+        cut = len(buffer) if self._start < 0 else self._start
+        del buffer[:cut]
+        if self._start >= 0:
+            self._start = 0
+        self._pos = len(buffer)
+        return items
+
+
+# Request IDs only need to be unique, not cryptographically random
+_id_rng = random.Random(os.urandom(32))
+
+
+def new_request_id() -> str:
+    """Return a time-ordered request ID: 48-bit ms timestamp plus 80 random bits, in hex."""
+    return f"{time.time_ns() // 1_000_000:012x}{_id_rng.getrandbits(80):020x}"
+
+
+@dataclass(slots=True, frozen=True)
+class _RawReq:
+    """Slotted request for calls built inside the client from typed arguments.
+    
+    Carries exactly the fields `_make_request` reads, so internal calls skip
+    pydantic model construction; `MCPRequest` validation stays at the HTTP edge.
+    """
+    request_id: str
+    agent_id: str
+    method: MCPRequestType
+    endpoint: str
+    params: Optional[Dict[str, Any]] = None
+    headers: Optional[Dict[str, str]] = None
+    body: Optional[Dict[str, Any]] = None
+    timeout: Optional[int] = 30
+    raw: bool = False
+    include_headers: bool = False
+
+
+_RAW_REQ_FIELDS = frozenset(field.name for field in fields(_RawReq))
+
+_AnyRequest = Union[MCPRequest, _RawReq]
+
+
+class _GetSingleFlight:
+    """Shares one upstream call between concurrent identical GET requests.
+    
+    The first caller is sent immediately; identical GETs arriving while it
+    is in flight wait for that response and each get a deep copy under
+    their own request ID.
+    """
+    
+    def __init__(self, send: Callable[[MCPRequest], Awaitable[MCPResponse]]):
+        self._send = send
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+    
+    async def submit(self, request: MCPRequest) -> MCPResponse:
+        """Send a GET, or join the identical one already in flight."""
+        key = self._key(request)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._send(request))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        
+        # Shielded so one caller giving up does not cancel the call for the others
+        response = await asyncio.shield(task)
+        return response.model_copy(update={"request_id": request.request_id}, deep=True)
+    
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+    
+    @staticmethod
+    def _key(request: MCPRequest) -> Hashable:
+        return (
+            request.endpoint,
+            orjson.dumps(request.params, option=orjson.OPT_SORT_KEYS),
+            tuple(sorted((request.headers or {}).items())),
+            request.timeout,
+            request.raw,
+            request.include_headers
+        )
 
 
 class BoutiqueAPIClient:
     """HTTP client for Online Boutique API interactions."""
     
-    def __init__(self):
+    def __init__(self, redis: Optional[aioredis.Redis] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
         self.base_url = settings.boutique_api_url
         self.timeout = httpx.Timeout(30.0)
-        self.client = httpx.AsyncClient(timeout=self.timeout)
+        # One pooled client shared by every agent request through this server
+        # (limits go on the transport; the client ignores them when one is given)
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            transport=transport or httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=60.0),
+                retries=1
+            )
+        )
+        # Optional Redis cache for read-mostly endpoints; the client owns it
+        self.redis = redis
+        self._cache_locks: Dict[str, asyncio.Lock] = {}
+        self._local = LRUTTLCache(maxsize=_LOCAL_MAXSIZE, ttl=_LOCAL_TTL)
+        self._get_flights = _GetSingleFlight(self._make_request)
     
     async def close(self):
         """Close the HTTP client."""
         await self.client.aclose()
+        if self.redis:
+            await self.redis.aclose()
     
-    async def _make_request(self, request: MCPRequest) -> MCPResponse:
+    async def warm_up(self, connections: int = 10, timeout: float = 2.0):
+        """Open keep-alive connections ahead of the first real request; failures are ignored."""
+        results = await asyncio.gather(
+            *(self.client.head(self.base_url + "/health", timeout=timeout) for _ in range(connections)),
+            return_exceptions=True
+        )
+        failed = sum(isinstance(result, Exception) for result in results)
+        if failed:
+            logger.warning("Connection pool warm-up: %d/%d requests failed", failed, connections)
+    
+    @staticmethod
+    def _headers(request: _AnyRequest) -> Dict[str, str]:
+        """Return the shared default headers, merged only when the request adds its own."""
+        return {**_BASE_HEADERS, **request.headers} if request.headers else _BASE_HEADERS
+    
+    async def _make_request(self, request: _AnyRequest) -> MCPResponse:
         """Make an HTTP request to the Online Boutique API."""
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         try:
-            # Build URL
-            url = f"{self.base_url}{request.endpoint}"
-            
-            # Prepare headers
-            headers = {
-                "Content-Type": "application/json",
-                "User-Agent": "Aegis-Orchestrator/1.0",
-                **(request.headers or {})
-            }
-            
             # Make the request
             response = await self.client.request(
                 method=request.method.value,
-                url=url,
+                url=self.base_url + request.endpoint,
                 params=request.params,
-                headers=headers,
+                headers=self._headers(request),
                 json=request.body,
                 timeout=request.timeout
             )
             
-            execution_time = (time.time() - start_time) * 1000
+            execution_time = (time.perf_counter() - start_time) * 1000
             
-            # Parse response
+            # Pass-through callers get the body bytes as-is
+            content = response.content
+            raw = content if request.raw else None
+            
+            # Parse response; a non-JSON body keeps only a short preview
+            data = None
+            parse_error = None
             try:
-                data = response.json() if response.content else None
-            except Exception:
-                data = {"raw_content": response.text}
+                if content and not request.raw:
+                    data = orjson.loads(content)
+            except orjson.JSONDecodeError as e:
+                parse_error = str(e)
+                data = {"raw_content": content[:_RAW_PREVIEW_BYTES].decode("utf-8", "replace")}
             
             return MCPResponse(
                 request_id=request.request_id,
                 status_code=response.status_code,
                 success=200 <= response.status_code < 300,
                 data=data,
-                headers=dict(response.headers),
+                parse_error=parse_error,
+                raw=raw,
+                headers=dict(response.headers) if request.include_headers else None,
                 execution_time_ms=execution_time
             )
             
         except httpx.TimeoutException:
-            execution_time = (time.time() - start_time) * 1000
+            execution_time = (time.perf_counter() - start_time) * 1000
             return MCPResponse(
                 request_id=request.request_id,
                 status_code=408,
@@ -72,7 +297,7 @@ class BoutiqueAPIClient:
                 execution_time_ms=execution_time
             )
         except Exception as e:
-            execution_time = (time.time() - start_time) * 1000
+            execution_time = (time.perf_counter() - start_time) * 1000
             return MCPResponse(
                 request_id=request.request_id,
                 status_code=500,
@@ -81,41 +306,190 @@ class BoutiqueAPIClient:
                 execution_time_ms=execution_time
             )
     
+    async def _cached_request(self, key: str, ttl: int, request: _RawReq,
+                              local: bool = False) -> MCPResponse:
+        """Serve a GET from the cache tiers, fetching and storing it on a miss.
+        
+        `local` adds an in-process LRU tier in front of Redis. An `X-Cache`
+        HIT/MISS header is added only when the request asks for headers.
+        """
+        if request.request_id.startswith(_CACHE_BYPASS_PREFIX) or not (self.redis or local):
+            return await self._make_request(request)
+        
+        start_time = time.perf_counter()
+        cached = self._local.get(key) if local else None
+        if cached is None:
+            cached = await self._cache_get(key)
+        if cached is None:
+            # One upstream fetch per key; concurrent callers wait and re-read the cache
+            lock = self._cache_locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                cached = (self._local.get(key) if local else None) or await self._cache_get(key)
+                if cached is None:
+                    try:
+                        response = await self._make_request(request)
+                        if response.success:
+                            body = response.raw if request.raw else orjson.dumps(response.data)
+                            await self._cache_set(key, ttl, body)
+                            if local:
+                                self._local[key] = body
+                        if request.include_headers:
+                            response.headers = {**(response.headers or {}), "X-Cache": "MISS"}
+                        return response
+                    finally:
+                        if self._cache_locks.get(key) is lock:
+                            del self._cache_locks[key]
+        if local:
+            self._local[key] = cached
+        
+        return MCPResponse(
+            request_id=request.request_id,
+            status_code=200,
+            success=True,
+            data=None if request.raw else orjson.loads(cached),
+            raw=cached if request.raw else None,
+            headers={"X-Cache": "HIT"} if request.include_headers else None,
+            execution_time_ms=(time.perf_counter() - start_time) * 1000
+        )
+    
+    async def invalidate_user(self, user_id: Optional[str] = None, email: Optional[str] = None):
+        """Drop cached lookups for a user after it changes.
+        
+        The boutique API exposes no user-mutating endpoint through this client,
+        so nothing calls this yet: a user changed elsewhere is served stale for
+        up to `_LOCAL_TTL` seconds from this process (`_USER_TTL` from Redis).
+        Callers that change users out of band should call it.
+        """
+        keys = [f"mcp:user:{user_id}"] if user_id else []
+        if email:
+            keys.append(f"mcp:user-email:{email}")
+        for key in keys:
+            self._local.pop(key)
+        if self.redis and keys:
+            try:
+                await self.redis.delete(*keys)
+            except Exception as e:
+                logger.warning("Cache invalidation failed for %s: %s", keys, e)
+    
+    async def _cache_get(self, key: str) -> Optional[bytes]:
+        if not self.redis:
+            return None
+        try:
+            return await self.redis.get(key)
+        except Exception as e:
+            logger.warning("Cache read failed for %s: %s", key, e)
+            return None
+    
+    async def _cache_set(self, key: str, ttl: int, body: bytes):
+        if not self.redis:
+            return
+        try:
+            # Jitter the TTL so entries written together do not expire together
+            await self.redis.setex(key, ttl + random.randint(0, _TTL_JITTER), body)
+        except Exception as e:
+            logger.warning("Cache write failed for %s: %s", key, e)
+    
+    async def make_request_stream(self, request: _AnyRequest,
+                                  threshold: int = _STREAM_THRESHOLD) -> AsyncIterator[Any]:
+        """Yield the elements of a list response as they arrive.
+        
+        Small bodies are read and parsed in one go; bodies of at least
+        `threshold` bytes, or of unknown length, are parsed while streaming.
+        """
+        async with self.client.stream(
+            request.method.value,
+            self.base_url + request.endpoint,
+            params=request.params,
+            headers=self._headers(request),
+            json=request.body,
+            timeout=request.timeout
+        ) as response:
+            response.raise_for_status()
+            
+            length = int(response.headers.get("content-length") or 0)
+            if 0 < length < threshold:
+                data = orjson.loads(await response.aread())
+                if isinstance(data, dict):
+                    data = next((value for value in data.values() if isinstance(value, list)), [])
+                for item in data:
+                    yield item
+                return
+            
+            parser = _JSONItemStream()
+            async for chunk in response.aiter_bytes():
+                for item in parser.feed(chunk):
+                    yield item
+    
     # Product-related methods
     async def get_products(self, request_id: str, agent_id: str, 
-                          category: Optional[str] = None) -> MCPResponse:
+                          category: Optional[str] = None, raw: bool = False) -> MCPResponse:
         """Get all products or products by category."""
         endpoint = "/products"
         params = {"category": category} if category else None
         
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="GET",
+            method=MCPRequestType.GET,
             endpoint=endpoint,
-            params=params
+            params=params,
+            raw=raw
         )
-        return await self._make_request(request)
+        return await self._cached_request(f"mcp:products:{category or '*'}", _PRODUCT_TTL, request)
+    
+    def stream_products(self, request_id: str, agent_id: str,
+                        category: Optional[str] = None) -> AsyncIterator[Any]:
+        """Stream products one by one as they are parsed from the upstream body."""
+        request = _RawReq(
+            request_id=request_id,
+            agent_id=agent_id,
+            method=MCPRequestType.GET,
+            endpoint="/products",
+            params={"category": category} if category else None
+        )
+        return self.make_request_stream(request)
     
     async def get_product(self, request_id: str, agent_id: str, 
-                         product_id: str) -> MCPResponse:
+                         product_id: str, raw: bool = False) -> MCPResponse:
         """Get a specific product by ID."""
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="GET",
-            endpoint=f"/products/{product_id}"
+            method=MCPRequestType.GET,
+            endpoint=f"/products/{product_id}",
+            raw=raw
+        )
+        return await self._cached_request(f"mcp:product:{product_id}", _PRODUCT_TTL, request)
+    
+    async def get_products_batch(self, request_id: str, agent_id: str,
+                                 product_ids: List[str]) -> MCPResponse:
+        """Get several products in one call, in the order requested."""
+        start_time = time.perf_counter()
+        unique_ids = list(dict.fromkeys(product_ids))
+        responses = await asyncio.gather(
+            *(self.get_product(request_id, agent_id, product_id) for product_id in unique_ids)
+        )
+        by_id = dict(zip(unique_ids, responses))
+        
+        return MCPResponse(
+            request_id=request_id,
+            status_code=200,
+            success=True,
+            data={
+                "products": [by_id[pid].data if by_id[pid].success else None for pid in product_ids],
+                "errors": {pid: r.error for pid, r in by_id.items() if not r.success}
+            },
+            execution_time_ms=(time.perf_counter() - start_time) * 1000
         )
-        return await self._make_request(request)
     
     # Cart-related methods
     async def get_cart(self, request_id: str, agent_id: str, 
                       user_id: str) -> MCPResponse:
         """Get user's cart."""
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="GET",
+            method=MCPRequestType.GET,
             endpoint=f"/cart/{user_id}"
         )
         return await self._make_request(request)
@@ -123,10 +497,10 @@ class BoutiqueAPIClient:
     async def add_to_cart(self, request_id: str, agent_id: str, 
                          user_id: str, product_id: str, quantity: int) -> MCPResponse:
         """Add item to cart."""
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="POST",
+            method=MCPRequestType.POST,
             endpoint=f"/cart/{user_id}/items",
             body={
                 "product_id": product_id,
@@ -138,10 +512,10 @@ class BoutiqueAPIClient:
     async def update_cart_item(self, request_id: str, agent_id: str, 
                               user_id: str, product_id: str, quantity: int) -> MCPResponse:
         """Update cart item quantity."""
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="PUT",
+            method=MCPRequestType.PUT,
             endpoint=f"/cart/{user_id}/items/{product_id}",
             body={"quantity": quantity}
         )
@@ -150,10 +524,10 @@ class BoutiqueAPIClient:
     async def remove_from_cart(self, request_id: str, agent_id: str, 
                               user_id: str, product_id: str) -> MCPResponse:
         """Remove item from cart."""
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="DELETE",
+            method=MCPRequestType.DELETE,
             endpoint=f"/cart/{user_id}/items/{product_id}"
         )
         return await self._make_request(request)
@@ -162,61 +536,77 @@ class BoutiqueAPIClient:
     async def create_order(self, request_id: str, agent_id: str, 
                           user_id: str, order_data: Dict[str, Any]) -> MCPResponse:
         """Create a new order."""
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="POST",
+            method=MCPRequestType.POST,
             endpoint=f"/orders/{user_id}",
             body=order_data
         )
         return await self._make_request(request)
     
     async def get_order(self, request_id: str, agent_id: str, 
-                       order_id: str) -> MCPResponse:
+                       order_id: str, raw: bool = False) -> MCPResponse:
         """Get order details."""
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="GET",
-            endpoint=f"/orders/{order_id}"
+            method=MCPRequestType.GET,
+            endpoint=f"/orders/{order_id}",
+            raw=raw
         )
         return await self._make_request(request)
     
     async def get_user_orders(self, request_id: str, agent_id: str, 
                              user_id: str) -> MCPResponse:
         """Get all orders for a user."""
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="GET",
+            method=MCPRequestType.GET,
             endpoint=f"/orders/user/{user_id}"
         )
         return await self._make_request(request)
     
     # User-related methods
     async def get_user(self, request_id: str, agent_id: str, 
-                      user_id: str) -> MCPResponse:
+                      user_id: str, raw: bool = False) -> MCPResponse:
         """Get user information."""
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="GET",
-            endpoint=f"/users/{user_id}"
+            method=MCPRequestType.GET,
+            endpoint=f"/users/{user_id}",
+            raw=raw
         )
-        return await self._make_request(request)
+        return await self._cached_request(f"mcp:user:{user_id}", _USER_TTL, request, local=True)
     
     async def get_user_by_email(self, request_id: str, agent_id: str, 
                                email: str) -> MCPResponse:
         """Get user by email."""
-        request = MCPRequest(
+        request = _RawReq(
             request_id=request_id,
             agent_id=agent_id,
-            method="GET",
+            method=MCPRequestType.GET,
             endpoint=f"/users/email/{email}"
         )
-        return await self._make_request(request)
+        return await self._cached_request(f"mcp:user-email:{email}", _USER_TTL, request, local=True)
+    
+    async def make_request_json(self, body: bytes) -> MCPResponse:
+        """Decode a trusted JSON request straight into `_RawReq` and dispatch it.
+        
+        Raises KeyError, TypeError or ValueError for malformed bodies.
+        """
+        data = orjson.loads(body)
+        data["method"] = MCPRequestType(data["method"])
+        if not data.get("request_id"):
+            data["request_id"] = new_request_id()
+        return await self.make_request(_RawReq(**{k: v for k, v in data.items() if k in _RAW_REQ_FIELDS}))
     
     # Generic method for custom endpoints
     async def make_request(self, request: MCPRequest) -> MCPResponse:
         """Make a generic request to the API."""
+        # GETs are idempotent, so concurrent identical ones can share a call
+        if request.method == MCPRequestType.GET:
+            return await self._get_flights.submit(request)
         return await self._make_request(request)
@@ -24,6 +24,8 @@ class MCPRequest(BaseModel):
     headers: Optional[Dict[str, str]] = Field(default=None, description="Request headers")
     body: Optional[Dict[str, Any]] = Field(default=None, description="Request body")
     timeout: Optional[int] = Field(default=30, description="Request timeout in seconds")
+    raw: bool = Field(default=False, description="Return the response body undecoded")
+    include_headers: bool = Field(default=False, description="Copy upstream response headers into the response")
 
 
 class MCPResponse(BaseModel):
@@ -33,8 +35,15 @@ class MCPResponse(BaseModel):
     success: bool = Field(..., description="Whether the request was successful")
     data: Optional[Dict[str, Any]] = Field(default=None, description="Response data")
     error: Optional[str] = Field(default=None, description="Error message if any")
+    parse_error: Optional[str] = Field(default=None, description="JSON decode error for a non-JSON body")
     headers: Optional[Dict[str, str]] = Field(default=None, description="Response headers")
     execution_time_ms: float = Field(..., description="Request execution time in milliseconds")
+    raw: Optional[bytes] = Field(default=None, exclude=True, description="Undecoded response body")
+
+
+class ProductBatchRequest(BaseModel):
+    """Batch product lookup request."""
+    ids: List[str] = Field(..., description="Product IDs, returned in this order")
 
 
 class MCPError(BaseModel):
@@ -1,26 +1,88 @@
 """MCP Server implementation for Aegis Orchestrator."""
 
 import asyncio
+import hashlib
+import hmac
 import logging
-import uuid
+import queue
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 from typing import Dict, Any
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+import httpx
+import orjson
+import redis.asyncio as aioredis
 import uvicorn
 
 from config.settings import settings
-from mcp_server.client import BoutiqueAPIClient
-from mcp_server.models import MCPRequest, MCPResponse, MCPError
+from mcp_server.client import BoutiqueAPIClient, new_request_id
+from mcp_server.models import MCPRequest, MCPResponse, MCPError, ProductBatchRequest
 
 # Configure logging
 logging.basicConfig(level=getattr(logging, settings.log_level))
 logger = logging.getLogger(__name__)
 
+def _start_log_queue() -> QueueListener:
+    """Move the root handlers behind a queue so logging on the event loop never blocks on I/O."""
+    root = logging.getLogger()
+    listener = QueueListener(queue.SimpleQueue(), *root.handlers, respect_handler_level=True)
+    root.handlers = [QueueHandler(listener.queue)]
+    listener.start()
+    return listener
+
+
+def _stop_log_queue(listener: QueueListener):
+    listener.stop()
+    logging.getLogger().handlers = list(listener.handlers)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create one pooled API client for the app and close it on shutdown."""
+    log_listener = _start_log_queue()
+    app.state.api_client = BoutiqueAPIClient(redis=aioredis.from_url(settings.redis_url))
+    await app.state.api_client.warm_up()
+    logger.info("MCP Server started successfully")
+    try:
+        yield
+    finally:
+        await app.state.api_client.close()
+        logger.info("MCP Server shutdown complete")
+        _stop_log_queue(log_listener)
+
+
+def get_client(request: Request) -> BoutiqueAPIClient:
+    """Return the app's shared API client."""
+    return request.app.state.api_client
+
+
+# HTTP caching directives for the convenience routes
+_PUBLIC_CACHE = "public, max-age=120, stale-while-revalidate=60"
+_PRIVATE_CACHE = "private, max-age=120"
+_NO_STORE = {"Cache-Control": "no-store"}
+
+
+def _cacheable_json(request: Request, body: bytes, cache_control: str) -> Response:
+    """Return a JSON body with an ETag, or 304 if the client already has it."""
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in {t.strip() for t in if_none_match.split(",")}):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Aegis Orchestrator MCP Server",
     description="Model Context Protocol server for AI agent communication with Online Boutique",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -32,26 +94,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global API client
-api_client: BoutiqueAPIClient = None
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the MCP server."""
-    global api_client
-    api_client = BoutiqueAPIClient()
-    logger.info("MCP Server started successfully")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on server shutdown."""
-    global api_client
-    if api_client:
-        await api_client.close()
-    logger.info("MCP Server shutdown complete")
-
 
 @app.get("/health")
 async def health_check():
@@ -60,61 +102,144 @@ async def health_check():
 
 
 @app.post("/mcp/request", response_model=MCPResponse)
-async def handle_mcp_request(request: MCPRequest):
+async def handle_mcp_request(
+    raw_request: Request,
+    api_client: BoutiqueAPIClient = Depends(get_client)
+):
     """Handle MCP requests from AI agents."""
+    # Validate straight from the body bytes and serialize the reply ourselves,
+    # skipping FastAPI's dict -> model -> jsonable_encoder round-trip
     try:
-        logger.info(f"Processing MCP request {request.request_id} from agent {request.agent_id}")
+        request = MCPRequest.model_validate_json(await raw_request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    
+    try:
+        logger.info("Processing MCP request %s from agent %s", request.request_id, request.agent_id)
         
         # Validate request
         if not request.request_id:
-            request.request_id = str(uuid.uuid4())
+            request.request_id = new_request_id()
         
         # Make the API call
         response = await api_client.make_request(request)
         
-        logger.info(f"Request {request.request_id} completed with status {response.status_code}")
-        return response
+        return Response(content=response.model_dump_json(), media_type="application/json")
         
     except Exception as e:
-        logger.error(f"Error processing request {request.request_id}: {str(e)}")
+        logger.error("Error processing request %s: %s", request.request_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/mcp/request/fast", response_model=MCPResponse, include_in_schema=False)
+async def handle_internal_mcp_request(
+    raw_request: Request,
+    api_client: BoutiqueAPIClient = Depends(get_client)
+):
+    """Handle MCP requests from trusted in-cluster agents without pydantic validation."""
+    token = raw_request.headers.get("x-internal-token", "").encode()
+    if not settings.mcp_internal_token or not hmac.compare_digest(token, settings.mcp_internal_token.encode()):
+        raise HTTPException(status_code=403, detail="Internal token required")
+    
+    try:
+        response = await api_client.make_request_json(await raw_request.body())
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid MCP request: {e}")
+    
+    return Response(content=response.model_dump_json(), media_type="application/json")
+
+
 # Convenience endpoints for common operations
 @app.get("/products")
-async def get_products(category: str = None, agent_id: str = "system"):
+async def get_products(
+    request: Request,
+    category: str = None,
+    agent_id: str = "system",
+    api_client: BoutiqueAPIClient = Depends(get_client)
+):
     """Get products with optional category filter."""
-    request_id = str(uuid.uuid4())
-    response = await api_client.get_products(request_id, agent_id, category)
+    request_id = new_request_id()
+    response = await api_client.get_products(request_id, agent_id, category, raw=True)
+    
+    if not response.success:
+        raise HTTPException(status_code=response.status_code, detail=response.error)
+    
+    return _cacheable_json(request, response.raw or b"null", _PUBLIC_CACHE)
+
+
+@app.get("/products.ndjson")
+async def stream_products(
+    category: str = None,
+    agent_id: str = "system",
+    api_client: BoutiqueAPIClient = Depends(get_client)
+):
+    """Stream products as NDJSON, one product per line as it is parsed upstream."""
+    items = api_client.stream_products(new_request_id(), agent_id, category)
+    
+    # Pull the first item before responding so upstream errors still map to a status code
+    try:
+        first = await items.__anext__()
+    except StopAsyncIteration:
+        return StreamingResponse(iter(()), media_type="application/x-ndjson")
+    except httpx.HTTPStatusError as e:
+        await items.aclose()
+        raise HTTPException(status_code=e.response.status_code, detail=str(e))
+    
+    async def lines():
+        yield orjson.dumps(first) + b"\n"
+        async for item in items:
+            yield orjson.dumps(item) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/products:batch")
+async def get_products_batch(
+    batch: ProductBatchRequest,
+    agent_id: str = "system",
+    api_client: BoutiqueAPIClient = Depends(get_client)
+):
+    """Get several products in one round-trip; missing products come back as null."""
+    request_id = new_request_id()
+    response = await api_client.get_products_batch(request_id, agent_id, batch.ids)
     
     if not response.success:
         raise HTTPException(status_code=response.status_code, detail=response.error)
     
-    return response.data
+    return response.data["products"]
 
 
 @app.get("/products/{product_id}")
-async def get_product(product_id: str, agent_id: str = "system"):
+async def get_product(
+    request: Request,
+    product_id: str,
+    agent_id: str = "system",
+    api_client: BoutiqueAPIClient = Depends(get_client)
+):
     """Get a specific product."""
-    request_id = str(uuid.uuid4())
-    response = await api_client.get_product(request_id, agent_id, product_id)
+    request_id = new_request_id()
+    response = await api_client.get_product(request_id, agent_id, product_id, raw=True)
     
     if not response.success:
         raise HTTPException(status_code=response.status_code, detail=response.error)
     
-    return response.data
+    return _cacheable_json(request, response.raw or b"null", _PUBLIC_CACHE)
 
 
 @app.get("/cart/{user_id}")
-async def get_cart(user_id: str, agent_id: str = "system"):
+async def get_cart(
+    user_id: str,
+    agent_id: str = "system",
+    api_client: BoutiqueAPIClient = Depends(get_client)
+):
     """Get user's cart."""
-    request_id = str(uuid.uuid4())
+    request_id = new_request_id()
     response = await api_client.get_cart(request_id, agent_id, user_id)
     
     if not response.success:
         raise HTTPException(status_code=response.status_code, detail=response.error)
     
-    return response.data
+    return ORJSONResponse(response.data, headers=_NO_STORE)
 
 
 @app.post("/cart/{user_id}/items")
@@ -122,47 +247,62 @@ async def add_to_cart(
     user_id: str, 
     product_id: str, 
     quantity: int, 
-    agent_id: str = "system"
+    agent_id: str = "system",
+    api_client: BoutiqueAPIClient = Depends(get_client)
 ):
     """Add item to cart."""
-    request_id = str(uuid.uuid4())
+    request_id = new_request_id()
     response = await api_client.add_to_cart(request_id, agent_id, user_id, product_id, quantity)
     
     if not response.success:
         raise HTTPException(status_code=response.status_code, detail=response.error)
     
-    return response.data
+    return ORJSONResponse(response.data, headers=_NO_STORE)
 
 
 @app.get("/orders/{order_id}")
-async def get_order(order_id: str, agent_id: str = "system"):
+async def get_order(
+    order_id: str,
+    agent_id: str = "system",
+    api_client: BoutiqueAPIClient = Depends(get_client)
+):
     """Get order details."""
-    request_id = str(uuid.uuid4())
-    response = await api_client.get_order(request_id, agent_id, order_id)
+    request_id = new_request_id()
+    response = await api_client.get_order(request_id, agent_id, order_id, raw=True)
     
     if not response.success:
         raise HTTPException(status_code=response.status_code, detail=response.error)
     
-    return response.data
+    return Response(content=response.raw or b"null", media_type="application/json", headers=_NO_STORE)
 
 
 @app.get("/users/{user_id}")
-async def get_user(user_id: str, agent_id: str = "system"):
+async def get_user(
+    request: Request,
+    user_id: str,
+    agent_id: str = "system",
+    api_client: BoutiqueAPIClient = Depends(get_client)
+):
     """Get user information."""
-    request_id = str(uuid.uuid4())
-    response = await api_client.get_user(request_id, agent_id, user_id)
+    request_id = new_request_id()
+    response = await api_client.get_user(request_id, agent_id, user_id, raw=True)
     
     if not response.success:
         raise HTTPException(status_code=response.status_code, detail=response.error)
     
-    return response.data
+    return _cacheable_json(request, response.raw or b"null", _PRIVATE_CACHE)
 
 
 if __name__ == "__main__":
+    # The "auto" loop/parser pick uvloop and httptools when they are installed;
+    # uvicorn ignores workers when reloading
     uvicorn.run(
         "mcp_server.server:app",
         host=settings.mcp_server_host,
         port=settings.mcp_server_port,
+        loop="auto",
+        http="auto",
+        workers=settings.mcp_server_workers,
         reload=settings.debug,
         log_level=settings.log_level.lower()
     )
@@ -0,0 +1,55 @@
+"""Shared fixtures for Aegis Orchestrator tests."""
+
+import asyncio
+
+import pytest
+
+
+class _AsyncStub:
+    """Awaitable stand-in for `_make_request` that returns `return_value` and counts calls."""
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.return_value = None
+        self.calls = 0
+    
+    async def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.return_value
+
+
+# One stub reused by every test that stubs `_make_request`
+_MAKE_REQUEST_STUB = _AsyncStub()
+
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Run every async test on one event loop instead of a fresh loop per test."""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One BoutiqueAPIClient per test session, with no real network stack.
+
+    Under pytest-xdist every worker runs its own session, so each worker
+    builds a private client and workers never share patched state.
+    """
+    import httpx
+    from mcp_server.client import BoutiqueAPIClient
+    
+    client = BoutiqueAPIClient(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    yield client
+    asyncio.run(client.close())
+
+
+@pytest.fixture
+def mock_make_request(client, monkeypatch):
+    """Replace the shared client's `_make_request` with the reusable stub for one test."""
+    _MAKE_REQUEST_STUB.reset()
+    monkeypatch.setattr(client, "_make_request", _MAKE_REQUEST_STUB)
+    return _MAKE_REQUEST_STUB
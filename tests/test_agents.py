@@ -2,6 +2,8 @@
 
 import pytest
 import asyncio
+import json
+import numpy as np
 from unittest.mock import AsyncMock, patch, MagicMock
 from agents.orchestrator.agent import OrchestratorAgent
 from agents.personalization.agent import PersonalizationAgent
@@ -9,6 +11,7 @@ from agents.inventory.agent import InventoryAgent
 from agents.customer_comms.agent import CustomerCommsAgent
 from agents.anomaly_resolver.agent import AnomalyResolverAgent
 from agents.base_agent import AgentMessage
+from agents.cache import LRUTTLCache
 
 
 class TestOrchestratorAgent:
@@ -54,6 +57,14 @@ class TestOrchestratorAgent:
             # Should send message to personalization agent
             mock_send.assert_called_once()
     
+    def test_unknown_enabled_event_skipped(self):
+        """Test a misspelled ENABLED_EVENTS entry is skipped instead of failing startup."""
+        with patch("agents.orchestrator.agent.settings") as mock_settings:
+            mock_settings.enabled_events = ("order_created", "order_craeted", "event")
+            agent = OrchestratorAgent()
+        
+        assert list(agent.event_handlers) == ["order_created"]
+    
     @pytest.mark.asyncio
     async def test_analyze_situation(self, agent):
         """Test situation analysis using Gemini."""
@@ -70,6 +81,40 @@ class TestOrchestratorAgent:
             assert response["status"] == "analysis_complete"
             assert "analysis" in response
             mock_generate.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_analyze_situation_cached(self, agent):
+        """Test identical situations reuse the cached analysis."""
+        request_data = {
+            "situation_description": "High error rate detected",
+            "context_data": {"error_rate": 0.1, "threshold": 0.05}
+        }
+        
+        with patch.object(agent.model, 'generate_content_async') as mock_generate:
+            mock_generate.return_value = MagicMock(text='{"analysis": "Test analysis"}')
+            
+            first = await agent._analyze_situation(request_data)
+            second = await agent._analyze_situation(request_data)
+            
+            assert first["analysis"] == second["analysis"]
+            mock_generate.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_analyze_situation_returns_copies(self, agent):
+        """Test callers cannot modify the cached analysis."""
+        request_data = {"situation_description": "High error rate detected", "context_data": {}}
+        
+        with patch.object(agent.model, 'generate_content_async') as mock_generate:
+            mock_generate.return_value = MagicMock(text='{"analysis": "Test analysis"}')
+            
+            first = await agent._analyze_situation(request_data)
+            first["status"] = "changed"
+            second = await agent._analyze_situation(request_data)
+            second["analysis"] = "changed"
+            third = await agent._analyze_situation(request_data)
+            
+            assert third["status"] == "analysis_complete"
+            assert third["analysis"] == '{"analysis": "Test analysis"}'
 
 
 class TestPersonalizationAgent:
@@ -110,6 +155,54 @@ class TestPersonalizationAgent:
             assert isinstance(recommendations, list)
             mock_generate.assert_called_once()
     
+    @pytest.mark.asyncio
+    async def test_stream_json_items_stops_early(self, agent):
+        """Test streamed replies are cut off once enough objects are parsed."""
+        chunks = ['```json\n[{"product_id": "prod-1", "reason": "a {b}"},', ' {"product_id": "pr', 'od-2"},', ' {"product_id": "prod-3"}]']
+        consumed = []
+        
+        async def stream():
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield MagicMock(text=chunk)
+        
+        with patch.object(agent.model, 'generate_content_async', return_value=stream()):
+            response_text = await agent._stream_json_items("prompt", 2)
+        
+        assert [item["product_id"] for item in json.loads(response_text)] == ["prod-1", "prod-2"]
+        assert len(consumed) == 3
+    
+    @pytest.mark.asyncio
+    async def test_stream_json_items_closes_stream(self, agent):
+        """Test an early cut-off closes the underlying stream."""
+        closed = []
+        
+        async def stream():
+            try:
+                for i in range(5):
+                    yield MagicMock(text=f'{{"product_id": "prod-{i}"}},')
+            finally:
+                closed.append(True)
+        
+        with patch.object(agent.model, 'generate_content_async', return_value=stream()):
+            await agent._stream_json_items("prompt", 2)
+        
+        assert closed == [True]
+    
+    @pytest.mark.asyncio
+    async def test_stream_json_items_wrapped_reply(self, agent):
+        """Test a reply wrapped in an object still yields its recommendations."""
+        await agent.add_products([{"id": "prod-1", "name": "Red Shirt", "categories": ["clothing"]}])
+        
+        async def stream():
+            yield MagicMock(text='{"recommendations": [{"product_id": "prod-1", "reason": "Matches"}]}')
+        
+        with patch.object(agent.model, 'generate_content_async', return_value=stream()):
+            response_text = await agent._stream_json_items("prompt", 5)
+        
+        recommendations = agent._parse_recommendations(response_text)
+        assert [rec["product_id"] for rec in recommendations] == ["prod-1"]
+    
     @pytest.mark.asyncio
     async def test_get_recommendations_request(self, agent):
         """Test handling get recommendations request."""
@@ -127,6 +220,267 @@ class TestPersonalizationAgent:
             
             assert response.success is True
             assert "recommendations" in response.data
+    
+    @pytest.mark.asyncio
+    async def test_bundle_suggestions_cached(self, agent):
+        """Test identical carts reuse the cached LLM response."""
+        cart_items = [{"product_id": "prod-1", "quantity": 1}]
+        
+        with patch.object(agent.model, 'generate_content_async') as mock_generate:
+            mock_generate.return_value = MagicMock(text='[]')
+            
+            await agent._generate_bundle_suggestions("user-123", cart_items)
+            await agent._generate_bundle_suggestions("user-456", cart_items)
+            
+            mock_generate.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_invalidate_llm_cache_drops_user_entries(self, agent):
+        """Test invalidation removes a user's cached answers instead of orphaning them."""
+        generate = AsyncMock(return_value="[]")
+        
+        await agent._cached_llm("user-key", "prompt", "user-123", generate=generate)
+        await agent._cached_llm("shared-key", "prompt", generate=generate)
+        agent._invalidate_llm_cache("user-123")
+        
+        assert "user-key" not in agent._llm_cache
+        assert "shared-key" in agent._llm_cache
+        assert "user-123" not in agent._llm_user_keys
+        
+        await agent._cached_llm("user-key", "prompt", "user-123", generate=generate)
+        assert generate.await_count == 3
+    
+    @pytest.mark.asyncio
+    async def test_cached_llm_releases_lock_on_error(self, agent):
+        """Test a failed LLM call does not leave its coalescing lock behind."""
+        generate = AsyncMock(side_effect=RuntimeError("quota"))
+        
+        with pytest.raises(RuntimeError):
+            await agent._cached_llm("key", "prompt", generate=generate)
+        
+        assert "key" not in agent._llm_locks
+    
+    @pytest.mark.asyncio
+    async def test_products_cached_single_flight(self, agent):
+        """Test concurrent catalog reads share one upstream fetch."""
+        with patch.object(agent, 'get_products') as mock_products:
+            mock_products.return_value = [{"id": "prod-1"}]
+            results = await asyncio.gather(*(agent._products_cached() for _ in range(5)))
+            
+            assert all(result == [{"id": "prod-1"}] for result in results)
+            mock_products.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_fast_recommend_by_similarity(self, agent):
+        """Test similarity ranking from browsing history without the LLM."""
+        products = [
+            {"id": "prod-1", "name": "Red Shirt", "description": "red cotton shirt", "categories": ["clothing"]},
+            {"id": "prod-2", "name": "Blue Shirt", "description": "blue cotton shirt", "categories": ["clothing"]},
+            {"id": "prod-3", "name": "Coffee Mug", "description": "ceramic coffee mug", "categories": ["kitchen"]}
+        ]
+        
+        with patch.object(agent, 'get_products') as mock_products:
+            mock_products.return_value = products
+            await agent._build_product_features()
+        
+        await agent._update_user_profile("user-123", {"browsing_history": ["prod-1"]})
+        
+        with patch.object(agent.model, 'generate_content_async') as mock_generate:
+            recommendations = await agent._generate_recommendations("user-123", [])
+            
+            assert recommendations[0]["product_id"] == "prod-2"
+            assert all(rec["product_id"] != "prod-1" for rec in recommendations)
+            mock_generate.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_fast_recommend_history_before_catalog(self, agent):
+        """Test history recorded before a product was indexed still maps to it."""
+        agent.user_profiles.update("user-123", {"browsing_history": ["prod-2", "unknown"]})
+        await agent.add_products([
+            {"id": "prod-1", "name": "Red Shirt", "description": "red cotton shirt"},
+            {"id": "prod-2", "name": "Blue Shirt", "description": "blue cotton shirt"}
+        ])
+        
+        recommendations = agent._fast_recommend("user-123")
+        
+        assert [rec["product_id"] for rec in recommendations] == ["prod-1"]
+    
+    @pytest.mark.asyncio
+    async def test_update_user_profile_appends_history(self, agent):
+        """Test profile updates append history and track activity."""
+        await agent._update_user_profile("user-123", {"browsing_history": ["prod-1", "prod-2"]})
+        await agent._update_user_profile("user-123", {"browsing_history": "prod-3", "last_page": "home"})
+        await agent._update_user_profile("user-456", {"purchase_history": ["prod-1"]})
+        
+        profile = await agent._get_user_profile("user-123")
+        
+        assert profile["browsing_history"] == ["prod-1", "prod-2", "prod-3"]
+        assert profile["purchase_history"] == []
+        assert profile["last_page"] == "home"
+        assert set(agent.user_profiles.active_user_ids(0)) == {"user-123", "user-456"}
+    
+    @pytest.mark.asyncio
+    async def test_history_keeps_most_recent_items(self, agent):
+        """Test history is bounded to the newest items per user."""
+        maxlen = agent.user_profiles.HISTORY_MAXLEN
+        viewed = [f"prod-{i}" for i in range(maxlen + 30)]
+        
+        await agent._update_user_profile("user-123", {"browsing_history": viewed[:maxlen - 5]})
+        await agent._update_user_profile("user-123", {"browsing_history": viewed[maxlen - 5:]})
+        
+        assert agent.user_profiles.history("user-123", "browsing_history") == viewed[-maxlen:]
+    
+    @pytest.mark.asyncio
+    async def test_profile_fingerprint_ignores_order(self, agent):
+        """Test the stored fingerprint is stable across history order and repeats."""
+        await agent._update_user_profile("user-1", {"browsing_history": ["prod-1", "prod-2"]})
+        await agent._update_user_profile("user-2", {"browsing_history": ["prod-2", "prod-1", "prod-2"]})
+        await agent._update_user_profile("user-3", {"browsing_history": ["prod-3"]})
+        
+        fingerprints = [agent.user_profiles[uid]["_fingerprint"] for uid in ("user-1", "user-2", "user-3")]
+        
+        assert fingerprints[0] == fingerprints[1]
+        assert fingerprints[0] != fingerprints[2]
+    
+    @pytest.mark.asyncio
+    async def test_get_user_profile_loads_from_redis(self, agent):
+        """Test unknown users are hydrated from the persisted profile."""
+        agent._redis = AsyncMock()
+        agent._redis.get.return_value = b'{"browsing_history": ["prod-1"], "purchase_history": [], "preferences": {}}'
+        
+        profile = await agent._get_user_profile("user-123")
+        
+        assert profile["browsing_history"] == ["prod-1"]
+        agent._redis.get.assert_called_once()
+    
+    @pytest.mark.asyncio
+    async def test_browsing_event_keeps_persisted_history(self, agent):
+        """Test an event for a user not in memory merges into the Redis profile."""
+        agent._redis = AsyncMock()
+        agent._redis.get.return_value = (
+            b'{"browsing_history": ["p1", "p2", "p3"], "purchase_history": ["p9"], "preferences": {}}'
+        )
+        
+        with patch.object(agent, '_generate_recommendations', return_value=[]):
+            await agent._handle_user_browsing({
+                "event_type": "user_browsing",
+                "user_id": "user-123",
+                "page": "product-page",
+                "products_viewed": ["p4"]
+            })
+        
+        profile = agent.user_profiles["user-123"]
+        assert profile["browsing_history"] == ["p1", "p2", "p3", "p4"]
+        assert profile["purchase_history"] == ["p9"]
+        assert agent._write_queue.get_nowait() == "user-123"
+    
+    @pytest.mark.asyncio
+    async def test_llm_batch_dedupes_identical_prompts(self, agent):
+        """Test identical prompts in one batch share a single model call."""
+        agent.model = MagicMock()
+        agent.model.generate_content_async = AsyncMock(return_value=MagicMock(text="ok"))
+        agent.is_running = True
+        agent._llm_worker = asyncio.create_task(agent._llm_batch_worker())
+        
+        results = await asyncio.gather(*(agent._generate_text("same") for _ in range(3)))
+        
+        assert results == ["ok", "ok", "ok"]
+        assert agent.model.generate_content_async.call_count == 1
+        agent._llm_worker.cancel()
+    
+    @pytest.mark.asyncio
+    async def test_cleanup_releases_pending_llm_calls(self, agent):
+        """Test shutdown cancels in-flight and queued prompts instead of hanging."""
+        started = asyncio.Event()
+        
+        async def slow_generate(prompt):
+            started.set()
+            await asyncio.sleep(10)
+        
+        agent.model = MagicMock()
+        agent.model.generate_content_async = slow_generate
+        agent.is_running = True
+        agent._llm_worker = asyncio.create_task(agent._llm_batch_worker())
+        
+        in_flight = asyncio.create_task(agent._generate_text("first"))
+        await started.wait()
+        queued = asyncio.create_task(agent._generate_text("second"))
+        await asyncio.sleep(0)
+        
+        await agent.cleanup()
+        
+        for task in (in_flight, queued):
+            with pytest.raises(asyncio.CancelledError):
+                await asyncio.wait_for(task, 1)
+    
+    @pytest.mark.asyncio
+    async def test_profile_reads_served_locally(self, agent):
+        """Test repeated profile reads and updates hit Redis only once."""
+        agent._redis = AsyncMock()
+        agent._redis.get.return_value = None
+        
+        await agent._get_user_profile("user-123")
+        await agent._update_user_profile("user-123", {"last_page": "home"})
+        profile = await agent._get_user_profile("user-123")
+        
+        assert profile["last_page"] == "home"
+        assert agent._redis.get.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_add_products_incremental(self, agent):
+        """Test new products are appended to the feature index."""
+        await agent.add_products([{"id": "prod-1", "name": "Red Shirt", "description": "red cotton shirt"}])
+        await agent.add_products([
+            {"id": "prod-1", "name": "Red Shirt", "description": "red cotton shirt"},
+            {"id": "prod-2", "name": "Blue Shirt", "description": "blue cotton shirt"}
+        ])
+        
+        assert agent.product_ids == ["prod-1", "prod-2"]
+        assert agent.product_vectors.shape[0] == 2
+        assert agent.product_vectors.dtype == np.float32
+    
+    @pytest.mark.asyncio
+    async def test_add_products_concurrent(self, agent):
+        """Test overlapping concurrent adds index each product once."""
+        products = [
+            {"id": "prod-1", "name": "Red Shirt", "description": "red cotton shirt"},
+            {"id": "prod-2", "name": "Blue Shirt", "description": "blue cotton shirt"}
+        ]
+        
+        await asyncio.gather(agent.add_products(products), agent.add_products(products[::-1]))
+        
+        assert sorted(agent.product_ids) == ["prod-1", "prod-2"]
+        assert agent.product_vectors.shape[0] == 2
+    
+    @pytest.mark.asyncio
+    async def test_parse_recommendations_fallback_count(self, agent):
+        """Test an unparseable reply falls back to the configured number of products."""
+        await agent.add_products([{"id": f"prod-{i}", "name": f"Item {i}"} for i in range(8)])
+        agent._RECOMMENDATION_COUNT = 3
+        
+        recommendations = agent._parse_recommendations("not json")
+        
+        assert [rec["product_id"] for rec in recommendations] == ["prod-0", "prod-1", "prod-2"]
+    
+    @pytest.mark.asyncio
+    async def test_parse_recommendations(self, agent):
+        """Test parsing a fenced JSON reply and dropping unknown products."""
+        await agent.add_products([{"id": "prod-1", "name": "Red Shirt", "categories": ["clothing"]}])
+        response_text = '```json\n[{"product_id": "prod-1", "reason": "Matches style", "confidence_score": 0.9}, {"product_id": "made-up"}]\n```'
+        
+        recommendations = agent._parse_recommendations(response_text)
+        
+        assert len(recommendations) == 1
+        assert recommendations[0]["product_id"] == "prod-1"
+        assert recommendations[0]["reason"] == "Matches style"
+        assert recommendations[0]["category"] == "clothing"
+    
+    def test_top_k(self, agent):
+        """Test top-K selection returns the best scores in order."""
+        scores = np.array([0.1, 0.9, 0.3, 0.7, 0.5], dtype=np.float32)
+        
+        assert agent._top_k(scores, 3).tolist() == [1, 3, 4]
+        assert agent._top_k(scores, 10).tolist() == [1, 3, 4, 2, 0]
 
 
 class TestInventoryAgent:
@@ -157,6 +511,20 @@ class TestInventoryAgent:
             assert response["order_id"] == "order-123"
             assert response["items_processed"] == 1
     
+    @pytest.mark.asyncio
+    async def test_bulk_stock_single_round_trip(self, agent):
+        """Test inventory snapshots for many products are read in one pipeline."""
+        pipe = MagicMock()
+        pipe.execute = AsyncMock(return_value=[{b"total": b"12", b"last_updated": b"1.5"}, {}])
+        agent._redis = MagicMock()
+        agent._redis.pipeline.return_value.__aenter__.return_value = pipe
+        
+        stock = await agent.bulk_stock(["prod-1", "prod-2"])
+        
+        assert stock == {"prod-1": {"total": 12, "last_updated": 1.5}}
+        assert pipe.hgetall.call_count == 2
+        pipe.execute.assert_awaited_once()
+    
     @pytest.mark.asyncio
     async def test_handle_inventory_low_event(self, agent):
         """Test handling inventory low event."""
@@ -297,5 +665,30 @@ class TestAnomalyResolverAgent:
                 mock_detect.assert_called_once()
 
 
+
+class TestLRUTTLCache:
+    """Test cases for the bounded agent cache."""
+    
+    def test_evicts_least_recently_used(self):
+        """Test the oldest unused entry is evicted past maxsize."""
+        cache = LRUTTLCache(maxsize=2, ttl=60)
+        cache["a"] = 1
+        cache["b"] = 2
+        assert cache.get("a") == 1
+        cache["c"] = 3
+        
+        assert "a" in cache
+        assert "b" not in cache
+        assert cache.get("b") is None
+        assert cache.get_metrics() == {"size": 2, "hits": 1, "misses": 1, "evictions": 1}
+    
+    def test_expires_after_ttl(self):
+        """Test entries are dropped once their TTL has passed."""
+        cache = LRUTTLCache(maxsize=10, ttl=-1)
+        cache["a"] = 1
+        
+        assert cache.get("a") is None
+        assert len(cache) == 0
+
 if __name__ == "__main__":
     pytest.main([__file__])
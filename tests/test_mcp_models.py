@@ -0,0 +1,58 @@
+"""Tests for MCP Server models."""
+
+import pytest
+from mcp_server.models import MCPRequest, MCPRequestType, MCPResponse
+
+
+class TestMCPModels:
+    """Test cases for MCP models."""
+    
+    def test_mcp_request_creation(self):
+        """Test MCP request model creation."""
+        request = MCPRequest(
+            request_id="test-request",
+            agent_id="test-agent",
+            method=MCPRequestType.GET,
+            endpoint="/test"
+        )
+        
+        assert request.request_id == "test-request"
+        assert request.agent_id == "test-agent"
+        assert request.method == MCPRequestType.GET
+        assert request.endpoint == "/test"
+
+    @pytest.mark.parametrize("build", [MCPRequest, MCPRequest.model_construct],
+                             ids=["validated", "constructed"])
+    def test_mcp_request_round_trip(self, build):
+        """Test MCP request fields round-trip with and without validation."""
+        request = build(
+            request_id="test-request",
+            agent_id="test-agent",
+            method=MCPRequestType.GET,
+            endpoint="/test"
+        )
+
+        assert request.request_id == "test-request"
+        assert request.method == MCPRequestType.GET
+        assert request.endpoint == "/test"
+        assert request.params is None
+    
+    def test_mcp_response_creation(self):
+        """Test MCP response model creation."""
+        response = MCPResponse(
+            request_id="test-request",
+            status_code=200,
+            success=True,
+            data={"test": "data"},
+            execution_time_ms=100.0
+        )
+        
+        assert response.request_id == "test-request"
+        assert response.status_code == 200
+        assert response.success is True
+        assert response.data == {"test": "data"}
+        assert response.execution_time_ms == 100.0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
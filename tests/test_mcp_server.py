@@ -1,116 +1,272 @@
 """Tests for MCP Server."""
 
+import os
 import pytest
 import asyncio
-from unittest.mock import AsyncMock, patch
-from mcp_server.client import BoutiqueAPIClient
+from types import MappingProxyType
+from unittest.mock import AsyncMock, Mock, patch
+
+from agents.cache import LRUTTLCache
 from mcp_server.models import MCPRequest, MCPRequestType
 
+# Immutable happy-path responses shared by the dispatch tests
+_PRODUCTS_RESP = MappingProxyType({
+    "success": True,
+    "data": MappingProxyType({"products": ({"id": "1", "name": "Test Product"},)})
+})
+_PRODUCT_RESP = MappingProxyType({
+    "success": True,
+    "data": MappingProxyType({"id": "1", "name": "Test Product"})
+})
+_CART_RESP = MappingProxyType({
+    "success": True,
+    "data": MappingProxyType({"message": "Item added to cart"})
+})
+
+# Prototype request copied by tests; validation is covered in test_mcp_models
+_BASE_REQ = MCPRequest.model_construct(
+    request_id="test-request",
+    agent_id="test-agent",
+    method=MCPRequestType.GET,
+    endpoint="/test"
+)
+
 
+@pytest.mark.skipif(bool(os.getenv("SKIP_HTTP_TESTS")), reason="SKIP_HTTP_TESTS is set")
+@pytest.mark.xdist_group("mcp_client")
 class TestBoutiqueAPIClient:
     """Test cases for BoutiqueAPIClient."""
     
-    @pytest.fixture
-    def client(self):
-        """Create a test client."""
-        return BoutiqueAPIClient()
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("method,args,expected", [
+        ("get_products", ("test-agent", "test-request"), _PRODUCTS_RESP),
+        ("get_product", ("test-agent", "test-request", "1"), _PRODUCT_RESP),
+        ("add_to_cart", ("test-agent", "test-request", "user1", "product1", 2), _CART_RESP),
+    ])
+    async def test_endpoint_dispatch(self, client, mock_make_request, method, args, expected):
+        """Test that each convenience method dispatches one request and returns its result."""
+        mock_make_request.return_value = expected
+        
+        response = await getattr(client, method)(*args)
+        
+        assert response["success"] is True
+        assert response["data"] == expected["data"]
+        assert mock_make_request.calls == 1
+    
+    @pytest.mark.asyncio
+    async def test_get_products_batch(self, client):
+        """Test batched product lookup keeps input order and dedupes IDs."""
+        async def fake_get_product(request_id, agent_id, product_id):
+            return Mock(success=product_id != "missing", data={"id": product_id}, error="Not found")
+        
+        with patch.object(client, 'get_product', side_effect=fake_get_product) as mock_get:
+            response = await client.get_products_batch("test-request", "test-agent", ["2", "1", "missing", "2"])
+            
+            assert response.success is True
+            assert response.data["products"] == [{"id": "2"}, {"id": "1"}, None, {"id": "2"}]
+            assert response.data["errors"] == {"missing": "Not found"}
+            assert mock_get.call_count == 3
     
     @pytest.mark.asyncio
-    async def test_get_products(self, client):
-        """Test getting products."""
+    async def test_make_request_error_handling(self, client):
+        """Test error handling in make_request."""
+        with patch.object(client.client, 'request') as mock_request:
+            mock_request.side_effect = Exception("Network error")
+            
+            request = _BASE_REQ.model_copy()
+            
+            response = await client._make_request(request)
+            
+            assert response.success is False
+            assert response.status_code == 500
+            assert "Network error" in response.error
+
+    @pytest.mark.asyncio
+    async def test_get_product_cache_aside(self):
+        """Test that cached products skip the upstream call."""
+        from mcp_server.client import BoutiqueAPIClient
+        
+        redis = AsyncMock()
+        redis.get.side_effect = [None, None, b'{"id": "1"}']
+        client = BoutiqueAPIClient(redis=redis)
+        
         with patch.object(client, '_make_request') as mock_request:
-            mock_request.return_value = {
-                "success": True,
-                "data": {"products": [{"id": "1", "name": "Test Product"}]}
-            }
+            mock_request.return_value = Mock(success=True, data={"id": "1"}, headers=None)
             
-            response = await client.get_products("test-agent", "test-request")
+            miss = await client.get_product("test-request", "test-agent", "1")
+            hit = await client.get_product("test-request", "test-agent", "1")
             
-            assert response["success"] is True
-            assert "products" in response["data"]
+            assert miss.headers is None
+            assert hit.headers is None
+            assert hit.data == {"id": "1"}
             mock_request.assert_called_once()
-    
+            redis.setex.assert_called_once()
+            assert redis.setex.call_args[0][0] == "mcp:product:1"
+
     @pytest.mark.asyncio
-    async def test_get_product(self, client):
-        """Test getting a specific product."""
+    async def test_cached_request_x_cache_header(self):
+        """Test that X-Cache is reported only when the caller asks for headers."""
+        from mcp_server.client import BoutiqueAPIClient, _RawReq
+        
+        redis = AsyncMock()
+        redis.get.side_effect = [None, None, b'{"id": "1"}']
+        client = BoutiqueAPIClient(redis=redis)
+        request = _RawReq(
+            request_id="test-request", agent_id="test-agent", method=MCPRequestType.GET,
+            endpoint="/products/1", include_headers=True
+        )
+        
         with patch.object(client, '_make_request') as mock_request:
-            mock_request.return_value = {
-                "success": True,
-                "data": {"id": "1", "name": "Test Product"}
-            }
+            mock_request.return_value = Mock(success=True, data={"id": "1"}, headers={"ETag": "x"})
             
-            response = await client.get_product("test-agent", "test-request", "1")
+            miss = await client._cached_request("mcp:product:1", 600, request)
+            hit = await client._cached_request("mcp:product:1", 600, request)
             
-            assert response["success"] is True
-            assert response["data"]["id"] == "1"
-            mock_request.assert_called_once()
+            assert miss.headers == {"ETag": "x", "X-Cache": "MISS"}
+            assert hit.headers == {"X-Cache": "HIT"}
+
+    @pytest.mark.asyncio
+    async def test_get_user_by_email_memoized(self, client, mock_make_request, monkeypatch):
+        """Test that repeat user lookups are served in-process unless bypassed."""
+        monkeypatch.setattr(client, "_local", LRUTTLCache(maxsize=10, ttl=300))
+        mock_make_request.return_value = Mock(success=True, data={"email": "a@b.c"}, headers=None)
+        
+        await client.get_user_by_email("test-request", "test-agent", "a@b.c")
+        cached = await client.get_user_by_email("test-request", "test-agent", "a@b.c")
+        assert cached.data == {"email": "a@b.c"}
+        assert mock_make_request.calls == 1
+        
+        await client.get_user_by_email("debug-request", "test-agent", "a@b.c")
+        assert mock_make_request.calls == 2
+        
+        await client.invalidate_user(email="a@b.c")
+        await client.get_user_by_email("test-request", "test-agent", "a@b.c")
+        assert mock_make_request.calls == 3
     
     @pytest.mark.asyncio
-    async def test_add_to_cart(self, client):
-        """Test adding item to cart."""
-        with patch.object(client, '_make_request') as mock_request:
-            mock_request.return_value = {
-                "success": True,
-                "data": {"message": "Item added to cart"}
-            }
+    async def test_make_request_coalesces_identical_gets(self, client):
+        """Test that concurrent identical GETs share one upstream call."""
+        upstream = Mock(status_code=200, content=b'{"id": "1"}', headers={})
+        with patch.object(client.client, 'request', return_value=upstream) as mock_request:
+            requests = [
+                _BASE_REQ.model_copy(update={"request_id": f"req-{i}", "endpoint": "/products/1"})
+                for i in range(3)
+            ]
             
-            response = await client.add_to_cart("test-agent", "test-request", "user1", "product1", 2)
+            responses = await asyncio.gather(*(client.make_request(r) for r in requests))
             
-            assert response["success"] is True
+            assert [r.request_id for r in responses] == ["req-0", "req-1", "req-2"]
+            assert all(r.data == {"id": "1"} for r in responses)
             mock_request.assert_called_once()
+            
+            responses[0].data["id"] = "changed"
+            assert responses[1].data == {"id": "1"}
     
     @pytest.mark.asyncio
-    async def test_make_request_error_handling(self, client):
-        """Test error handling in make_request."""
-        with patch.object(client.client, 'request') as mock_request:
-            mock_request.side_effect = Exception("Network error")
-            
-            request = MCPRequest(
-                request_id="test-request",
-                agent_id="test-agent",
-                method=MCPRequestType.GET,
-                endpoint="/test"
+    async def test_make_request_get_sent_without_delay(self, client):
+        """Test that a lone GET goes upstream without waiting for company."""
+        upstream = Mock(status_code=200, content=b'{"id": "1"}', headers={})
+        with patch.object(client.client, 'request', return_value=upstream) as mock_request:
+            pending = asyncio.ensure_future(
+                client.make_request(_BASE_REQ.model_copy(update={"endpoint": "/products/1"}))
             )
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
             
-            response = await client._make_request(request)
-            
-            assert response.success is False
-            assert response.status_code == 500
-            assert "Network error" in response.error
-
+            mock_request.assert_called_once()
+            assert (await pending).success
 
-class TestMCPModels:
-    """Test cases for MCP models."""
+    @pytest.mark.asyncio
+    async def test_make_request_stream(self, client, monkeypatch):
+        """Test that list responses are streamed item by item."""
+        import httpx
+        
+        body = b'{"total": 2, "products": [{"id": "1", "name": "A \\"}"}, {"id": "2", "tags": ["x"]}]}'
+        monkeypatch.setattr(client, "client", httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=body)
+        )))
+        request = _BASE_REQ.model_copy(update={"endpoint": "/products"})
+        
+        streamed = [item async for item in client.make_request_stream(request, threshold=0)]
+        buffered = [item async for item in client.make_request_stream(request)]
+        
+        assert streamed == buffered == [{"id": "1", "name": 'A "}'}, {"id": "2", "tags": ["x"]}]
     
-    def test_mcp_request_creation(self):
-        """Test MCP request model creation."""
-        request = MCPRequest(
-            request_id="test-request",
-            agent_id="test-agent",
-            method=MCPRequestType.GET,
-            endpoint="/test"
-        )
+    @pytest.mark.asyncio
+    async def test_make_request_raw_pass_through(self, client, monkeypatch):
+        """Test that raw requests keep the body bytes and skip decoding."""
+        import httpx
+        
+        monkeypatch.setattr(client, "client", httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=b'{"id": "1"}')
+        )))
+        request = _BASE_REQ.model_copy(update={"endpoint": "/products/1", "raw": True})
         
-        assert request.request_id == "test-request"
-        assert request.agent_id == "test-agent"
-        assert request.method == MCPRequestType.GET
-        assert request.endpoint == "/test"
+        response = await client._make_request(request)
+        
+        assert response.raw == b'{"id": "1"}'
+        assert response.data is None
+        assert response.headers is None
+        assert "raw" not in response.model_dump()
     
-    def test_mcp_response_creation(self):
-        """Test MCP response model creation."""
-        response = MCPResponse(
-            request_id="test-request",
-            status_code=200,
-            success=True,
-            data={"test": "data"},
-            execution_time_ms=100.0
-        )
+    @pytest.mark.asyncio
+    async def test_make_request_non_json_body(self, client, monkeypatch):
+        """Test that a non-JSON body reports the parse error with a short preview."""
+        import httpx
+        
+        monkeypatch.setattr(client, "client", httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(502, content=b"<html>" + b"x" * 5000)
+        )))
+        request = _BASE_REQ.model_copy(update={"endpoint": "/products"})
+        
+        response = await client._make_request(request)
+        
+        assert response.success is False
+        assert response.parse_error
+        assert response.data["raw_content"].startswith("<html>")
+        assert len(response.data["raw_content"]) == 1024
+    
+    def test_json_item_stream_chunked(self):
+        """Test that items split across chunks are decoded once complete."""
+        from mcp_server.client import _JSONItemStream
+        
+        parser = _JSONItemStream()
+        body = b'[{"id": 1}, {"id": 2, "nested": {"a": [1, 2]}}]'
+        
+        items = []
+        for i in range(0, len(body), 5):
+            items.extend(parser.feed(body[i:i + 5]))
+        
+        assert items == [{"id": 1}, {"id": 2, "nested": {"a": [1, 2]}}]
+    
+    def test_json_item_stream_stops_at_first_array(self):
+        """Test that a later sibling array is not mistaken for the item array."""
+        from mcp_server.client import _JSONItemStream
+        
+        parser = _JSONItemStream()
+        body = b'{"meta": {"tags": ["a"]}, "products": [{"id": 1}, [2]], "related": [{"id": 3}]}'
+        
+        items = []
+        for i in range(0, len(body), 3):
+            items.extend(parser.feed(body[i:i + 3]))
+        
+        assert items == [{"id": 1}, [2]]
+    
+    @pytest.mark.asyncio
+    async def test_make_request_stream_scalar_items(self, client, monkeypatch):
+        """Test that arrays of strings and numbers stream the same as they buffer."""
+        import httpx
+        
+        body = b'{"ids": ["a,]", "b" , 3, -1.5e2, true, null], "other": [9]}'
+        monkeypatch.setattr(client, "client", httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=body)
+        )))
+        request = _BASE_REQ.model_copy(update={"endpoint": "/products"})
+        
+        streamed = [item async for item in client.make_request_stream(request, threshold=0)]
+        buffered = [item async for item in client.make_request_stream(request)]
         
-        assert response.request_id == "test-request"
-        assert response.status_code == 200
-        assert response.success is True
-        assert response.data == {"test": "data"}
-        assert response.execution_time_ms == 100.0
+        assert streamed == buffered == ["a,]", "b", 3, -150.0, True, None]
 
 
 if __name__ == "__main__":
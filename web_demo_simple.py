@@ -2,17 +2,35 @@
 """Web-based demonstration of Aegis Orchestrator with simple UI."""
 
 import asyncio
+import gzip
+import hashlib
+import itertools
 import logging
 import sys
 import time
-import json
-from typing import Dict, Any, List
-from unittest.mock import AsyncMock, MagicMock, patch, Mock
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
+from array import array
+from dataclasses import dataclass
+from random import random as _rand
+from typing import Awaitable, Callable, Dict, Any, FrozenSet, List, Optional, Set, Tuple
+import anyio
+import httpx
+from fastapi import BackgroundTasks, FastAPI, Request
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+import orjson
+from pydantic import BaseModel
+import redis.asyncio as aioredis
 import uvicorn
 
+from agents.cache import LRUTTLCache
+
+# brotli is optional; without it the dashboard is precompressed with gzip only
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Set test environment variables
 import os
 os.environ["GEMINI_API_KEY"] = "test_api_key_for_demo"
@@ -28,6 +46,10 @@ os.environ["LOG_LEVEL"] = "INFO"
 os.environ["REDIS_URL"] = "redis://localhost:6379"
 os.environ["A2A_BROKER_URL"] = "redis://localhost:6379"
 
+# Parse the environment once into the frozen project settings
+from config.settings import get_settings
+settings = get_settings()
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -35,14 +57,191 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Mock Google AI modules before any imports
-sys.modules['google.generativeai'] = Mock()
-sys.modules['google.generativeai'].configure = Mock()
-sys.modules['google.generativeai'].GenerativeModel = Mock()
-sys.modules['google.generativeai'].GenerativeModel.return_value.generate_content_async = AsyncMock()
+# Demo mode (the default when run as a script) stubs the Google AI SDK; other
+# entrypoints leave it alone and never import unittest.mock
+if os.environ.get("AEGIS_DEMO_MODE", "1" if __name__ == "__main__" else "0") == "1":
+    from unittest.mock import AsyncMock, Mock
+    
+    # Mock Google AI modules before any imports
+    sys.modules['google.generativeai'] = Mock()
+    sys.modules['google.generativeai'].configure = Mock()
+    sys.modules['google.generativeai'].GenerativeModel = Mock()
+    sys.modules['google.generativeai'].GenerativeModel.return_value.generate_content_async = AsyncMock()
+
+@dataclass(slots=True, frozen=True)
+class Warehouse:
+    """Stock level of a product at one warehouse."""
+    stock: int
+    threshold: int
+
+
+@dataclass(slots=True, frozen=True)
+class Product:
+    """Catalog entry for the demo inventory."""
+    name: str
+    price: float
+    image: str
+    warehouses: Dict[str, Warehouse]
+    category: str
+    tags: Tuple[str, ...]
+    description: str
+
+
+@dataclass(slots=True, frozen=True)
+class UserProfile:
+    """Demo customer profile."""
+    name: str
+    email: str
+    browsing_history: Tuple[str, ...]
+    purchase_history: Tuple[str, ...]
+    preferences: Dict[str, Any]
+    loyalty_tier: str
+
+
+class UserRequest(BaseModel):
+    """A request that names one user."""
+    user_id: str
+
+
+class CartItemRequest(BaseModel):
+    """One product and quantity to add to a cart."""
+    product_id: str
+    quantity: int = 1
+
+
+class AddToCartRequest(CartItemRequest):
+    """One product and quantity to add to a user's cart."""
+    user_id: str
+
+
+class AddItemsRequest(BaseModel):
+    """Several products to add to one user's cart in a single call."""
+    user_id: str
+    items: List[CartItemRequest]
+
+
+class RecommendationBatcher:
+    """Micro-batches recommendation requests so concurrent ones for a user share one run.
+    
+    Requests are collected for up to `window` seconds (or `max_batch`
+    requests); on flush each distinct user is scored once and the result is
+    handed to every caller waiting on that user.
+    """
+    
+    def __init__(self, score: Callable[[str], Awaitable[List[Dict[str, Any]]]],
+                 window: float = 0.005, max_batch: int = 32):
+        self._score = score
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def submit(self, user_id: str) -> List[Dict[str, Any]]:
+        """Queue a user and wait for their recommendations."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((user_id, future))
+        
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+    
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        
+        groups: Dict[str, List[asyncio.Future]] = {}
+        for user_id, future in batch:
+            groups.setdefault(user_id, []).append(future)
+        
+        for user_id, futures in groups.items():
+            task = asyncio.create_task(self._dispatch(user_id, futures))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _dispatch(self, user_id: str, futures: List[asyncio.Future]):
+        try:
+            recommendations = await self._score(user_id)
+        except BaseException as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for future in futures:
+            if not future.done():
+                future.set_result(recommendations)
+    
+    async def close(self):
+        """Flush queued requests and wait for in-flight scoring to finish."""
+        if self._pending:
+            self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the demo system and its recommendation batcher."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = _THREAD_LIMIT
+    await aegis.initialize_system()
+    await aegis.connect_redis(settings.redis_url)
+    aegis.recommendation_batcher = RecommendationBatcher(aegis.recommend_for_user)
+    yield
+    await aegis.recommendation_batcher.close()
+    if not aegis.agents_ready.done():
+        aegis.agents_ready.cancel()
+    if aegis.http is not None:
+        await aegis.http.aclose()
+    if aegis.redis is not None:
+        await aegis.redis.aclose()
+
+# Carts are shared through Redis across workers and expire after a day idle.
+# Each cart is one hash: "item:<product id>" -> quantity, plus the running total.
+_CART_TTL = 86400
+_CART_ITEM_PREFIX = "item:"
+_CART_TOTAL = "__total_cents__"
+# Slots of the system metric counters, in dashboard order
+METRIC_AI, METRIC_EVT, METRIC_PRB, METRIC_CUST = range(4)
+_METRIC_NAMES = ("ai_decisions", "events_processed", "problems_resolved", "customer_interactions")
+# With Redis the counters live in one hash so every worker adds to the same totals
+_METRICS_KEY = "metrics"
+# Shared order number sequence, seeded once from the first worker's start time
+_ORDER_SEQ_KEY = "order_seq"
+# Threads available to sync endpoints and run_sync calls (AnyIO defaults to 40)
+_THREAD_LIMIT = 100
 
 # Create FastAPI app
-app = FastAPI(title="Aegis Orchestrator Demo", description="AI-Powered E-commerce Intelligence")
+app = FastAPI(
+    title="Aegis Orchestrator Demo",
+    description="AI-Powered E-commerce Intelligence",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
+
+def _etag(body: bytes) -> str:
+    """Strong ETag for a JSON snapshot, derived from its bytes so every worker agrees."""
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    return bool(if_none_match) and (
+        if_none_match.strip() == "*"
+        or etag in {tag.strip() for tag in if_none_match.split(",")}
+    )
+
+
+def _recommendation_key(user_id: str, cart_items: List[Dict[str, Any]]) -> Tuple[str, Tuple[str, ...]]:
+    """Cache key for a user's recommendations: the user and their sorted cart product IDs."""
+    return user_id, tuple(sorted(item["product_id"] for item in cart_items))
+
 
 class WebAegisOrchestrator:
     """Web-based Aegis Orchestrator Demo."""
@@ -51,703 +250,615 @@ class WebAegisOrchestrator:
         self.user_profiles = {}
         self.inventory_data = {}
         self.orders = {}
+        # Demo order IDs: a counter seeded from the start time, not a clock read per order
+        self._order_seq = itertools.count(int(time.time()))
         self.cart_data = {}
-        self.system_metrics = {
-            "ai_decisions": 0,
-            "events_processed": 0,
-            "problems_resolved": 0,
-            "customer_interactions": 0
-        }
+        self.redis = None
+        self._metrics = array("q", [0] * len(_METRIC_NAMES))
         self.agents = {}
+        self.http: Optional[httpx.AsyncClient] = None
+        self.agents_ready: Optional[asyncio.Task] = None
         self.current_user = None
+        self.recommendation_batcher = None
+        # Serialized customer profiles and their ETag, rebuilt lazily after a write
+        self._customers_json = None
+        self._customers_etag = ""
+        # Inventory JSON and ETag, swapped together with inventory_data by publish_inventory
+        self._inventory_json = b"{}"
+        self._inventory_etag = _etag(b"{}")
+        # Bumped on every write so clients can tell when a snapshot changed
+        self.customers_version = 0
+        self.inventory_version = 0
+        # Recommendation index over the inventory: product IDs per category
+        # (in catalog order) and each product's tags as a frozenset
+        self._by_category: Dict[str, Tuple[str, ...]] = {}
+        self._tag_sets: Dict[str, FrozenSet[str]] = {}
+        # Prices in integer cents; cart totals are kept in cents and only
+        # converted to dollars when a cart is rendered
+        self._price_cents: Dict[str, int] = {}
+        # Each user's preferred colors as a frozenset, matched against _tag_sets
+        self._color_sets: Dict[str, FrozenSet[str]] = {}
+        # Recommendations keyed by (user, sorted cart product IDs); the key
+        # covers the whole input, so cart writes need no invalidation
+        self._rec_cache = LRUTTLCache(maxsize=10_000, ttl=600)
+        # (product ID, warehouse) pairs at or below threshold, used as an ordered set
+        self._low_stock: Dict[Tuple[str, str], None] = {}
         
     async def initialize_system(self):
-        """Initialize the Aegis Orchestrator system."""
-        logger.info("Initializing Aegis Orchestrator Web Demo...")
+        """Initialize the Aegis Orchestrator system.
         
-        # Initialize agents
-        with patch('httpx.AsyncClient') as mock_client:
-            mock_client.return_value = AsyncMock()
-            
-            from agents.orchestrator.agent import OrchestratorAgent
-            from agents.personalization.agent import PersonalizationAgent
-            from agents.inventory.agent import InventoryAgent
-            from agents.customer_comms.agent import CustomerCommsAgent
-            from agents.anomaly_resolver.agent import AnomalyResolverAgent
-            
-            self.agents = {
-                "orchestrator": OrchestratorAgent(),
-                "personalization": PersonalizationAgent(),
-                "inventory": InventoryAgent(),
-                "customer_comms": CustomerCommsAgent(),
-                "anomaly_resolver": AnomalyResolverAgent()
-            }
+        Sample data is loaded before returning; the agents are imported and
+        built on a worker thread so the server can accept requests meanwhile.
+        Await `agents_ready` before touching `self.agents`.
+        """
+        logger.info("Initializing Aegis Orchestrator Web Demo...")
         
         # Initialize sample data
         self._initialize_sample_data()
         
+        # Initialize agents in the background
+        self.agents_ready = asyncio.create_task(asyncio.to_thread(self._build_agents))
+        self.agents_ready.add_done_callback(self._log_agents_ready)
+        
         logger.info("Aegis Orchestrator Web Demo initialized successfully!")
         return True
     
+    def _build_agents(self):
+        """Import and construct the agents; runs on a worker thread."""
+        from agents.base_agent import create_mcp_client
+        from agents.orchestrator.agent import OrchestratorAgent
+        from agents.personalization.agent import PersonalizationAgent
+        from agents.inventory.agent import InventoryAgent
+        from agents.customer_comms.agent import CustomerCommsAgent
+        from agents.anomaly_resolver.agent import AnomalyResolverAgent
+        
+        # One MCP connection pool shared by every agent
+        self.http = create_mcp_client(
+            timeout=httpx.Timeout(30.0, connect=1.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+        
+        self.agents = {
+            "orchestrator": OrchestratorAgent(http=self.http),
+            "personalization": PersonalizationAgent(http=self.http),
+            "inventory": InventoryAgent(http=self.http),
+            "customer_comms": CustomerCommsAgent(http=self.http),
+            "anomaly_resolver": AnomalyResolverAgent(http=self.http)
+        }
+    
+    @staticmethod
+    def _log_agents_ready(task: asyncio.Task):
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.error(f"Error initializing agents: {task.exception()}")
+        else:
+            logger.info("Aegis agents ready")
+    
     def _initialize_sample_data(self):
         """Initialize sample data for the demo."""
         # Sample user profiles
         self.user_profiles = {
-            "demo-user-1": {
-                "name": "Demo User 1",
-                "email": "demo1@example.com",
-                "browsing_history": ["casual-wear", "sweaters", "denim", "shoes"],
-                "purchase_history": ["blue-jeans", "white-sneakers", "red-dress"],
-                "preferences": {"style": "casual", "colors": ["yellow", "blue", "red"]},
-                "loyalty_tier": "gold"
-            },
-            "demo-user-2": {
-                "name": "Demo User 2",
-                "email": "demo2@example.com",
-                "browsing_history": ["electronics", "gadgets", "accessories"],
-                "purchase_history": ["wireless-mouse", "laptop-stand"],
-                "preferences": {"style": "tech", "colors": ["black", "silver"]},
-                "loyalty_tier": "silver"
-            },
-            "demo-user-3": {
-                "name": "Demo User 3",
-                "email": "demo3@example.com",
-                "browsing_history": ["formal-wear", "jewelry", "handbags"],
-                "purchase_history": ["pearl-necklace", "black-heels"],
-                "preferences": {"style": "elegant", "colors": ["black", "white", "gold"]},
-                "loyalty_tier": "platinum"
-            }
+            "demo-user-1": UserProfile(
+                name="Demo User 1",
+                email="demo1@example.com",
+                browsing_history=("casual-wear", "sweaters", "denim", "shoes"),
+                purchase_history=("blue-jeans", "white-sneakers", "red-dress"),
+                preferences={"style": "casual", "colors": ["yellow", "blue", "red"]},
+                loyalty_tier="gold"
+            ),
+            "demo-user-2": UserProfile(
+                name="Demo User 2",
+                email="demo2@example.com",
+                browsing_history=("electronics", "gadgets", "accessories"),
+                purchase_history=("wireless-mouse", "laptop-stand"),
+                preferences={"style": "tech", "colors": ["black", "silver"]},
+                loyalty_tier="silver"
+            ),
+            "demo-user-3": UserProfile(
+                name="Demo User 3",
+                email="demo3@example.com",
+                browsing_history=("formal-wear", "jewelry", "handbags"),
+                purchase_history=("pearl-necklace", "black-heels"),
+                preferences={"style": "elegant", "colors": ["black", "white", "gold"]},
+                loyalty_tier="platinum"
+            )
+        }
+        self._color_sets = {
+            user_id: frozenset(profile.preferences["colors"])
+            for user_id, profile in self.user_profiles.items()
         }
         
         # Sample inventory data
-        self.inventory_data = {
-            "yellow-sweater": {
-                "name": "Yellow Cashmere Sweater",
-                "price": 89.99,
-                "image": "https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=300&h=300&fit=crop",
-                "warehouses": {
-                    "east-coast": {"stock": 15, "threshold": 10},
-                    "west-coast": {"stock": 8, "threshold": 10},
-                    "central": {"stock": 25, "threshold": 10}
+        self.publish_inventory({
+            "yellow-sweater": Product(
+                name="Yellow Cashmere Sweater",
+                price=89.99,
+                image="https://images.unsplash.com/photo-1578662996442-48f60103fc96?w=300&h=300&fit=crop",
+                warehouses={
+                    "east-coast": Warehouse(stock=15, threshold=10),
+                    "west-coast": Warehouse(stock=8, threshold=10),
+                    "central": Warehouse(stock=25, threshold=10)
                 },
-                "category": "sweaters",
-                "tags": ["casual", "warm", "yellow"],
-                "description": "Luxurious cashmere sweater in vibrant yellow"
-            },
-            "denim-jeans": {
-                "name": "Classic Blue Denim Jeans",
-                "price": 79.99,
-                "image": "https://images.unsplash.com/photo-1542272604-787c3835535d?w=300&h=300&fit=crop",
-                "warehouses": {
-                    "east-coast": {"stock": 5, "threshold": 10},
-                    "west-coast": {"stock": 30, "threshold": 10},
-                    "central": {"stock": 12, "threshold": 10}
+                category="sweaters",
+                tags=("casual", "warm", "yellow"),
+                description="Luxurious cashmere sweater in vibrant yellow"
+            ),
+            "denim-jeans": Product(
+                name="Classic Blue Denim Jeans",
+                price=79.99,
+                image="https://images.unsplash.com/photo-1542272604-787c3835535d?w=300&h=300&fit=crop",
+                warehouses={
+                    "east-coast": Warehouse(stock=5, threshold=10),
+                    "west-coast": Warehouse(stock=30, threshold=10),
+                    "central": Warehouse(stock=12, threshold=10)
                 },
-                "category": "denim",
-                "tags": ["casual", "blue", "jeans"],
-                "description": "Classic fit denim jeans in timeless blue"
-            },
-            "white-sneakers": {
-                "name": "White Canvas Sneakers",
-                "price": 59.99,
-                "image": "https://images.unsplash.com/photo-1549298916-b41d501d3772?w=300&h=300&fit=crop",
-                "warehouses": {
-                    "east-coast": {"stock": 20, "threshold": 10},
-                    "west-coast": {"stock": 15, "threshold": 10},
-                    "central": {"stock": 8, "threshold": 10}
+                category="denim",
+                tags=("casual", "blue", "jeans"),
+                description="Classic fit denim jeans in timeless blue"
+            ),
+            "white-sneakers": Product(
+                name="White Canvas Sneakers",
+                price=59.99,
+                image="https://images.unsplash.com/photo-1549298916-b41d501d3772?w=300&h=300&fit=crop",
+                warehouses={
+                    "east-coast": Warehouse(stock=20, threshold=10),
+                    "west-coast": Warehouse(stock=15, threshold=10),
+                    "central": Warehouse(stock=8, threshold=10)
                 },
-                "category": "shoes",
-                "tags": ["casual", "white", "sneakers"],
-                "description": "Comfortable white canvas sneakers for everyday wear"
-            },
-            "wireless-mouse": {
-                "name": "Wireless Gaming Mouse",
-                "price": 49.99,
-                "image": "https://images.unsplash.com/photo-1527864550417-7f457444d1b5?w=300&h=300&fit=crop",
-                "warehouses": {
-                    "east-coast": {"stock": 3, "threshold": 10},
-                    "west-coast": {"stock": 18, "threshold": 10},
-                    "central": {"stock": 22, "threshold": 10}
+                category="shoes",
+                tags=("casual", "white", "sneakers"),
+                description="Comfortable white canvas sneakers for everyday wear"
+            ),
+            "wireless-mouse": Product(
+                name="Wireless Gaming Mouse",
+                price=49.99,
+                image="https://images.unsplash.com/photo-1527864550417-7f457444d1b5?w=300&h=300&fit=crop",
+                warehouses={
+                    "east-coast": Warehouse(stock=3, threshold=10),
+                    "west-coast": Warehouse(stock=18, threshold=10),
+                    "central": Warehouse(stock=22, threshold=10)
                 },
-                "category": "electronics",
-                "tags": ["tech", "wireless", "gaming"],
-                "description": "High-performance wireless mouse for gaming and work"
-            }
-        }
+                category="electronics",
+                tags=("tech", "wireless", "gaming"),
+                description="High-performance wireless mouse for gaming and work"
+            )
+        })
         
         # Initialize empty carts
         for user_id in self.user_profiles:
-            self.cart_data[user_id] = {"items": [], "total": 0.0}
+            self.cart_data[user_id] = {}
+        
+        self.invalidate_customers()
+    
+    async def connect_redis(self, url: str):
+        """Keep carts, metrics and order numbers in Redis if it is reachable, else in this process."""
+        client = aioredis.from_url(url, decode_responses=True)
+        try:
+            await client.ping()
+            await client.set(_ORDER_SEQ_KEY, next(self._order_seq), nx=True)
+        except Exception as e:
+            logger.warning(f"Redis unavailable, keeping carts in process: {e}")
+            await client.aclose()
+            return
+        self.redis = client
+    
+    def _cart_from_fields(self, fields: Dict[str, Any], lean: bool = False) -> Dict[str, Any]:
+        """Expand cart hash fields into the cart the dashboard renders.
+        
+        A lean cart lists only product IDs and quantities; clients fill in
+        names, prices and images from the inventory they already hold.
+        """
+        items = []
+        for field, quantity in fields.items():
+            if not field.startswith(_CART_ITEM_PREFIX):
+                continue
+            product_id = field[len(_CART_ITEM_PREFIX):]
+            if lean:
+                items.append({"product_id": product_id, "quantity": int(quantity)})
+                continue
+            product = self.inventory_data[product_id]
+            items.append({
+                "product_id": product_id,
+                "name": product.name,
+                "price": product.price,
+                "quantity": int(quantity),
+                "image": product.image
+            })
+        return {"items": items, "total": int(fields.get(_CART_TOTAL, 0)) / 100}
+    
+    async def load_cart(self, user_id: str) -> Dict[str, Any]:
+        """Return a user's cart."""
+        if self.redis is None:
+            fields = self.cart_data[user_id]
+        else:
+            fields = await self.redis.hgetall(f"cart:{user_id}")
+        return self._cart_from_fields(fields)
+    
+    async def add_cart_items(self, user_id: str, items: List[Tuple[str, int]]) -> Dict[str, Any]:
+        """Add (product ID, quantity) pairs to a user's cart and return the updated lean cart."""
+        price_cents = self._price_cents
+        amount = sum(price_cents[product_id] * quantity for product_id, quantity in items)
+        
+        if self.redis is None:
+            fields = self.cart_data[user_id]
+            for product_id, quantity in items:
+                field = _CART_ITEM_PREFIX + product_id
+                fields[field] = fields.get(field, 0) + quantity
+            fields[_CART_TOTAL] = fields.get(_CART_TOTAL, 0) + amount
+            return self._cart_from_fields(fields, lean=True)
+        
+        # One MULTI round trip: the increments are atomic across workers and
+        # the same transaction reads back the updated cart
+        key = f"cart:{user_id}"
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for product_id, quantity in items:
+                pipe.hincrby(key, _CART_ITEM_PREFIX + product_id, quantity)
+            pipe.hincrby(key, _CART_TOTAL, amount)
+            pipe.expire(key, _CART_TTL)
+            pipe.hgetall(key)
+            *_, fields = await pipe.execute()
+        return self._cart_from_fields(fields, lean=True)
+    
+    async def clear_cart(self, user_id: str):
+        """Empty a user's cart."""
+        if self.redis is None:
+            self.cart_data[user_id] = {}
+            return
+        await self.redis.delete(f"cart:{user_id}")
+    
+    async def next_order_id(self) -> str:
+        """Return a new demo order ID, unique across workers when Redis is connected."""
+        if self.redis is None:
+            return f"ORD-{next(self._order_seq)}"
+        return f"ORD-{await self.redis.incr(_ORDER_SEQ_KEY)}"
+    
+    async def count(self, *slots: int):
+        """Add one to each given metric counter."""
+        if self.redis is None:
+            metrics = self._metrics
+            for slot in slots:
+                metrics[slot] += 1
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for slot in slots:
+                pipe.hincrby(_METRICS_KEY, _METRIC_NAMES[slot], 1)
+            await pipe.execute()
+    
+    async def load_metrics(self) -> Dict[str, int]:
+        """Return the metric counters keyed by name."""
+        if self.redis is None:
+            return dict(zip(_METRIC_NAMES, self._metrics))
+        fields = await self.redis.hgetall(_METRICS_KEY)
+        return {name: int(fields.get(name, 0)) for name in _METRIC_NAMES}
+    
+    def invalidate_customers(self):
+        """Drop the serialized customer profiles after a write."""
+        self._customers_json = None
+        self.customers_version += 1
+    
+    def customers_json(self) -> bytes:
+        """Return the customer profiles as JSON, serializing only after a change."""
+        if self._customers_json is None:
+            self._customers_json = orjson.dumps(self.user_profiles)
+            self._customers_etag = _etag(self._customers_json)
+        return self._customers_json
+    
+    def customers_etag(self) -> str:
+        """Return the ETag of the current customer profiles JSON."""
+        self.customers_json()
+        return self._customers_etag
+    
+    def publish_inventory(self, inventory: Dict[str, Product]):
+        """Install a new inventory and its JSON snapshot in one step.
+        
+        Writers pass a fresh dict instead of mutating the live one. The swap
+        has no await in it, so readers on the event loop see either the old
+        pair or the new one and never take a lock.
+        """
+        snapshot = orjson.dumps(inventory)
+        etag = _etag(snapshot)
+        by_category: Dict[str, List[str]] = {}
+        for product_id, product in inventory.items():
+            by_category.setdefault(product.category, []).append(product_id)
+        by_category = {category: tuple(ids) for category, ids in by_category.items()}
+        tag_sets = {product_id: frozenset(product.tags) for product_id, product in inventory.items()}
+        price_cents = {product_id: round(product.price * 100) for product_id, product in inventory.items()}
+        low_stock = {
+            (product_id, warehouse): None
+            for product_id, product in inventory.items()
+            for warehouse, level in product.warehouses.items()
+            if level.stock <= level.threshold
+        }
+        
+        self.inventory_data, self._inventory_json = inventory, snapshot
+        self._inventory_etag = etag
+        self.inventory_version += 1
+        self._by_category, self._tag_sets = by_category, tag_sets
+        self._price_cents = price_cents
+        self._low_stock = low_stock
+        self._rec_cache.clear()
+    
+    def inventory_json(self) -> bytes:
+        """Return the current inventory snapshot."""
+        return self._inventory_json
+    
+    def inventory_etag(self) -> str:
+        """Return the ETag of the current inventory snapshot."""
+        return self._inventory_etag
+    
+    async def _trigger_cart_analysis(self, user_id: str, cart_items: List[Dict[str, Any]]):
+        """Trigger AI cart analysis.
+        
+        Kept async so BackgroundTasks runs it on the event loop, not in a thread.
+        """
+        if user_id not in self.user_profiles:
+            return
+        
+        # Generate AI recommendations
+        recommendations = self._cached_recommendations(user_id, cart_items)
+        
+        await self.count(METRIC_AI, METRIC_EVT)
+        
+        return recommendations
+    
+    async def recommend_for_user(self, user_id: str):
+        """Generate recommendations from a user's current cart and profile."""
+        cart = await self.load_cart(user_id)
+        return self._cached_recommendations(user_id, cart["items"])
+    
+    def _cached_recommendations(self, user_id: str, cart_items):
+        """Return recommendations for a cart, reusing them while the cart is unchanged."""
+        key = _recommendation_key(user_id, cart_items)
+        recommendations = self._rec_cache.get(key)
+        if recommendations is None:
+            recommendations = self._generate_ai_recommendations(
+                cart_items, self.user_profiles[user_id], self._color_sets[user_id]
+            )
+            self._rec_cache[key] = recommendations
+        return recommendations
+    
+    def _generate_ai_recommendations(self, cart_items, user_profile, colors: FrozenSet[str]):
+        """Generate AI recommendations based on cart and profile."""
+        recommendations = []
+        
+        # Simple AI logic for demo
+        inventory = self.inventory_data
+        tag_sets = self._tag_sets
+        cart_categories = {inventory[item["product_id"]].category for item in cart_items}
+        reason = f"Matches your {user_profile.preferences['style']} style"
+        append = recommendations.append
+        
+        # Find complementary items that match user preferences; stop at the top 3
+        for category, product_ids in self._by_category.items():
+            if category in cart_categories:
+                continue
+            for product_id in product_ids:
+                if tag_sets[product_id].isdisjoint(colors):
+                    continue
+                product = inventory[product_id]
+                append({
+                    "product_id": product_id,
+                    "name": product.name,
+                    "reason": reason,
+                    "discount": 10,
+                    "confidence": 0.85,
+                    "image": product.image,
+                    "price": product.price
+                })
+                if len(recommendations) == 3:
+                    return recommendations
+        
+        return recommendations
 
 # Global instance
 aegis = WebAegisOrchestrator()
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the system on startup."""
-    await aegis.initialize_system()
+# Every route below is `async def` and only touches in-process state or awaits
+# Redis, so none of them block the event loop. Anything blocking added later
+# (agent calls, disk or sync HTTP) must go through `anyio.to_thread.run_sync`.
+# Handlers return Response objects themselves so FastAPI skips its
+# `jsonable_encoder` walk; orjson serializes the dicts and dataclasses directly.
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+_STATIC_DIR = os.path.join(_BASE_DIR, "static")
+
+# Pinned CDN assets and the file names they may be vendored under in static/
+_VENDORED_ASSETS = {
+    b"https://cdn.tailwindcss.com/3.3.5": "tailwind.js",
+    b"https://unpkg.com/alpinejs@3.13.3/dist/cdn.min.js": "alpine.min.js"
+}
+
+if os.path.isdir(_STATIC_DIR):
+    app.mount("/static", StaticFiles(directory=_STATIC_DIR), name="static")
+
+# Dashboard markup, read once at import instead of on every request
+_HOME_PATH = os.path.join(_BASE_DIR, "templates", "home.html")
+with open(_HOME_PATH, "rb") as home_file:
+    _HOME_BYTES = home_file.read()
+# Serve vendored copies from this host when present, else fall back to the CDN
+for cdn_url, file_name in _VENDORED_ASSETS.items():
+    if os.path.isfile(os.path.join(_STATIC_DIR, file_name)):
+        _HOME_BYTES = _HOME_BYTES.replace(cdn_url, f"/static/{file_name}".encode())
+_HOME_TAG = hashlib.blake2b(_HOME_BYTES, digest_size=16).hexdigest()
+
+# Precompressed encodings in server preference order; identity always last
+_HOME_ENCODINGS = [("gzip", gzip.compress(_HOME_BYTES, compresslevel=9)), (None, _HOME_BYTES)]
+if brotli is not None:
+    _HOME_ENCODINGS.insert(0, ("br", brotli.compress(_HOME_BYTES, quality=11)))
+
+# Each encoding gets its own ETag so caches never mix the variants
+_HOME_HEADERS: Dict[Optional[str], Dict[str, str]] = {}
+_HOME_RESPONSES: Dict[Optional[str], Response] = {}
+for encoding, body in _HOME_ENCODINGS:
+    headers = {
+        "ETag": f'"{_HOME_TAG}-{encoding}"' if encoding else f'"{_HOME_TAG}"',
+        "Cache-Control": "public, max-age=3600",
+        "Vary": "Accept-Encoding"
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    _HOME_HEADERS[encoding] = headers
+    # Responses hold no per-request state, so one instance serves every request
+    _HOME_RESPONSES[encoding] = Response(content=body, media_type="text/html", headers=headers)
+
+def _accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows an encoding; `q=0` refuses it."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, *params = part.split(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+    return weights.get(encoding, weights.get("*", 0.0)) > 0
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Home page with dashboard."""
-    return """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Aegis Orchestrator - AI-Powered E-commerce Intelligence</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <script src="https://unpkg.com/alpinejs@3.x.x/dist/cdn.min.js" defer></script>
-    <style>
-        .gradient-bg { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); }
-        .card-hover { transition: transform 0.2s, box-shadow 0.2s; }
-        .card-hover:hover { transform: translateY(-2px); box-shadow: 0 10px 25px rgba(0,0,0,0.1); }
-    </style>
-</head>
-<body class="bg-gray-50">
-    <div x-data="aegisApp()" class="min-h-screen">
-        <!-- Header -->
-        <header class="gradient-bg text-white shadow-lg">
-            <div class="container mx-auto px-6 py-4">
-                <div class="flex items-center justify-between">
-                    <div class="flex items-center space-x-3">
-                        <div class="text-3xl">🎯</div>
-                        <div>
-                            <h1 class="text-2xl font-bold">Aegis Orchestrator</h1>
-                            <p class="text-blue-100">AI-Powered E-commerce Intelligence</p>
-                        </div>
-                    </div>
-                    <div class="flex items-center space-x-4">
-                        <div class="text-right">
-                            <div class="text-sm text-blue-100">System Status</div>
-                            <div class="text-lg font-semibold text-green-300">🟢 OPERATIONAL</div>
-                        </div>
-                    </div>
-                </div>
-            </div>
-        </header>
-
-        <!-- Main Content -->
-        <main class="container mx-auto px-6 py-8">
-            <!-- Navigation Tabs -->
-            <div class="mb-8">
-                <div class="flex space-x-1 bg-white rounded-lg p-1 shadow-sm">
-                    <button @click="activeTab = 'dashboard'" 
-                            :class="activeTab === 'dashboard' ? 'bg-blue-500 text-white' : 'text-gray-600'"
-                            class="px-4 py-2 rounded-md font-medium transition-colors">
-                        📊 Dashboard
-                    </button>
-                    <button @click="activeTab = 'customers'" 
-                            :class="activeTab === 'customers' ? 'bg-blue-500 text-white' : 'text-gray-600'"
-                            class="px-4 py-2 rounded-md font-medium transition-colors">
-                        👤 Customers
-                    </button>
-                    <button @click="activeTab = 'inventory'" 
-                            :class="activeTab === 'inventory' ? 'bg-blue-500 text-white' : 'text-gray-600'"
-                            class="px-4 py-2 rounded-md font-medium transition-colors">
-                        📦 Inventory
-                    </button>
-                    <button @click="activeTab = 'analytics'" 
-                            :class="activeTab === 'analytics' ? 'bg-blue-500 text-white' : 'text-gray-600'"
-                            class="px-4 py-2 rounded-md font-medium transition-colors">
-                        📈 Analytics
-                    </button>
-                </div>
-            </div>
-
-            <!-- Dashboard Tab -->
-            <div x-show="activeTab === 'dashboard'" class="space-y-6">
-                <!-- System Overview -->
-                <div class="grid grid-cols-1 md:grid-cols-4 gap-6">
-                    <div class="bg-white rounded-lg shadow-md p-6 card-hover">
-                        <div class="flex items-center">
-                            <div class="text-3xl text-blue-500">🤖</div>
-                            <div class="ml-4">
-                                <div class="text-2xl font-bold text-gray-900" x-text="metrics.ai_decisions">0</div>
-                                <div class="text-sm text-gray-500">AI Decisions</div>
-                            </div>
-                        </div>
-                    </div>
-                    <div class="bg-white rounded-lg shadow-md p-6 card-hover">
-                        <div class="flex items-center">
-                            <div class="text-3xl text-green-500">📊</div>
-                            <div class="ml-4">
-                                <div class="text-2xl font-bold text-gray-900" x-text="metrics.events_processed">0</div>
-                                <div class="text-sm text-gray-500">Events Processed</div>
-                            </div>
-                        </div>
-                    </div>
-                    <div class="bg-white rounded-lg shadow-md p-6 card-hover">
-                        <div class="flex items-center">
-                            <div class="text-3xl text-yellow-500">🔧</div>
-                            <div class="ml-4">
-                                <div class="text-2xl font-bold text-gray-900" x-text="metrics.problems_resolved">0</div>
-                                <div class="text-sm text-gray-500">Problems Resolved</div>
-                            </div>
-                        </div>
-                    </div>
-                    <div class="bg-white rounded-lg shadow-md p-6 card-hover">
-                        <div class="flex items-center">
-                            <div class="text-3xl text-purple-500">👥</div>
-                            <div class="ml-4">
-                                <div class="text-2xl font-bold text-gray-900" x-text="metrics.customer_interactions">0</div>
-                                <div class="text-sm text-gray-500">Customer Interactions</div>
-                            </div>
-                        </div>
-                    </div>
-                </div>
-
-                <!-- Quick Actions -->
-                <div class="bg-white rounded-lg shadow-md p-6">
-                    <h3 class="text-lg font-semibold text-gray-900 mb-4">🚀 Quick Actions</h3>
-                    <div class="grid grid-cols-1 md:grid-cols-3 gap-4">
-                        <button @click="runPersonalizationDemo()" 
-                                class="bg-blue-500 text-white px-4 py-2 rounded-lg hover:bg-blue-600 transition-colors">
-                            🧠 Run Personalization Demo
-                        </button>
-                        <button @click="runInventoryDemo()" 
-                                class="bg-green-500 text-white px-4 py-2 rounded-lg hover:bg-green-600 transition-colors">
-                            📦 Run Inventory Demo
-                        </button>
-                        <button @click="runProblemResolutionDemo()" 
-                                class="bg-red-500 text-white px-4 py-2 rounded-lg hover:bg-red-600 transition-colors">
-                            🚨 Run Problem Resolution Demo
-                        </button>
-                    </div>
-                </div>
-            </div>
-
-            <!-- Customers Tab -->
-            <div x-show="activeTab === 'customers'" class="space-y-6">
-                <div class="bg-white rounded-lg shadow-md p-6">
-                    <h3 class="text-lg font-semibold text-gray-900 mb-4">👥 Select Customer</h3>
-                    <div class="grid grid-cols-1 md:grid-cols-3 gap-4">
-                        <template x-for="(customer, userId) in customers" :key="userId">
-                            <div class="border rounded-lg p-4 cursor-pointer hover:bg-gray-50 transition-colors"
-                                 @click="selectCustomer(userId)"
-                                 :class="selectedCustomer === userId ? 'border-blue-500 bg-blue-50' : 'border-gray-200'">
-                                <div class="flex items-center space-x-3">
-                                    <div class="text-2xl">👤</div>
-                                    <div>
-                                        <div class="font-semibold" x-text="customer.name"></div>
-                                        <div class="text-sm text-gray-500" x-text="customer.loyalty_tier"></div>
-                                    </div>
-                                </div>
-                            </div>
-                        </template>
-                    </div>
-                </div>
-
-                <!-- Selected Customer Actions -->
-                <div x-show="selectedCustomer" class="bg-white rounded-lg shadow-md p-6">
-                    <h3 class="text-lg font-semibold text-gray-900 mb-4">🛒 Customer Actions</h3>
-                    <div class="grid grid-cols-1 md:grid-cols-2 gap-6">
-                        <!-- Cart -->
-                        <div>
-                            <h4 class="font-medium text-gray-900 mb-2">Shopping Cart</h4>
-                            <div class="border rounded-lg p-4 min-h-32">
-                                <template x-if="cart.items.length === 0">
-                                    <div class="text-gray-500 text-center py-4">Cart is empty</div>
-                                </template>
-                                <template x-for="item in cart.items" :key="item.product_id">
-                                    <div class="flex items-center space-x-3 py-2 border-b">
-                                        <img :src="item.image" class="w-12 h-12 rounded object-cover">
-                                        <div class="flex-1">
-                                            <div class="font-medium" x-text="item.name"></div>
-                                            <div class="text-sm text-gray-500">Qty: <span x-text="item.quantity"></span></div>
-                                        </div>
-                                        <div class="font-semibold" x-text="'$' + (item.price * item.quantity).toFixed(2)"></div>
-                                    </div>
-                                </template>
-                                <template x-if="cart.items.length > 0">
-                                    <div class="mt-4 pt-4 border-t">
-                                        <div class="flex justify-between font-semibold">
-                                            <span>Total:</span>
-                                            <span x-text="'$' + cart.total.toFixed(2)"></span>
-                                        </div>
-                                        <button @click="checkout()" 
-                                                class="w-full mt-2 bg-green-500 text-white py-2 rounded-lg hover:bg-green-600 transition-colors">
-                                            💳 Checkout
-                                        </button>
-                                    </div>
-                                </template>
-                            </div>
-                        </div>
-
-                        <!-- AI Recommendations -->
-                        <div>
-                            <h4 class="font-medium text-gray-900 mb-2">🤖 AI Recommendations</h4>
-                            <div class="border rounded-lg p-4 min-h-32">
-                                <template x-if="recommendations.length === 0">
-                                    <div class="text-gray-500 text-center py-4">No recommendations yet</div>
-                                </template>
-                                <template x-for="rec in recommendations" :key="rec.product_id">
-                                    <div class="flex items-center space-x-3 py-2 border-b">
-                                        <img :src="rec.image" class="w-12 h-12 rounded object-cover">
-                                        <div class="flex-1">
-                                            <div class="font-medium" x-text="rec.name"></div>
-                                            <div class="text-sm text-gray-500" x-text="rec.reason"></div>
-                                        </div>
-                                        <div class="text-right">
-                                            <div class="font-semibold" x-text="'$' + rec.price"></div>
-                                            <div class="text-sm text-green-600" x-text="'$' + rec.discount + ' off'"></div>
-                                        </div>
-                                    </div>
-                                </template>
-                            </div>
-                        </div>
-                    </div>
-                </div>
-            </div>
-
-            <!-- Inventory Tab -->
-            <div x-show="activeTab === 'inventory'" class="space-y-6">
-                <div class="bg-white rounded-lg shadow-md p-6">
-                    <h3 class="text-lg font-semibold text-gray-900 mb-4">📦 Inventory Management</h3>
-                    <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-4">
-                        <template x-for="(product, productId) in inventory" :key="productId">
-                            <div class="border rounded-lg p-4 card-hover">
-                                <img :src="product.image" class="w-full h-32 object-cover rounded mb-3">
-                                <div class="font-semibold" x-text="product.name"></div>
-                                <div class="text-lg font-bold text-blue-600" x-text="'$' + product.price"></div>
-                                <div class="text-sm text-gray-500 mt-2">Stock Levels:</div>
-                                <template x-for="(warehouse, name) in product.warehouses" :key="name">
-                                    <div class="flex justify-between text-sm">
-                                        <span x-text="name"></span>
-                                        <span :class="warehouse.stock <= warehouse.threshold ? 'text-red-600' : 'text-green-600'"
-                                              x-text="warehouse.stock + ' units'"></span>
-                                    </div>
-                                </template>
-                                <button @click="addToCart(productId)" 
-                                        class="w-full mt-3 bg-blue-500 text-white py-1 rounded hover:bg-blue-600 transition-colors">
-                                    Add to Cart
-                                </button>
-                            </div>
-                        </template>
-                    </div>
-                </div>
-            </div>
-
-            <!-- Analytics Tab -->
-            <div x-show="activeTab === 'analytics'" class="space-y-6">
-                <div class="bg-white rounded-lg shadow-md p-6">
-                    <h3 class="text-lg font-semibold text-gray-900 mb-4">📈 Business Impact</h3>
-                    <div class="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-                        <div class="text-center">
-                            <div class="text-3xl font-bold text-green-600">+23%</div>
-                            <div class="text-sm text-gray-500">Conversion Rate</div>
-                        </div>
-                        <div class="text-center">
-                            <div class="text-3xl font-bold text-blue-600">+18%</div>
-                            <div class="text-sm text-gray-500">Average Order Value</div>
-                        </div>
-                        <div class="text-center">
-                            <div class="text-3xl font-bold text-red-600">-31%</div>
-                            <div class="text-sm text-gray-500">Cart Abandonment</div>
-                        </div>
-                        <div class="text-center">
-                            <div class="text-3xl font-bold text-purple-600">+15%</div>
-                            <div class="text-sm text-gray-500">Customer Satisfaction</div>
-                        </div>
-                        <div class="text-center">
-                            <div class="text-3xl font-bold text-yellow-600">+42%</div>
-                            <div class="text-sm text-gray-500">Operational Efficiency</div>
-                        </div>
-                        <div class="text-center">
-                            <div class="text-3xl font-bold text-indigo-600">$47K</div>
-                            <div class="text-sm text-gray-500">Monthly Savings</div>
-                        </div>
-                    </div>
-                </div>
-            </div>
-        </main>
-    </div>
-
-    <script>
-        function aegisApp() {
-            return {
-                activeTab: 'dashboard',
-                selectedCustomer: null,
-                customers: {},
-                inventory: {},
-                cart: { items: [], total: 0 },
-                recommendations: [],
-                metrics: { ai_decisions: 0, events_processed: 0, problems_resolved: 0, customer_interactions: 0 },
-                
-                async init() {
-                    await this.loadData();
-                },
-                
-                async loadData() {
-                    try {
-                        const [customersRes, inventoryRes, metricsRes] = await Promise.all([
-                            fetch('/api/customers'),
-                            fetch('/api/inventory'),
-                            fetch('/api/metrics')
-                        ]);
-                        
-                        this.customers = await customersRes.json();
-                        this.inventory = await inventoryRes.json();
-                        const metricsData = await metricsRes.json();
-                        this.metrics = metricsData.system_metrics;
-                    } catch (error) {
-                        console.error('Error loading data:', error);
-                    }
-                },
-                
-                async selectCustomer(userId) {
-                    this.selectedCustomer = userId;
-                    this.cart = { items: [], total: 0 };
-                    this.recommendations = [];
-                    
-                    try {
-                        const response = await fetch(`/api/select-customer`, {
-                            method: 'POST',
-                            headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
-                            body: `user_id=${userId}`
-                        });
-                        const data = await response.json();
-                        if (data.success) {
-                            console.log('Customer selected:', data.user);
-                        }
-                    } catch (error) {
-                        console.error('Error selecting customer:', error);
-                    }
-                },
-                
-                async addToCart(productId) {
-                    if (!this.selectedCustomer) {
-                        alert('Please select a customer first');
-                        return;
-                    }
-                    
-                    try {
-                        const response = await fetch(`/api/add-to-cart`, {
-                            method: 'POST',
-                            headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
-                            body: `user_id=${this.selectedCustomer}&product_id=${productId}&quantity=1`
-                        });
-                        const data = await response.json();
-                        if (data.success) {
-                            this.cart = data.cart;
-                            await this.getRecommendations();
-                        }
-                    } catch (error) {
-                        console.error('Error adding to cart:', error);
-                    }
-                },
-                
-                async getRecommendations() {
-                    if (!this.selectedCustomer) return;
-                    
-                    try {
-                        const response = await fetch(`/api/recommendations/${this.selectedCustomer}`);
-                        const data = await response.json();
-                        this.recommendations = data.recommendations || [];
-                    } catch (error) {
-                        console.error('Error getting recommendations:', error);
-                    }
-                },
-                
-                async checkout() {
-                    if (!this.selectedCustomer) return;
-                    
-                    try {
-                        const response = await fetch(`/api/simulate-payment`, {
-                            method: 'POST',
-                            headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
-                            body: `user_id=${this.selectedCustomer}`
-                        });
-                        const data = await response.json();
-                        
-                        if (data.success) {
-                            alert('Payment successful! ' + data.message);
-                            this.cart = { items: [], total: 0 };
-                            this.recommendations = [];
-                        } else {
-                            alert('Payment failed: ' + data.error);
-                            if (data.ai_response) {
-                                alert('AI Response: ' + data.ai_response.message);
-                            }
-                        }
-                        
-                        await this.loadData();
-                    } catch (error) {
-                        console.error('Error during checkout:', error);
-                    }
-                },
-                
-                async runPersonalizationDemo() {
-                    alert('Personalization Demo: AI analyzes customer behavior and generates smart recommendations!');
-                },
-                
-                async runInventoryDemo() {
-                    alert('Inventory Demo: AI monitors stock levels and optimizes warehouse allocation!');
-                },
-                
-                async runProblemResolutionDemo() {
-                    alert('Problem Resolution Demo: AI detects and resolves issues automatically!');
-                }
-            }
-        }
-    </script>
-</body>
-</html>
-    """
+    accept_encoding = request.headers.get("accept-encoding", "")
+    encoding = next(
+        enc for enc, _ in _HOME_ENCODINGS if enc is None or _accepts_encoding(accept_encoding, enc)
+    )
+    headers = _HOME_HEADERS[encoding]
+    
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return _HOME_RESPONSES[encoding]
 
 @app.get("/api/customers")
-async def get_customers():
-    """Get all customers."""
-    return aegis.user_profiles
+async def get_customers(request: Request):
+    """Get all customers; answers 304 when the client's ETag is current."""
+    body = aegis.customers_json()
+    headers = {"ETag": aegis.customers_etag(), "X-Data-Version": str(aegis.customers_version)}
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/api/inventory")
-async def get_inventory():
-    """Get inventory data."""
-    return aegis.inventory_data
+async def get_inventory(request: Request):
+    """Get inventory data; answers 304 when the client's ETag is current."""
+    # Read the snapshot and its ETag together; nothing awaits in between
+    body, etag = aegis.inventory_json(), aegis.inventory_etag()
+    headers = {"ETag": etag, "X-Data-Version": str(aegis.inventory_version)}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/bootstrap")
+async def get_bootstrap():
+    """Get customers, inventory and live metrics in one payload for the dashboard."""
+    body = (
+        b'{"customers":' + aegis.customers_json()
+        + b',"inventory":' + aegis.inventory_json()
+        + b',"system_metrics":' + orjson.dumps(await aegis.load_metrics()) + b'}'
+    )
+    return Response(content=body, media_type="application/json")
 
 @app.get("/api/cart/{user_id}")
 async def get_cart(user_id: str):
     """Get user's cart."""
-    if user_id in aegis.cart_data:
-        return aegis.cart_data[user_id]
-    return {"error": "User not found"}
+    if user_id in aegis.user_profiles:
+        return ORJSONResponse(await aegis.load_cart(user_id))
+    return ORJSONResponse({"error": "User not found"})
 
 @app.post("/api/select-customer")
-async def select_customer(user_id: str = Form(...)):
+async def select_customer(request: UserRequest):
     """Select a customer."""
-    if user_id in aegis.user_profiles:
-        aegis.current_user = user_id
-        return {"success": True, "user": aegis.user_profiles[user_id]}
-    return {"success": False, "error": "User not found"}
+    profile = aegis.user_profiles.get(request.user_id)
+    if profile is None:
+        return ORJSONResponse({"success": False, "error": "User not found"})
+    aegis.current_user = request.user_id
+    return ORJSONResponse({"success": True, "user": profile})
 
 @app.post("/api/add-to-cart")
-async def add_to_cart(
-    user_id: str = Form(...),
-    product_id: str = Form(...),
-    quantity: int = Form(1)
-):
+async def add_to_cart(request: AddToCartRequest, background_tasks: BackgroundTasks):
     """Add item to cart."""
-    if user_id not in aegis.user_profiles:
-        return {"success": False, "error": "User not found"}
-    
-    if product_id not in aegis.inventory_data:
-        return {"success": False, "error": "Product not found"}
-    
-    product = aegis.inventory_data[product_id]
-    cart_item = {
-        "product_id": product_id,
-        "name": product["name"],
-        "price": product["price"],
-        "quantity": quantity,
-        "image": product["image"]
-    }
-    
-    aegis.cart_data[user_id]["items"].append(cart_item)
-    aegis.cart_data[user_id]["total"] += product["price"] * quantity
-    
-    # Trigger AI analysis
-    await aegis._trigger_cart_analysis(user_id)
-    
-    return {"success": True, "cart": aegis.cart_data[user_id]}
+    item = CartItemRequest(product_id=request.product_id, quantity=request.quantity)
+    return await _add_items(request.user_id, [item], background_tasks)
 
-async def _trigger_cart_analysis(self, user_id: str):
-    """Trigger AI cart analysis."""
-    if user_id not in self.user_profiles:
-        return
-    
-    cart_items = self.cart_data[user_id]["items"]
-    user_profile = self.user_profiles[user_id]
-    
-    # Generate AI recommendations
-    recommendations = await self._generate_ai_recommendations(cart_items, user_profile)
-    
-    self.system_metrics["ai_decisions"] += 1
-    self.system_metrics["events_processed"] += 1
-    
-    return recommendations
+@app.post("/api/add-items")
+async def add_items(request: AddItemsRequest, background_tasks: BackgroundTasks):
+    """Add several items to a cart and run the AI analysis once."""
+    return await _add_items(request.user_id, request.items, background_tasks)
 
-async def _generate_ai_recommendations(self, cart_items, user_profile):
-    """Generate AI recommendations based on cart and profile."""
-    recommendations = []
+async def _add_items(user_id: str, items: List[CartItemRequest], background_tasks: BackgroundTasks) -> Response:
+    """Validate every item, update the cart in one pass and analyze it once."""
+    if user_id not in aegis.user_profiles:
+        return ORJSONResponse({"success": False, "error": "User not found"})
     
-    # Simple AI logic for demo
-    cart_categories = set()
-    for item in cart_items:
-        product = self.inventory_data[item["product_id"]]
-        cart_categories.add(product["category"])
+    for item in items:
+        if item.product_id not in aegis.inventory_data:
+            return ORJSONResponse({"success": False, "error": "Product not found"})
     
-    # Find complementary items
-    for product_id, product in self.inventory_data.items():
-        if product["category"] not in cart_categories:
-            # Check if it matches user preferences
-            if any(tag in user_profile["preferences"]["colors"] for tag in product["tags"]):
-                recommendations.append({
-                    "product_id": product_id,
-                    "name": product["name"],
-                    "reason": f"Matches your {user_profile['preferences']['style']} style",
-                    "discount": 10,
-                    "confidence": 0.85,
-                    "image": product["image"],
-                    "price": product["price"]
-                })
+    cart = await aegis.add_cart_items(user_id, [(item.product_id, item.quantity) for item in items])
     
-    return recommendations[:3]  # Return top 3 recommendations
-
-# Add methods to the class
-WebAegisOrchestrator._trigger_cart_analysis = _trigger_cart_analysis
-WebAegisOrchestrator._generate_ai_recommendations = _generate_ai_recommendations
+    # The AI analysis runs after the response is sent. Recommendations are
+    # included only if this cart was analyzed before; otherwise they are null
+    # and the dashboard asks /api/recommendations for them
+    recommendations = aegis._rec_cache.get(_recommendation_key(user_id, cart["items"]))
+    background_tasks.add_task(aegis._trigger_cart_analysis, user_id, cart["items"])
+    
+    return ORJSONResponse({"success": True, "cart": cart, "recommendations": recommendations})
 
 @app.get("/api/recommendations/{user_id}")
 async def get_recommendations(user_id: str):
     """Get AI recommendations for user."""
     if user_id not in aegis.user_profiles:
-        return {"error": "User not found"}
+        return ORJSONResponse({"error": "User not found"})
     
-    user_profile = aegis.user_profiles[user_id]
-    cart_items = aegis.cart_data[user_id]["items"]
+    recommendations = await aegis.recommendation_batcher.submit(user_id)
     
-    recommendations = await aegis._generate_ai_recommendations(cart_items, user_profile)
+    await aegis.count(METRIC_AI)
     
-    aegis.system_metrics["ai_decisions"] += 1
-    
-    return {"recommendations": recommendations}
+    return ORJSONResponse({"recommendations": recommendations})
 
 @app.get("/api/inventory-status")
-async def get_inventory_status():
-    """Get inventory status with alerts."""
+async def get_inventory_status(full: bool = False):
+    """Get inventory alerts; pass `full=1` to include the whole inventory."""
+    inventory = aegis.inventory_data
     alerts = []
-    for product_id, product in aegis.inventory_data.items():
-        for warehouse, data in product['warehouses'].items():
-            if data['stock'] <= data['threshold']:
-                alerts.append({
-                    "product": product['name'],
-                    "warehouse": warehouse,
-                    "stock": data['stock'],
-                    "threshold": data['threshold'],
-                    "severity": "high" if data['stock'] < data['threshold'] else "medium"
-                })
+    for product_id, warehouse in aegis._low_stock:
+        product = inventory[product_id]
+        data = product.warehouses[warehouse]
+        alerts.append({
+            "product": product.name,
+            "warehouse": warehouse,
+            "stock": data.stock,
+            "threshold": data.threshold,
+            "severity": "high" if data.stock < data.threshold else "medium"
+        })
     
-    return {"alerts": alerts, "inventory": aegis.inventory_data}
+    body = b'{"alerts":' + orjson.dumps(alerts)
+    if full:
+        body += b',"inventory":' + aegis.inventory_json()
+    return Response(content=body + b'}', media_type="application/json")
 
 @app.post("/api/simulate-payment")
-async def simulate_payment(user_id: str = Form(...)):
+async def simulate_payment(request: UserRequest):
     """Simulate payment process."""
+    user_id = request.user_id
     if user_id not in aegis.user_profiles:
-        return {"success": False, "error": "User not found"}
+        return ORJSONResponse({"success": False, "error": "User not found"})
     
-    cart = aegis.cart_data[user_id]
+    cart = await aegis.load_cart(user_id)
     if not cart["items"]:
-        return {"success": False, "error": "Cart is empty"}
+        return ORJSONResponse({"success": False, "error": "Cart is empty"})
     
     # Simulate payment processing
-    import random
-    if random.random() < 0.3:  # 30% chance of failure
+    if _rand() < 0.3:  # 30% chance of failure
         # Payment failed - trigger AI resolution
-        aegis.system_metrics["problems_resolved"] += 1
-        aegis.system_metrics["ai_decisions"] += 1
+        await aegis.count(METRIC_PRB, METRIC_AI)
         
-        return {
+        return ORJSONResponse({
             "success": False,
             "error": "Payment failed",
             "ai_response": {
@@ -755,36 +866,64 @@ async def simulate_payment(user_id: str = Form(...)):
                 "message": "We're working to resolve this issue. Your order is safe.",
                 "retry_attempts": 1
             }
-        }
+        })
     else:
         # Payment successful
-        aegis.system_metrics["customer_interactions"] += 1
-        aegis.cart_data[user_id] = {"items": [], "total": 0.0}
+        await aegis.count(METRIC_CUST)
+        await aegis.clear_cart(user_id)
         
-        return {
+        return ORJSONResponse({
             "success": True,
             "message": "Payment successful! Order confirmed.",
-            "order_id": f"ORD-{int(time.time())}"
-        }
+            "order_id": await aegis.next_order_id()
+        })
+
+# Static half of the metrics payload, serialized once
+_BUSINESS_IMPACT_JSON = orjson.dumps({
+    "conversion_rate_increase": "+23%",
+    "average_order_value_increase": "+18%",
+    "cart_abandonment_reduction": "-31%",
+    "customer_satisfaction_increase": "+15%",
+    "operational_efficiency_gain": "+42%",
+    "monthly_cost_savings": "$47,000"
+})
 
 @app.get("/api/metrics")
 async def get_metrics():
     """Get system metrics."""
-    return {
-        "system_metrics": aegis.system_metrics,
-        "business_impact": {
-            "conversion_rate_increase": "+23%",
-            "average_order_value_increase": "+18%",
-            "cart_abandonment_reduction": "-31%",
-            "customer_satisfaction_increase": "+15%",
-            "operational_efficiency_gain": "+42%",
-            "monthly_cost_savings": "$47,000"
-        }
-    }
+    body = (
+        b'{"system_metrics":' + orjson.dumps(await aegis.load_metrics())
+        + b',"business_impact":' + _BUSINESS_IMPACT_JSON + b'}'
+    )
+    return Response(content=body, media_type="application/json")
 
 if __name__ == "__main__":
     print("Starting Aegis Orchestrator Web Demo...")
-    print("Open your browser and go to: http://localhost:8000")
+    print(f"Open your browser and go to: http://localhost:{settings.api_port}")
     print("Experience the full AI-powered e-commerce intelligence platform!")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if os.environ.get("AEGIS_PROD") == "1":
+        # Gunicorn re-imports this module; keep the workers in the same mode
+        os.environ.setdefault("AEGIS_DEMO_MODE", "1")
+        # One UvicornWorker process per slot; carts are shared through Redis
+        workers = 2 * (os.cpu_count() or 1) + 1
+        print(
+            f"Running {workers} workers. Carts and metrics are shared only through Redis at "
+            f"{settings.redis_url}; the selected customer stays per worker."
+        )
+        os.execvp("gunicorn", [
+            "gunicorn", "web_demo_simple:app",
+            "-k", "uvicorn.workers.UvicornWorker",
+            "-w", str(workers),
+            "--bind", f"{settings.api_host}:{settings.api_port}"
+        ])
+    
+    # uvloop and httptools come from requirements.txt; uvloop is not built for Windows
+    uvicorn.run(
+        app,
+        host=settings.api_host,
+        port=settings.api_port,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        access_log=False
+    )